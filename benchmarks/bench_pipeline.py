@@ -0,0 +1,173 @@
+"""
+Benchmark the encrypt/upload/decrypt pipeline on synthetic trees.
+
+Measures files/s, MB/s and per-file latency for each stage:
+PGPHandler.encrypt_file/decrypt_file, SyncFolderClient.upload_file/download_file
+and full SyncManager.handle_local_change/handle_sync_folder_change round trips.
+The decrypt side of the round trip runs on a second SyncManager with its own
+state directory, like another device, so it decrypts every ciphertext instead
+of recognising them as its own uploads. Each stage runs against the real gpg (throwaway keyring) and a no-op crypto
+stand-in, so pipeline overhead can be told apart from crypto cost.
+
+Usage:
+    python benchmarks/bench_pipeline.py --output results.json
+    python benchmarks/bench_pipeline.py --profiles tiny mixed --scale 0.2 --baseline results.json
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from benchmarks.common import (
+    TREE_PROFILES, build_tree, file_sizes, make_config, make_pgp_handler,
+    summarize, workspace, write_json,
+)
+from src.state import load_json
+from src.sync_folder_client import SyncFolderClient
+from src.sync_manager import SyncManager
+
+# Bumped when a stage starts measuring something else; older baselines are not comparable for it
+STAGE_VERSIONS = {"manager.handle_sync_folder_change": 2}
+
+STAGES = (
+    "pgp.encrypt_file", "pgp.decrypt_file",
+    "client.upload_file", "client.download_file",
+    "manager.handle_local_change", "manager.handle_sync_folder_change",
+)
+
+
+def run_stage(paths, sizes, operation):
+    """Run operation(path) for every path, returning the stage summary."""
+    latencies = []
+    start = time.perf_counter()
+    for path in paths:
+        t0 = time.perf_counter()
+        operation(path)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, sum(sizes), time.perf_counter() - start)
+
+
+def bench_profile(backend, profile, scale, extra_sync):
+    with workspace() as base:
+        config = make_config(base, extra_sync)
+        pgp = make_pgp_handler(config, backend)
+        client = SyncFolderClient(config)
+        manager = SyncManager(config, client, pgp)
+        plain_root = config["local"]["monitored_path"]
+        sizes = file_sizes(profile, scale)
+        paths = build_tree(plain_root, sizes)
+        scratch = os.path.join(base, "scratch")
+        results = {}
+
+        def scratch_path(path, suffix):
+            out = os.path.join(scratch, os.path.relpath(path, plain_root) + suffix)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            return out
+
+        # Crypto stages in isolation
+        results["pgp.encrypt_file"] = run_stage(
+            paths, sizes, lambda p: pgp.encrypt_file(p, scratch_path(p, ".gpg")))
+        results["pgp.decrypt_file"] = run_stage(
+            paths, sizes, lambda p: pgp.decrypt_file(scratch_path(p, ".gpg"), scratch_path(p, ".out")))
+
+        # Sync folder copies in isolation. Uploads use a name the sync manager
+        # ignores, so they do not show up as remote versions later on.
+        encrypted_root = client.encrypted_path
+        upload_name = lambda p: os.path.join("upload", os.path.relpath(p, plain_root) + ".bench")
+        results["client.upload_file"] = run_stage(
+            paths, sizes, lambda p: client.upload_file(
+                scratch_path(p, ".gpg"), os.path.join(encrypted_root, upload_name(p))))
+        results["client.download_file"] = run_stage(
+            paths, sizes, lambda p: client.download_file(upload_name(p), scratch_path(p, ".dl")))
+
+        # Full round trips through the sync manager, received by a fresh one
+        results["manager.handle_local_change"] = run_stage(
+            paths, sizes, lambda p: manager.handle_local_change(Path(p)))
+        receiver_config = make_config(os.path.join(base, "receiver"), extra_sync)
+        receiver_config["sync_folder"] = config["sync_folder"]
+        receiver_config["pgp"] = config["pgp"]
+        receiver = SyncManager(receiver_config, SyncFolderClient(receiver_config), pgp)
+        remote = [os.path.join(encrypted_root, os.path.relpath(p, plain_root) + ".gpg") for p in paths]
+        results["manager.handle_sync_folder_change"] = run_stage(
+            remote, sizes, lambda p: receiver.handle_sync_folder_change(Path(p)))
+
+        missing = [p for p in remote if not os.path.exists(p)]
+        if missing:
+            logging.warning(f"{len(missing)} file(s) were not published by handle_local_change")
+        received = sum(
+            os.path.exists(os.path.join(receiver_config["local"]["decrypted_path"], os.path.relpath(p, plain_root)))
+            for p in paths
+        )
+        if received < len(paths) - len(missing):
+            logging.warning(f"{len(paths) - len(missing) - received} file(s) were not decrypted by handle_sync_folder_change")
+        results["failures"] = len(paths) - received + len(manager.retry_queue) + len(receiver.retry_queue)
+        manager.stop()
+        receiver.stop()
+        return results
+
+
+def compare(results, baseline, threshold):
+    """Print throughput changes against a baseline; return the number of regressions."""
+    regressions = 0
+    baseline_versions = baseline.get("meta", {}).get("stage_versions", {})
+    stale = [stage for stage, version in STAGE_VERSIONS.items() if baseline_versions.get(stage, 1) != version]
+    for stage in stale:
+        print(f"Baseline measured {stage} differently; run it again to compare that stage", file=sys.stderr)
+    for backend, profiles in results["results"].items():
+        for profile, stages in profiles.items():
+            for stage in STAGES:
+                if stage in stale:
+                    continue
+                new = stages.get(stage, {}).get("files_per_s")
+                old = baseline.get("results", {}).get(backend, {}).get(profile, {}).get(stage, {}).get("files_per_s")
+                if not new or not old:
+                    continue
+                change = (new - old) / old * 100
+                flag = ""
+                if change < -threshold:
+                    flag = "  REGRESSION"
+                    regressions += 1
+                print(f"{backend:5} {profile:6} {stage:34} {old:10.1f} -> {new:10.1f} files/s ({change:+6.1f}%){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the guardian-sync pipeline")
+    parser.add_argument("--backends", nargs="+", default=["noop", "gpg"], choices=["noop", "gpg"])
+    parser.add_argument("--profiles", nargs="+", default=list(TREE_PROFILES), choices=TREE_PROFILES)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the number of files per profile")
+    parser.add_argument("--memory-staging", type=int, default=0, help="sync.memory_staging_max_bytes to use")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    extra_sync = {"memory_staging_max_bytes": args.memory_staging}
+    results = {
+        "meta": {"scale": args.scale, "memory_staging_max_bytes": args.memory_staging, "python": sys.version.split()[0], "time": time.time(), "stage_versions": STAGE_VERSIONS},
+        "results": {},
+    }
+    for backend in args.backends:
+        for profile in args.profiles:
+            print(f"Running {backend}/{profile} ...", file=sys.stderr)
+            results["results"].setdefault(backend, {})[profile] = bench_profile(backend, profile, args.scale, extra_sync)
+    write_json(args.output, results)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        baseline = load_json(args.baseline)
+        if baseline is None:
+            print(f"Baseline {args.baseline} not found", file=sys.stderr)
+            return 2
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Shared helpers for the benchmark and load-test scripts."""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from src import pgp_handler as pgp_module
+from src.pgp_handler import PGPHandler
+
+BENCH_KEY_NAME = "guardian-sync-bench"
+
+TREE_PROFILES = ("tiny", "mixed", "huge")
+
+
+def file_sizes(profile, scale=1.0, seed=0):
+    """Return the list of file sizes for a synthetic tree profile."""
+    if profile == "tiny":
+        # Many tiny files
+        return [1024] * max(1, int(500 * scale))
+    if profile == "mixed":
+        # Log-uniform sizes between 256 B and 8 MiB
+        rng = random.Random(seed)
+        count = max(1, int(200 * scale))
+        return [int(math.exp(rng.uniform(math.log(256), math.log(8 * 1024 * 1024)))) for _ in range(count)]
+    if profile == "huge":
+        # A few huge files
+        return [64 * 1024 * 1024] * max(1, int(2 * scale))
+    raise ValueError(f"Unknown tree profile '{profile}'")
+
+
+def build_tree(root, sizes, fanout=20, seed=0):
+    """Create files with the given sizes below root, spread over nested directories."""
+    rng = random.Random(seed)
+    paths = []
+    for i, size in enumerate(sizes):
+        directory = os.path.join(root, f"d{i // fanout % fanout:02d}", f"d{i // (fanout * fanout):02d}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"file{i:06d}.bin")
+        with open(path, "wb") as f:
+            remaining = size
+            while remaining:
+                chunk = min(remaining, 1024 * 1024)
+                f.write(rng.randbytes(chunk))
+                remaining -= chunk
+        paths.append(path)
+    return paths
+
+
+class _FakeResult:
+    def __init__(self, data=b""):
+        self.ok = True
+        self.status = "ok"
+        self.stderr = ""
+        self.data = data
+
+
+class FakeGPG:
+    """No-op stand-in for gnupg.GPG: 'encrypts' by copying, to measure pipeline overhead."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def list_keys(self, secret=False):
+        return [{"uids": [BENCH_KEY_NAME]}]
+
+    def encrypt_file(self, fileobj, recipients, output=None, always_trust=False, **kwargs):
+        with open(output, "wb") as out:
+            shutil.copyfileobj(fileobj, out, 1024 * 1024)
+        return _FakeResult()
+
+    def decrypt_file(self, fileobj, passphrase=None, output=None, **kwargs):
+        with open(output, "wb") as out:
+            shutil.copyfileobj(fileobj, out, 1024 * 1024)
+        return _FakeResult()
+
+    def encrypt(self, data, recipients, always_trust=False, **kwargs):
+        return _FakeResult(data)
+
+    def decrypt(self, data, passphrase=None, **kwargs):
+        return _FakeResult(data)
+
+
+def make_throwaway_keyring(gnupghome):
+    """Generate an unprotected benchmark key in a fresh GnuPG home."""
+    import gnupg
+    os.makedirs(gnupghome, mode=0o700, exist_ok=True)
+    gpg = gnupg.GPG(gnupghome=gnupghome)
+    key_input = gpg.gen_key_input(
+        name_real=BENCH_KEY_NAME, name_email="bench@localhost",
+        key_type="EDDSA", key_curve="ed25519", subkey_type="ECDH", subkey_curve="cv25519",
+        no_protection=True, expire_date=0,
+    )
+    key = gpg.gen_key(key_input)
+    if not key.fingerprint:
+        raise RuntimeError(f"Failed to generate benchmark key: {key.stderr}")
+    return key.fingerprint
+
+
+def make_config(base, extra_sync=None):
+    """Config for a throwaway sync pair below base."""
+    config = {
+        "local": {"monitored_path": os.path.join(base, "plain"), "decrypted_path": os.path.join(base, "decrypted")},
+        "sync_folder": {"path": os.path.join(base, "cloud"), "encrypted_folder": "encrypted_files"},
+        "pgp": {"key_name": BENCH_KEY_NAME, "passphrase": "unused", "gnupghome": os.path.join(base, "gnupg"), "always_trust": True},
+        "sync": {"remote_settle_seconds": 0, **(extra_sync or {})},
+        "state_dir": os.path.join(base, "state"),
+    }
+    for path in (config["local"]["monitored_path"], config["local"]["decrypted_path"], config["sync_folder"]["path"]):
+        os.makedirs(path, exist_ok=True)
+    os.makedirs(config["pgp"]["gnupghome"], mode=0o700, exist_ok=True)
+    return config
+
+
+def make_pgp_handler(config, backend):
+    """PGPHandler using either the real gpg ('gpg') or the no-op stand-in ('noop')."""
+    if backend == "gpg":
+        make_throwaway_keyring(config["pgp"]["gnupghome"])
+        return PGPHandler(config)
+    with mock.patch.object(pgp_module.gnupg, "GPG", FakeGPG):
+        return PGPHandler(config)
+
+
+@contextmanager
+def workspace(keep=False):
+    """Temporary directory for one benchmark run."""
+    base = tempfile.mkdtemp(prefix="guardian-sync-bench-")
+    try:
+        yield base
+    finally:
+        if not keep:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies, total_bytes, wall_seconds):
+    """Throughput and latency summary for one stage."""
+    count = len(latencies)
+    return {
+        "files": count,
+        "bytes": total_bytes,
+        "seconds": round(wall_seconds, 6),
+        "files_per_s": round(count / wall_seconds, 3) if wall_seconds else None,
+        "mb_per_s": round(total_bytes / wall_seconds / 1e6, 3) if wall_seconds else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else None,
+    }
+
+
+def write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
@@ -0,0 +1,230 @@
+"""
+End-to-end latency and load test for the full daemon stack.
+
+Starts FileMonitor + SyncManager (as main() does) on temporary directories
+with a throwaway GnuPG home, then generates local write storms, renames and
+remote ciphertext drops at configurable rates. Reports p50/p95/p99 lag from a
+local write to the published .gpg and from a remote .gpg to the decrypted
+plaintext, events that never produced output, and peak RSS.
+
+Usage:
+    python benchmarks/load_harness.py --writes 2000 --write-rate 200 --remote-drops 500
+    python benchmarks/load_harness.py --backend noop --output load.json
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import resource
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from benchmarks.common import make_config, make_pgp_handler, percentile, workspace, write_json
+from src.file_monitor import FileMonitor
+from src.sync_folder_client import SyncFolderClient
+from src.sync_manager import SyncManager
+
+
+class LagTracker:
+    """Polls for expected outputs and records how long each took to appear."""
+
+    def __init__(self, poll_interval=0.01):
+        self.poll_interval = poll_interval
+        self.pending = {}  # output path -> (kind, started at, minimum mtime_ns)
+        self.lags = {}  # kind -> [seconds]
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def expect(self, kind, output_path, started_at):
+        with self._lock:
+            self.pending[output_path] = (kind, started_at, time.time_ns() - 1_000_000)
+
+    def start(self):
+        self._thread.start()
+
+    def wait_idle(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self.pending:
+                    return
+            time.sleep(0.05)
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        with self._lock:
+            dropped = {}
+            for kind, _, _ in self.pending.values():
+                dropped[kind] = dropped.get(kind, 0) + 1
+            return dropped
+
+    def _run(self):
+        while not self._stopped.wait(self.poll_interval):
+            with self._lock:
+                items = list(self.pending.items())
+            now = time.monotonic()
+            for path, (kind, started_at, min_mtime) in items:
+                try:
+                    if os.stat(path).st_mtime_ns < min_mtime:
+                        continue
+                except OSError:
+                    continue
+                with self._lock:
+                    if self.pending.get(path, (None, started_at))[1] == started_at:
+                        del self.pending[path]
+                        self.lags.setdefault(kind, []).append(now - started_at)
+
+
+def paced(count, rate, action):
+    """Call action(i) count times, spread evenly at `rate` per second."""
+    start = time.monotonic()
+    for i in range(count):
+        delay = start + i / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        action(i)
+
+
+def run(args):
+    with workspace(keep=args.keep) as base:
+        config = make_config(base, {
+            "remote_settle_seconds": args.settle,
+            "memory_staging_max_bytes": args.memory_staging,
+            "batch": {"enabled": args.batch_interval > 0, "interval_seconds": args.batch_interval},
+        })
+        plain = config["local"]["monitored_path"]
+        decrypted = config["local"]["decrypted_path"]
+
+        pgp = make_pgp_handler(config, args.backend)
+        client = SyncFolderClient(config)
+        manager = SyncManager(config, client, pgp)
+        encrypted = client.encrypted_path
+
+        # Ciphertexts for remote drops are prepared before the clock starts
+        drops_dir = os.path.join(base, "drops")
+        os.makedirs(drops_dir)
+        payload = os.urandom(args.file_size)
+        for i in range(args.remote_drops):
+            src = os.path.join(drops_dir, f"remote{i:06d}.txt")
+            with open(src, "wb") as f:
+                f.write(payload)
+            pgp.encrypt_file(src, src + ".gpg")
+            os.remove(src)
+
+        monitor = FileMonitor(plain, manager.submit_local_change)
+        manager.start()
+        monitor.start()
+        tracker = LagTracker()
+        tracker.start()
+        time.sleep(0.5)  # let observers settle
+
+        def local_write(i):
+            # Mix of new files and rewrites of earlier ones
+            name = f"local{i % max(1, args.writes // 2):06d}.txt" if args.rewrite else f"local{i:06d}.txt"
+            path = os.path.join(plain, f"dir{i % 10}", name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            started = time.monotonic()
+            tracker.expect("local", os.path.join(encrypted, os.path.relpath(path, plain) + ".gpg"), started)
+            with open(path, "wb") as f:
+                f.write(payload)
+
+        def local_rename(i):
+            src = os.path.join(plain, "renames", f"before{i:06d}.txt")
+            dst = os.path.join(plain, "renames", f"after{i:06d}.txt")
+            if not os.path.exists(src):
+                return
+            tracker.expect("rename", os.path.join(encrypted, "renames", f"after{i:06d}.txt.gpg"), time.monotonic())
+            os.rename(src, dst)
+
+        def remote_drop(i):
+            name = f"remote{i:06d}.txt.gpg"
+            tracker.expect("remote", os.path.join(decrypted, name[:-4]), time.monotonic())
+            shutil.copyfile(os.path.join(drops_dir, name), os.path.join(encrypted, name))
+
+        # Files to rename exist before the storm starts
+        if args.renames:
+            os.makedirs(os.path.join(plain, "renames"))
+            for i in range(args.renames):
+                with open(os.path.join(plain, "renames", f"before{i:06d}.txt"), "wb") as f:
+                    f.write(payload)
+            time.sleep(1)
+
+        start = time.monotonic()
+        generators = [
+            threading.Thread(target=paced, args=(args.writes, args.write_rate, local_write)),
+            threading.Thread(target=paced, args=(args.renames, args.rename_rate, local_rename)),
+            threading.Thread(target=paced, args=(args.remote_drops, args.remote_rate, remote_drop)),
+        ]
+        for t in generators:
+            t.start()
+        for t in generators:
+            t.join()
+        storm_seconds = time.monotonic() - start
+
+        tracker.wait_idle(args.timeout)
+        dropped = tracker.stop()
+        monitor.stop()
+        manager.stop()
+
+        self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KiB elsewhere
+        unit = 1 if sys.platform == "darwin" else 1024
+        report = {
+            "config": vars(args),
+            "storm_seconds": round(storm_seconds, 3),
+            "lag_ms": {
+                kind: {
+                    "count": len(lags),
+                    "p50": round(percentile(lags, 50) * 1000, 1),
+                    "p95": round(percentile(lags, 95) * 1000, 1),
+                    "p99": round(percentile(lags, 99) * 1000, 1),
+                    "max": round(max(lags) * 1000, 1),
+                }
+                for kind, lags in tracker.lags.items()
+            },
+            "dropped": dropped,
+            "retry_queue": len(manager.retry_queue),
+            "peak_rss_bytes": self_rss * unit,
+            "peak_child_rss_bytes": child_rss * unit,
+        }
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test for guardian-sync")
+    parser.add_argument("--backend", default="gpg", choices=["noop", "gpg"])
+    parser.add_argument("--writes", type=int, default=500, help="Local file writes")
+    parser.add_argument("--write-rate", type=float, default=100, help="Local writes per second")
+    parser.add_argument("--rewrite", action="store_true", help="Rewrite the same files instead of creating new ones")
+    parser.add_argument("--renames", type=int, default=50, help="Local renames")
+    parser.add_argument("--rename-rate", type=float, default=10, help="Renames per second")
+    parser.add_argument("--remote-drops", type=int, default=200, help="Ciphertexts dropped into the encrypted folder")
+    parser.add_argument("--remote-rate", type=float, default=50, help="Remote drops per second")
+    parser.add_argument("--file-size", type=int, default=4096, help="Bytes per file")
+    parser.add_argument("--settle", type=float, default=0.5, help="sync.remote_settle_seconds")
+    parser.add_argument("--memory-staging", type=int, default=0, help="sync.memory_staging_max_bytes")
+    parser.add_argument("--batch-interval", type=float, default=0, help="sync.batch.interval_seconds (0 disables batching)")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for outputs after the storm")
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directories")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    report = run(args)
+    for kind, lag in report["lag_ms"].items():
+        print(f"{kind:7} n={lag['count']:6}  p50={lag['p50']:8.1f}ms  p95={lag['p95']:8.1f}ms  p99={lag['p99']:8.1f}ms  max={lag['max']:8.1f}ms")
+    print(f"dropped: {report['dropped'] or 'none'}")
+    print(f"peak RSS: {report['peak_rss_bytes'] / 1e6:.1f} MB (children {report['peak_child_rss_bytes'] / 1e6:.1f} MB)")
+    if args.output:
+        write_json(args.output, report)
+    return 1 if report["dropped"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
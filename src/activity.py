@@ -0,0 +1,70 @@
+import time
+import itertools
+import threading
+from collections import deque
+
+
+class Activity:
+    def __init__(self, window=60.0):
+        """
+        Track operations in flight and recent throughput.
+
+        Args:
+            window: Seconds over which throughput is averaged
+        """
+        self.window = window
+        self.started_at = time.time()
+        self.in_flight = {}  # token -> (kind, path, started)
+        self.completed = {}  # kind -> operations
+        self.bytes = {}  # kind -> bytes
+        self._recent = deque()  # (monotonic time, kind, bytes)
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+
+    def begin(self, kind, path):
+        """Register an operation as running; returns a token for end()."""
+        token = next(self._tokens)
+        with self._lock:
+            self.in_flight[token] = (kind, str(path), time.monotonic())
+        return token
+
+    def end(self, token):
+        with self._lock:
+            self.in_flight.pop(token, None)
+
+    def record(self, kind, size):
+        """Count a completed operation that moved size bytes."""
+        now = time.monotonic()
+        with self._lock:
+            self.completed[kind] = self.completed.get(kind, 0) + 1
+            self.bytes[kind] = self.bytes.get(kind, 0) + size
+            self._recent.append((now, kind, size))
+            self._expire(now)
+
+    def _expire(self, now):
+        # Called with self._lock held
+        while self._recent and now - self._recent[0][0] > self.window:
+            self._recent.popleft()
+
+    def snapshot(self):
+        """Current activity as a JSON-serializable dict."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            throughput = {}
+            for _, kind, size in self._recent:
+                rate = throughput.setdefault(kind, {'files_per_second': 0.0, 'bytes_per_second': 0.0})
+                rate['files_per_second'] += 1 / self.window
+                rate['bytes_per_second'] += size / self.window
+            return {
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'in_flight': [
+                    {'kind': kind, 'path': path, 'seconds': round(now - started, 3)}
+                    for kind, path, started in self.in_flight.values()
+                ],
+                'completed': dict(self.completed),
+                'bytes': dict(self.bytes),
+                'throughput': {
+                    kind: {k: round(v, 3) for k, v in rate.items()} for kind, rate in throughput.items()
+                },
+            }
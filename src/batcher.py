@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+import threading
+
+DEFAULT_BATCH_INTERVAL = 30.0
+DEFAULT_BATCH_MAX_FILES = 500
+DEFAULT_BATCH_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ChangeBatcher:
+    def __init__(self, config, flush_callback):
+        """
+        Collect changes and hand them over in batches.
+
+        With `sync.batch.enabled`, changes are accumulated and flushed
+        `sync.batch.interval_seconds` after the first pending change, as soon
+        as `sync.batch.max_files` changes or `sync.batch.max_bytes` bytes are
+        pending, or when flush() is called. A change to a path that is already
+        pending replaces the earlier one. Nothing wakes up while no change is
+        pending.
+
+        Args:
+            config: Application configuration
+            flush_callback: Function called with a list of (kind, path) tuples
+        """
+        batch_config = (config.get('sync', {}) or {}).get('batch', {}) or {}
+        self.enabled = bool(batch_config.get('enabled', False))
+        self.interval = float(batch_config.get('interval_seconds', DEFAULT_BATCH_INTERVAL))
+        self.max_files = int(batch_config.get('max_files', DEFAULT_BATCH_MAX_FILES))
+        self.max_bytes = int(batch_config.get('max_bytes', DEFAULT_BATCH_MAX_BYTES))
+        self.workers = int(batch_config.get('workers', min(4, os.cpu_count() or 1)))
+        self.flush_callback = flush_callback
+        self.pending = {}  # (kind, path) -> size, in arrival order
+        self.pending_bytes = 0
+        self._first_pending_at = None
+        self._flushes_requested = 0
+        self._flushes_done = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def __len__(self):
+        with self._cond:
+            return len(self.pending)
+
+    def add(self, kind, path):
+        """Queue a change, replacing a pending change to the same path."""
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            size = 0
+        with self._cond:
+            key = (kind, path)
+            self.pending_bytes += size - self.pending.pop(key, 0)
+            self.pending[key] = size
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+            if len(self.pending) >= self.max_files or self.pending_bytes >= self.max_bytes:
+                self._flushes_requested += 1
+            self._cond.notify_all()
+
+    def discard(self, kind, path):
+        """Remove a pending change. Returns True if it was pending."""
+        with self._cond:
+            size = self.pending.pop((kind, path), None)
+            if size is None:
+                return False
+            self.pending_bytes -= size
+            return True
+
+    def flush(self, wait=True, timeout=None):
+        """Flush pending changes now, by default waiting until they are processed."""
+        with self._cond:
+            self._flushes_requested += 1
+            target = self._flushes_requested
+            self._cond.notify_all()
+            if wait and self._thread is not None:
+                self._cond.wait_for(lambda: self._flushes_done >= target or self._stopped, timeout)
+
+    def start(self):
+        with self._cond:
+            self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="batch-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread after processing whatever is still pending."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _due(self):
+        # Called with the condition held
+        if self._stopped or self._flushes_requested > self._flushes_done:
+            return True
+        return bool(self.pending) and time.monotonic() - self._first_pending_at >= self.interval
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due():
+                    if self.pending:
+                        timeout = self._first_pending_at + self.interval - time.monotonic()
+                        self._cond.wait(max(0.0, timeout))
+                    else:
+                        self._cond.wait()
+                batch = list(self.pending)
+                self.pending = {}
+                self.pending_bytes = 0
+                self._first_pending_at = None
+                requested = self._flushes_requested
+                stopping = self._stopped
+            if batch:
+                try:
+                    self.flush_callback(batch)
+                except Exception as e:
+                    logging.error(f"Batch flush failed: {str(e)}")
+            with self._cond:
+                self._flushes_done = max(self._flushes_done, requested)
+                self._cond.notify_all()
+            if stopping:
+                return
@@ -0,0 +1,359 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+try:
+    from .fingerprints import sha256_file, sha256_stream
+    from .ignore_rules import IgnoreRules
+    from .versions import VERSION_SUFFIX
+except ImportError:
+    from fingerprints import sha256_file, sha256_stream
+    from ignore_rules import IgnoreRules
+    from versions import VERSION_SUFFIX
+
+COMMANDS = ('encrypt-all', 'restore-all', 'verify-all', 'rotate-key')
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1000 or unit == 'TB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1000
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds // 60 % 60:02d}m"
+
+
+class Checkpoint:
+    def __init__(self, path):
+        """
+        Append-only record of completed bulk work, one JSON line per file.
+
+        An entry only counts as done while the file still has the size and
+        mtime it had when it was processed.
+        """
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Return {path: (size, mtime)} of completed files."""
+        done = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    done[record['path']] = (record['size'], record['mtime'])
+        except FileNotFoundError:
+            pass
+        return done
+
+    def add(self, path, size, mtime):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(json.dumps({'path': path, 'size': size, 'mtime': mtime}) + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def clear(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class BulkJob:
+    def __init__(self, sync_manager, command, workers=None, restart=False, progress_interval=5.0, out=None,
+                 recipient=None):
+        """
+        One-shot processing of a whole tree: encrypt-all, restore-all, verify-all or rotate-key.
+
+        The tree is walked once and the files are processed largest first on a
+        pool of workers, so a few huge files don't end up running alone at the
+        end. Completed files are checkpointed in the state directory; an
+        interrupted run picks up where it stopped unless restart is set. The
+        checkpoint is removed once a run finishes without failures.
+
+        encrypt-all and restore-all go through the same code paths as the
+        watcher, including conflict handling and the retry queue. verify-all
+        decrypts the ciphertext of every local file and compares checksums.
+        rotate-key re-encrypts every ciphertext in the encrypted folder to
+        recipient, piping gpg --decrypt into gpg --encrypt so no plaintext is
+        written; it defaults to one worker per CPU.
+
+        Args:
+            sync_manager: SyncManager whose folders are processed
+            command: One of COMMANDS
+            workers: Number of parallel workers (default: `sync.batch.workers`)
+            restart: Ignore an existing checkpoint
+            progress_interval: Seconds between progress lines
+            out: Stream for progress lines (default: stderr)
+            recipient: Key to re-encrypt to, for rotate-key
+        """
+        if command not in COMMANDS:
+            raise ValueError(f"Unknown bulk command '{command}', expected one of {', '.join(COMMANDS)}")
+        if command == 'rotate-key' and not recipient:
+            raise ValueError("rotate-key needs the key to re-encrypt to")
+        self.sync_manager = sync_manager
+        self.command = command
+        self.recipient = recipient
+        default_workers = os.cpu_count() if command == 'rotate-key' else sync_manager.batcher.workers
+        self.workers = max(1, int(workers or default_workers or 1))
+        self.progress_interval = progress_interval
+        self.out = out or sys.stderr
+        self.checkpoint = Checkpoint(os.path.join(sync_manager.state_path, f"bulk-{command}.jsonl"))
+        if restart:
+            self.checkpoint.clear()
+
+        self.total_files = 0
+        self.total_bytes = 0
+        self.resumed = 0
+        self.done = 0
+        self.skipped = 0
+        self.done_bytes = 0
+        self.failures = []  # (path, reason)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def _root(self):
+        if self.command == 'rotate-key':
+            # Every ciphertext is encrypted to the old key, ignored or not, manifest included
+            root = Path(self.sync_manager.remote_guard.root)
+            return root, IgnoreRules(root)
+        if self.command == 'restore-all':
+            return Path(self.sync_manager.remote_guard.root), self.sync_manager.remote_ignore
+        return self.sync_manager.local_path, self.sync_manager.local_ignore
+
+    def _wanted(self, name):
+        # Mirror the handlers' own filters so the plan only holds real work
+        if self.command in ('restore-all', 'rotate-key'):
+            return name.endswith('.gpg')
+        return not (name.startswith('.') or name.endswith('.tmp') or name.endswith('.gpg'))
+
+    def plan(self):
+        """Walk the tree once; returns [(path, size, mtime)] largest first, minus checkpointed files."""
+        root, rules = self._root()
+        done = self.checkpoint.load()
+        entries = []
+        stack = [str(root)]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not rules.ignored(entry.path, is_dir=True):
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False) and self._wanted(entry.name):
+                            if rules.ignored(entry.path):
+                                continue
+                            st = entry.stat(follow_symlinks=False)
+                            if done.get(entry.path) == (st.st_size, st.st_mtime):
+                                self.resumed += 1
+                                continue
+                            entries.append((Path(entry.path), st.st_size, st.st_mtime))
+            except OSError as e:
+                logging.warning(f"Failed to scan {directory}: {str(e)}")
+        entries.sort(key=lambda entry: entry[1], reverse=True)
+        self.total_files = len(entries)
+        self.total_bytes = sum(size for _, size, _ in entries)
+        return entries
+
+    def run(self):
+        """
+        Process the plan and return a summary dict.
+
+        KeyboardInterrupt stops handing out new files; files already running
+        are finished and checkpointed before it propagates.
+        """
+        entries = self.plan()
+        logging.info(
+            f"{self.command}: {self.total_files} file(s), {format_bytes(self.total_bytes)} to process"
+            + (f", {self.resumed} already done" if self.resumed else "")
+        )
+        start = time.monotonic()
+        reporter = threading.Thread(target=self._report_progress, args=(start,), name="bulk-progress", daemon=True)
+        reporter.start()
+        executor = ThreadPoolExecutor(self.workers, thread_name_prefix="bulk-worker")
+        pending = set()
+        try:
+            for entry in entries:
+                # Bound the number of queued futures; the plan may hold millions of files
+                if len(pending) >= self.workers * 2:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(executor.submit(self._process, *entry))
+            wait(pending)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._stopped.set()
+            reporter.join()
+            self.checkpoint.close()
+        if not self.failures:
+            self.checkpoint.clear()
+        return self.summary(time.monotonic() - start)
+
+    def summary(self, elapsed):
+        return {
+            'command': self.command,
+            'files': self.total_files,
+            'done': self.done,
+            'skipped': self.skipped,
+            'failed': len(self.failures),
+            'resumed': self.resumed,
+            'bytes': self.done_bytes,
+            'seconds': round(elapsed, 1),
+            'failures': [{'path': str(path), 'error': reason} for path, reason in self.failures],
+        }
+
+    def _process(self, path, size, mtime):
+        checkpointed = (size, mtime)
+        try:
+            if self.command == 'encrypt-all':
+                result = self.sync_manager.handle_local_change(path, force=True)
+            elif self.command == 'restore-all':
+                result = self.sync_manager.handle_sync_folder_change(path, force=True)
+            elif self.command == 'rotate-key':
+                # Checkpoint the re-encrypted file, so a resumed run skips it
+                st = self._rotate(path)
+                result, checkpointed = True, (st.st_size, st.st_mtime)
+            else:
+                result = self._verify(path)
+            error = None if result is not False else "failed, queued for retry (see log)"
+        except Exception as e:
+            result, error = False, str(e)
+        with self._lock:
+            if error:
+                self.failures.append((path, error))
+                return
+            if result is None:
+                self.skipped += 1
+            else:
+                self.done += 1
+            self.done_bytes += size
+        self.checkpoint.add(str(path), *checkpointed)
+
+    def _verify(self, path):
+        # Decrypt the ciphertext of a local file and compare checksums
+        sync_manager = self.sync_manager
+        rel_path = path.relative_to(sync_manager.local_path)
+        encrypted = sync_manager._encrypted_path_for(rel_path)
+        if not os.path.exists(encrypted):
+            raise FileNotFoundError("no encrypted copy in the sync folder")
+        if not sync_manager.remote_guard.check(encrypted):
+            raise ValueError("encrypted copy is outside the sync folder or traverses a symlink")
+        with sync_manager.local_guard.open(path) as f:
+            expected = sha256_stream(f)
+        size = os.path.getsize(encrypted)
+        with sync_manager.staging.reserve(size) as in_memory:
+            if in_memory:
+                with sync_manager.remote_guard.open(encrypted) as f:
+                    actual = hashlib.sha256(sync_manager.pgp_handler.decrypt_data(f.read())).hexdigest()
+            else:
+                fd, temp_path = tempfile.mkstemp(prefix=".verify.", suffix=".partial", dir=sync_manager.decrypted_path)
+                os.close(fd)
+                try:
+                    with sync_manager.remote_guard.open(encrypted) as f:
+                        sync_manager.pgp_handler.decrypt_file(encrypted, temp_path, source=f)
+                    with open(temp_path, 'rb') as f:
+                        actual = sha256_stream(f)
+                finally:
+                    os.remove(temp_path)
+        if actual != expected:
+            raise ValueError("decrypted content differs from the local file")
+        return True
+
+    def _rotate(self, path):
+        # Re-encrypt one ciphertext, and its version record, to the new key.
+        # Returns the stat of the new ciphertext, taken before it is published:
+        # with group durability it may not be in place yet
+        sync_manager = self.sync_manager
+        if not sync_manager.remote_guard.check(path):
+            raise ValueError("outside the sync folder or traverses a symlink")
+        before = os.stat(path)
+        old_digest = None
+        rotated = {}
+
+        def write(temp_path):
+            sync_manager.pgp_handler.reencrypt_file(path, temp_path, self.recipient)
+            current = os.stat(path)
+            if (current.st_size, current.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+                raise RuntimeError("changed while being re-encrypted; run again to pick up the new version")
+            rotated['stat'] = os.stat(temp_path)
+            rotated['sha256'] = sha256_file(temp_path)
+
+        entry = sync_manager.fingerprints.get(sync_manager._remote_key(path))
+        if os.path.exists(str(path) + VERSION_SUFFIX) or entry is not None:
+            with open(path, 'rb') as f:
+                old_digest = sha256_stream(f)
+        sync_manager.sync_folder_client.publish(str(path), write)
+        # The version record names the ciphertext's hash; until the new ciphertext is
+        # published it still has to describe the old one. Devices attach a record
+        # arriving after its ciphertext
+        self._rotate_version(path, old_digest, rotated['sha256'])
+
+        # Keep recognising the ciphertext as already synced here
+        st = rotated['stat']
+        if entry is not None and entry['sha256'] == old_digest:
+            sync_manager.fingerprints.put(
+                sync_manager._remote_key(path), st.st_size, st.st_mtime_ns, rotated['sha256'],
+                entry['origin'], entry['source'], entry['source_size'], entry['source_mtime_ns'],
+            )
+        return st
+
+    def _rotate_version(self, path, old_digest, new_digest):
+        version_path = str(path) + VERSION_SUFFIX
+        try:
+            with open(version_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        pgp_handler = self.sync_manager.pgp_handler
+        metadata = json.loads(pgp_handler.decrypt_data(data))
+        if metadata.get('ciphertext_sha256') == old_digest:
+            metadata['ciphertext_sha256'] = new_digest
+        self.sync_manager.sync_folder_client.upload_bytes(
+            pgp_handler.encrypt_data(json.dumps(metadata).encode(), recipient=self.recipient), version_path
+        )
+
+    def _report_progress(self, start):
+        while not self._stopped.wait(self.progress_interval):
+            print(self.progress_line(time.monotonic() - start), file=self.out, flush=True)
+
+    def progress_line(self, elapsed):
+        with self._lock:
+            files = self.done + self.skipped + len(self.failures)
+            done_bytes = self.done_bytes
+        line = (
+            f"{self.command}: {files}/{self.total_files} files, "
+            f"{format_bytes(done_bytes)}/{format_bytes(self.total_bytes)}"
+        )
+        if elapsed > 0 and done_bytes:
+            rate = done_bytes / elapsed
+            line += f", {format_bytes(rate)}/s, ETA {format_duration((self.total_bytes - done_bytes) / rate)}"
+        elif elapsed > 0 and files:
+            line += f", ETA {format_duration((self.total_files - files) * elapsed / files)}"
+        return line
+
@@ -0,0 +1,152 @@
+import os
+import json
+import socket
+import logging
+import threading
+import socketserver
+
+try:
+    from .state import base_state_dir, state_dir
+except ImportError:
+    from state import base_state_dir, state_dir
+
+
+def socket_path(config):
+    """
+    Control socket path: `control.socket`, or control.sock in the state directory.
+
+    With `pairs` one socket serves every pair; the top level of the config
+    names no monitored path, so it goes in the base state directory.
+    """
+    control_config = config.get('control', {}) or {}
+    if control_config.get('socket'):
+        return control_config['socket']
+    directory = base_state_dir(config) if 'pairs' in config else state_dir(config)
+    return os.path.join(directory, 'control.sock')
+
+
+class _ControlRequestHandler(socketserver.StreamRequestHandler):
+    # One JSON object per line in, one JSON object per line out
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                response = {'ok': True, 'result': self.server.control.dispatch(request)}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response, default=str).encode() + b'\n')
+            self.wfile.flush()
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def available():
+    """Unix domain sockets are missing on some platforms (older Windows)."""
+    return hasattr(socket, 'AF_UNIX')
+
+
+class ControlServer:
+    def __init__(self, config, sync_manager, governor=None):
+        """
+        Accept runtime commands on a Unix domain socket.
+
+        Requests are JSON lines like {"command": "pause"}; every request gets
+        a JSON line {"ok": true, "result": ...} or {"ok": false, "error": ...}.
+        The socket is only accessible to the owner.
+
+        Args:
+            config: Application configuration
+            sync_manager: SyncManager (or SyncPairs) to control
+            governor: ResourceGovernor whose limits can be changed
+        """
+        self.path = socket_path(config)
+        self.sync_manager = sync_manager
+        self.server = None
+        self._thread = None
+        self.commands = {
+            'status': lambda request: self.sync_manager.status(),
+            'pause': lambda request: self.sync_manager.pause(),
+            'resume': lambda request: self.sync_manager.resume(),
+            'flush': self._flush,
+            'rescan': lambda request: {'queued': self.sync_manager.rescan(request.get('path'))},
+            'boost': self._boost,
+            'hydrate': self._hydrate,
+        }
+        if governor:
+            self.register('limits', lambda request: governor.update(**(request.get('limits') or {})))
+
+    def register(self, name, handler):
+        """Add a command; handler is called with the request dict."""
+        self.commands[name] = handler
+
+    def dispatch(self, request):
+        command = request.get('command')
+        handler = self.commands.get(command)
+        if handler is None:
+            raise ValueError(f"Unknown command '{command}', expected one of {', '.join(sorted(self.commands))}")
+        return handler(request)
+
+    def _flush(self, request):
+        self.sync_manager.retry_now()
+        self.sync_manager.flush(timeout=request.get('timeout'))
+
+    def _boost(self, request):
+        if not request.get('path'):
+            raise ValueError("boost needs a path")
+        return {'kind': self.sync_manager.boost(request['path'])}
+
+    def _hydrate(self, request):
+        if not request.get('path'):
+            raise ValueError("hydrate needs a path")
+        return {'hydrated': self.sync_manager.hydrate(request['path'])}
+
+    def start(self):
+        """Start serving in a background thread."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.server = _ThreadingUnixServer(self.path, _ControlRequestHandler)
+        self.server.control = self
+        os.chmod(self.path, 0o600)
+        self._thread = threading.Thread(target=self.server.serve_forever, name="control-server", daemon=True)
+        self._thread.start()
+        logging.info(f"Control socket listening on {self.path}")
+
+    def stop(self):
+        """Stop serving and remove the socket."""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def send_command(address, command, timeout=None, **args):
+    """
+    Send one command to a running daemon and return its result.
+
+    Raises:
+        ConnectionError: If no daemon is listening on address
+        RuntimeError: If the daemon rejected the command
+    """
+    request = dict(args, command=command)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(address)
+            sock.sendall(json.dumps(request).encode() + b'\n')
+            with sock.makefile('rb') as f:
+                line = f.readline()
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise ConnectionError(f"guardian-sync is not running (no control socket at {address})") from e
+    if not line:
+        raise ConnectionError(f"Control socket {address} closed the connection")
+    response = json.loads(line)
+    if not response.get('ok'):
+        raise RuntimeError(response.get('error', 'command failed'))
+    return response.get('result')
@@ -0,0 +1,124 @@
+import os
+import logging
+import threading
+
+DURABILITY_MODES = ('none', 'fsync', 'group')
+
+
+def fsync_path(path):
+    """Flush a file or directory to stable storage."""
+    flags = os.O_RDONLY
+    if os.path.isdir(path):
+        # Directories cannot be opened (or fsynced) on Windows
+        if os.name == 'nt':
+            return
+        flags |= getattr(os, 'O_DIRECTORY', 0)
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Durability:
+    def __init__(self, config):
+        """
+        Publish staged files into place according to the configured durability policy.
+
+        Modes (`sync.durability`):
+            none:  atomic rename only, no fsync (default)
+            fsync: fsync each file before its rename and its directory after
+            group: collect published files and every `sync.group_commit_ms`
+                   fsync the whole batch, rename it into place and fsync the
+                   affected directories once
+
+        Args:
+            config: Application configuration
+        """
+        sync_config = config.get('sync', {}) or {}
+        self.mode = sync_config.get('durability', 'none')
+        if self.mode not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode '{self.mode}', expected one of {', '.join(DURABILITY_MODES)}")
+        self.group_commit_ms = int(sync_config.get('group_commit_ms', 200))
+
+        # dest_path -> staged temp path, waiting for the next group commit
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def publish(self, temp_path, dest_path):
+        """Atomically move a fully written temp file to dest_path."""
+        if self.mode == 'none':
+            os.replace(temp_path, dest_path)
+        elif self.mode == 'fsync':
+            fsync_path(temp_path)
+            os.replace(temp_path, dest_path)
+            fsync_path(os.path.dirname(dest_path))
+        else:
+            with self._lock:
+                superseded = self.pending.pop(dest_path, None)
+                self.pending[dest_path] = temp_path
+                self._ensure_thread()
+            if superseded:
+                # A newer version replaces it in the same batch
+                self._remove(superseded)
+            if self._stopped.is_set():
+                self.flush()
+            else:
+                self._wakeup.set()
+
+    def flush(self):
+        """Commit all pending files of a group batch."""
+        with self._lock:
+            batch = self.pending
+            self.pending = {}
+        if not batch:
+            return
+        directories = set()
+        for dest_path, temp_path in batch.items():
+            try:
+                fsync_path(temp_path)
+                os.replace(temp_path, dest_path)
+                directories.add(os.path.dirname(dest_path))
+            except Exception as e:
+                logging.error(f"Failed to publish {dest_path}: {str(e)}")
+                self._remove(temp_path)
+        for directory in directories:
+            try:
+                fsync_path(directory)
+            except OSError as e:
+                logging.warning(f"Failed to fsync directory {directory}: {str(e)}")
+
+    def close(self):
+        """Stop the group commit thread and commit whatever is still pending."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _ensure_thread(self):
+        # Called with self._lock held
+        if self._thread is None and not self._stopped.is_set():
+            self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # Let the batch fill up before committing it
+            if self._stopped.wait(self.group_commit_ms / 1000):
+                break
+            self.flush()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Failed to clean up {path}: {str(e)}")
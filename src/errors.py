@@ -0,0 +1,2 @@
+class CorruptCiphertextError(RuntimeError):
+    """Raised when a ciphertext is truncated or malformed, e.g. while still being downloaded."""
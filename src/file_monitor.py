@@ -2,28 +2,55 @@ import os
 import time
 import logging
 from pathlib import Path
-from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+try:
+    from .ignore_rules import IgnoreRules, WatchSet, new_observer
+    from .metrics import EVENTS
+except ImportError:
+    from ignore_rules import IgnoreRules, WatchSet, new_observer
+    from metrics import EVENTS
+
 class FileChangeHandler(FileSystemEventHandler):
-    def __init__(self, callback):
-        """Initialize file change handler with callback function."""
+    def __init__(self, callback, directory_callback=None, ignore=None, created_directory_callback=None):
+        """
+        Initialize file change handler with callback function.
+
+        directory_callback, if given, is called with the path of every
+        directory that is moved or deleted, created_directory_callback with
+        every directory that is created or moved in. Events for paths matched
+        by the ignore rules are dropped before anything else happens.
+        """
         self.callback = callback
+        self.directory_callback = directory_callback
+        self.created_directory_callback = created_directory_callback
+        self.ignore = ignore
         self.last_modified = {}
+
+    def _ignored(self, path, is_directory):
+        if self.ignore and self.ignore.ignored(path, is_directory):
+            EVENTS.inc(handler='local', outcome='ignored')
+            return True
+        return False
         
     def on_modified(self, event):
         """Handle file modification events."""
+        EVENTS.inc(handler='local', outcome='received')
+        if self._ignored(event.src_path, event.is_directory):
+            return
         if event.is_directory:
+            EVENTS.inc(handler='local', outcome='dropped')
             return
             
-        # Get absolute path
-        path = Path(event.src_path).resolve()
+        # Get absolute path; symlinks are rejected later, not resolved here
+        path = Path(os.path.abspath(event.src_path))
         
         # Check if this is a duplicate event (some file systems trigger multiple events)
         current_time = time.time()
         if path in self.last_modified:
             # Ignore events that happen within 1 second of the last event for this file
             if current_time - self.last_modified[path] < 1:
+                EVENTS.inc(handler='local', outcome='deduplicated')
                 return
                 
         self.last_modified[path] = current_time
@@ -33,42 +60,89 @@ class FileChangeHandler(FileSystemEventHandler):
         
     def on_created(self, event):
         """Handle file creation events."""
+        EVENTS.inc(handler='local', outcome='received')
+        if self._ignored(event.src_path, event.is_directory):
+            return
         if event.is_directory:
+            EVENTS.inc(handler='local', outcome='dropped')
+            if self.created_directory_callback:
+                self.created_directory_callback(event.src_path)
             return
             
-        # Get absolute path
-        path = Path(event.src_path).resolve()
+        # Get absolute path; symlinks are rejected later, not resolved here
+        path = Path(os.path.abspath(event.src_path))
         
         # Call the callback with the created file path
         self.callback(path)
 
+    def on_moved(self, event):
+        """Handle renames; a renamed file is synced under its new name."""
+        if not event.is_directory:
+            EVENTS.inc(handler='local', outcome='received')
+            if self._ignored(event.dest_path, False):
+                return
+            self.callback(Path(os.path.abspath(event.dest_path)))
+            return
+        if self.directory_callback:
+            self.directory_callback(event.src_path)
+        if self.created_directory_callback and not self._ignored(event.dest_path, True):
+            self.created_directory_callback(event.dest_path)
+
+    def on_deleted(self, event):
+        """Handle directory deletions, for cached path checks."""
+        if event.is_directory and self.directory_callback:
+            self.directory_callback(event.src_path)
+
 class FileMonitor:
-    def __init__(self, directory, callback):
+    def __init__(self, directory, callback, directory_callback=None, ignore_rules=None, observer=None):
         """
         Initialize file monitor for a directory.
         
         Args:
             directory: Directory to monitor
             callback: Function to call when a file changes
+            directory_callback: Function to call when a directory is moved or deleted
+            ignore_rules: IgnoreRules for the directory; ignored directories get no watch
+            observer: Watchdog observer shared with other monitors; started and stopped by its owner
         """
         self.directory = Path(directory).resolve()
         self.callback = callback
+        self.directory_callback = directory_callback
+        self.ignore_rules = ignore_rules if ignore_rules is not None else IgnoreRules(self.directory)
+        self.shared_observer = observer
         self.observer = None
+        self.watches = None
         
         # Create directory if it doesn't exist
         os.makedirs(self.directory, exist_ok=True)
         
     def start(self):
         """Start monitoring the directory."""
-        event_handler = FileChangeHandler(self.callback)
-        self.observer = Observer()
-        self.observer.schedule(event_handler, str(self.directory), recursive=True)
-        self.observer.start()
+        event_handler = FileChangeHandler(
+            self.callback, self._directory_removed, self.ignore_rules, self._directory_created
+        )
+        self.observer = self.shared_observer or new_observer()
+        self.watches = WatchSet(self.observer, event_handler, self.directory, self.ignore_rules)
+        self.watches.schedule()
+        if self.shared_observer is None:
+            self.observer.start()
         logging.info(f"Started monitoring {self.directory}")
         
+    def _directory_created(self, path):
+        self.watches.directory_created(path)
+
+    def _directory_removed(self, path):
+        self.watches.directory_removed(path)
+        if self.directory_callback:
+            self.directory_callback(path)
+
     def stop(self):
         """Stop monitoring the directory."""
-        if self.observer:
+        if self.shared_observer is not None:
+            if self.watches:
+                self.watches.unschedule_all()
+                logging.info(f"Stopped monitoring {self.directory}")
+        elif self.observer:
             self.observer.stop()
             self.observer.join()
             logging.info(f"Stopped monitoring {self.directory}") 
\ No newline at end of file
@@ -0,0 +1,74 @@
+import hashlib
+import sqlite3
+import threading
+
+HASH_CHUNK = 1024 * 1024
+COLUMNS = ('size', 'mtime_ns', 'sha256', 'origin', 'source', 'source_size', 'source_mtime_ns')
+
+
+def sha256_stream(f):
+    """Hex SHA-256 of a binary stream, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sha256_file(path):
+    with open(path, 'rb') as f:
+        return sha256_stream(f)
+
+
+class FingerprintIndex:
+    def __init__(self, path):
+        """
+        Persisted fingerprints of the ciphertexts in the encrypted folder.
+
+        For every ciphertext (keyed by its '/'-separated path below the
+        encrypted folder) the index keeps the size, mtime and SHA-256 it had
+        when it was last decrypted ('decrypted') or produced from a local file
+        ('uploaded'), plus the plaintext file involved and that file's size and
+        mtime at the time. Entries are dicts with these keys.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL, origin TEXT NOT NULL, source TEXT,"
+            " source_size INTEGER, source_mtime_ns INTEGER)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM fingerprints WHERE path = ?", (key,)
+            ).fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+
+    def put(self, key, size, mtime_ns, sha256, origin, source, source_size=None, source_mtime_ns=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO fingerprints (path, size, mtime_ns, sha256, origin, source,"
+                " source_size, source_mtime_ns) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, size, mtime_ns, sha256, origin, str(source), source_size, source_mtime_ns),
+            )
+
+    def touch(self, key, mtime_ns):
+        """Record a new mtime for a ciphertext whose content was found unchanged."""
+        with self._lock:
+            self._db.execute("UPDATE fingerprints SET mtime_ns = ? WHERE path = ?", (mtime_ns, key))
+
+    def forget(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM fingerprints WHERE path = ?", (key,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,207 @@
+import os
+import time
+import ctypes
+import logging
+import platform
+import threading
+
+MB = 1000 * 1000
+
+# ioprio_set(2) has no wrapper in the os module; syscall numbers per architecture
+_IOPRIO_SET_SYSCALL = {
+    'x86_64': 251, 'amd64': 251, 'i386': 289, 'i686': 289,
+    'aarch64': 30, 'arm64': 30, 'riscv64': 30,
+    'armv7l': 314, 'armv8l': 314, 'ppc64le': 273, 's390x': 282,
+}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+IONICE_CLASSES = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+
+
+class TokenBucket:
+    def __init__(self, rate=None):
+        """
+        Limit a byte stream to `rate` bytes per second, with up to one second of burst.
+
+        consume() may overdraw the bucket for a large chunk; the next caller
+        then waits until the debt is paid off, so the average rate holds.
+        A rate of None or 0 means unlimited.
+        """
+        self.rate = rate or None
+        self.tokens = float(rate or 0)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate or None
+            self.tokens = min(self.tokens, float(rate or 0))
+
+    def consume(self, size):
+        """Take size bytes from the bucket, sleeping while it is in debt."""
+        if not size or self.rate is None:
+            return
+        with self._lock:
+            rate = self.rate
+            if rate is None:
+                return
+            now = time.monotonic()
+            self.tokens = min(rate, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            self.tokens -= size
+            wait = -self.tokens / rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class ResizableSemaphore:
+    def __init__(self, limit=None):
+        """Semaphore whose limit can change while held; None or 0 means unlimited."""
+        self.limit = limit or None
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    def set_limit(self, limit):
+        with self._cond:
+            self.limit = limit or None
+            self._cond.notify_all()
+
+    def acquire(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self.limit is None or self.in_use < self.limit)
+            self.in_use += 1
+
+    def release(self):
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class ThrottledReader:
+    def __init__(self, stream, bucket):
+        """File-like wrapper charging every read to a TokenBucket."""
+        self.stream = stream
+        self.bucket = bucket
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.bucket.consume(len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def _parse_ionice(value):
+    # "idle", "best-effort", "best-effort:7" -> (class, level)
+    if not value:
+        return None
+    name, _, level = str(value).partition(':')
+    if name not in IONICE_CLASSES:
+        raise ValueError(f"Unknown ionice class '{name}', expected one of {', '.join(IONICE_CLASSES)}")
+    return IONICE_CLASSES[name], int(level or 4)
+
+
+class ResourceGovernor:
+    LIMITS = ('max_read_mbps', 'max_write_mbps', 'max_gpg_processes', 'gpg_nice', 'gpg_ionice')
+
+    def __init__(self, config):
+        """
+        Bandwidth, concurrency and priority limits for sync work.
+
+        Reads from `sync.max_read_mbps` / `sync.max_write_mbps` (MB/s through
+        the sync folder client and gpg pipes), `sync.max_gpg_processes`
+        (concurrent gpg calls), `sync.gpg_nice` (niceness of gpg processes)
+        and `sync.gpg_ionice` ("idle", "best-effort[:level]" or
+        "realtime[:level]"). All limits can be changed at runtime with update().
+
+        Args:
+            config: Application configuration
+        """
+        self.read_bucket = TokenBucket()
+        self.write_bucket = TokenBucket()
+        self.gpg_slots = ResizableSemaphore()
+        self.limits = dict.fromkeys(self.LIMITS)
+        self._ioprio_warned = False
+        sync_config = config.get('sync', {}) or {}
+        self.update(**{key: sync_config.get(key) for key in self.LIMITS})
+
+    def update(self, **limits):
+        """Change limits; keys not given stay as they are, None removes a limit."""
+        for key, value in limits.items():
+            if key not in self.LIMITS:
+                raise ValueError(f"Unknown limit '{key}', expected one of {', '.join(self.LIMITS)}")
+            if key == 'gpg_ionice':
+                _parse_ionice(value)
+            elif value is not None:
+                value = float(value) if key.endswith('mbps') else int(value)
+            self.limits[key] = value
+        self.read_bucket.set_rate(int((self.limits['max_read_mbps'] or 0) * MB))
+        self.write_bucket.set_rate(int((self.limits['max_write_mbps'] or 0) * MB))
+        self.gpg_slots.set_limit(self.limits['max_gpg_processes'])
+        active = {key: value for key, value in self.limits.items() if value is not None}
+        if active:
+            logging.info(f"Resource limits: {active}")
+        return self.snapshot()
+
+    def snapshot(self):
+        return dict(self.limits, gpg_processes_running=self.gpg_slots.in_use)
+
+    def reader(self, stream):
+        """Wrap a stream so reading it is limited by max_read_mbps."""
+        if self.read_bucket.rate is None:
+            return stream
+        return ThrottledReader(stream, self.read_bucket)
+
+    def read(self, size):
+        """Charge size bytes read outside a wrapped stream."""
+        self.read_bucket.consume(size)
+
+    def written(self, size):
+        """Charge size bytes written; blocks while over max_write_mbps."""
+        self.write_bucket.consume(size)
+
+    def instrument(self, gpg):
+        """Apply nice/ionice to every process the gnupg.GPG instance spawns."""
+        open_subprocess = getattr(gpg, '_open_subprocess', None)
+        if open_subprocess is None:
+            logging.warning("This python-gnupg version cannot be instrumented; gpg priority limits are ignored")
+            return
+
+        def open_with_priority(*args, **kwargs):
+            process = open_subprocess(*args, **kwargs)
+            self.apply_priority(process.pid)
+            return process
+
+        gpg._open_subprocess = open_with_priority
+
+    def apply_priority(self, pid):
+        nice = self.limits['gpg_nice']
+        if nice is not None and hasattr(os, 'setpriority'):
+            try:
+                os.setpriority(os.PRIO_PROCESS, pid, nice)
+            except OSError as e:
+                logging.debug(f"Failed to renice gpg process {pid}: {e}")
+        ionice = _parse_ionice(self.limits['gpg_ionice'])
+        if ionice is not None:
+            self._set_ioprio(pid, *ionice)
+
+    def _set_ioprio(self, pid, io_class, level):
+        number = _IOPRIO_SET_SYSCALL.get(platform.machine().lower())
+        if number is None or not platform.system() == 'Linux':
+            if not self._ioprio_warned:
+                logging.warning("gpg_ionice is only supported on Linux; ignoring it")
+                self._ioprio_warned = True
+            return
+        libc = ctypes.CDLL(None, use_errno=True)
+        ioprio = (io_class << _IOPRIO_CLASS_SHIFT) | level
+        if libc.syscall(number, _IOPRIO_WHO_PROCESS, pid, ioprio) != 0:
+            logging.debug(f"Failed to set I/O priority of gpg process {pid}: errno {ctypes.get_errno()}")
@@ -0,0 +1,216 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+try:
+    from .ignore_rules import IgnoreRules
+except ImportError:
+    from ignore_rules import IgnoreRules
+
+HYDRATION_MODES = ('eager', 'selective')
+
+
+class HydrationPolicy:
+    def __init__(self, config, root):
+        """
+        Decide which sync folder files are decrypted as soon as they arrive.
+
+        Reads `sync.hydration`. In the default `eager` mode everything is
+        decrypted. In `selective` mode only the working set is: files matching
+        one of the gitignore-style `include` patterns or changed within the
+        last `max_age_days` days, and no larger than `max_file_bytes`. Without
+        include patterns or an age limit, every file within the size limit is
+        in the working set. The rest stay encrypted until hydrated on request.
+
+        Decrypted files beyond `disk_budget_bytes` in total are evicted, least
+        recently used first.
+
+        Args:
+            config: Application configuration
+            root: Encrypted folder the include patterns are relative to
+        """
+        hydration_config = (config.get('sync', {}) or {}).get('hydration', {}) or {}
+        self.mode = hydration_config.get('mode', 'eager')
+        if self.mode not in HYDRATION_MODES:
+            raise ValueError(f"Unknown hydration mode '{self.mode}', expected one of {', '.join(HYDRATION_MODES)}")
+        include = hydration_config.get('include') or []
+        self.include = IgnoreRules(root, include) if include else None
+        max_age_days = hydration_config.get('max_age_days')
+        self.max_age = float(max_age_days) * 86400 if max_age_days is not None else None
+        max_file_bytes = hydration_config.get('max_file_bytes')
+        self.max_file_bytes = int(max_file_bytes) if max_file_bytes is not None else None
+        disk_budget_bytes = hydration_config.get('disk_budget_bytes')
+        self.disk_budget_bytes = int(disk_budget_bytes) if disk_budget_bytes is not None else None
+
+    @property
+    def selective(self):
+        return self.mode == 'selective'
+
+    def wanted(self, rel_path, size, mtime):
+        """True if the ciphertext at rel_path ('/'-separated, relative to the encrypted folder) is in the working set."""
+        if self.max_file_bytes is not None and size > self.max_file_bytes:
+            return False
+        if self.include is None and self.max_age is None:
+            return True
+        if self.include is not None:
+            plain = rel_path[:-4] if rel_path.endswith('.gpg') else rel_path
+            if self.include.match(plain):
+                return True
+        return self.max_age is not None and time.time() - mtime <= self.max_age
+
+
+class Catalog:
+    def __init__(self, path):
+        """
+        SQLite catalog of the sync folder files known in selective hydration mode.
+
+        One row per ciphertext (keyed by its path relative to the encrypted
+        folder) with the plaintext path it decrypts to, whether it is
+        currently hydrated, and the plaintext size/mtime written at hydration
+        time, so a plaintext changed locally since is never evicted.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, plaintext TEXT NOT NULL, size INTEGER, mtime REAL,"
+            " hydrated INTEGER NOT NULL DEFAULT 0, requested INTEGER NOT NULL DEFAULT 0,"
+            " plain_size INTEGER, plain_mtime_ns INTEGER, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_plaintext ON files (plaintext)")
+
+    def record(self, rel_path, plaintext, size, mtime):
+        """Add or update a ciphertext that is left encrypted for now."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO files (path, plaintext, size, mtime) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET plaintext = excluded.plaintext,"
+                " size = excluded.size, mtime = excluded.mtime",
+                (rel_path, str(plaintext), size, mtime),
+            )
+
+    def hydrated(self, rel_path, plaintext, size, mtime):
+        """Mark a ciphertext as decrypted to plaintext, which exists now."""
+        st = os.stat(plaintext)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO files (path, plaintext, size, mtime, hydrated, plain_size, plain_mtime_ns, last_used)"
+                " VALUES (?, ?, ?, ?, 1, ?, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET plaintext = excluded.plaintext, size = excluded.size,"
+                " mtime = excluded.mtime, hydrated = 1, plain_size = excluded.plain_size,"
+                " plain_mtime_ns = excluded.plain_mtime_ns, last_used = excluded.last_used",
+                (rel_path, str(plaintext), size, mtime, st.st_size, st.st_mtime_ns, time.time()),
+            )
+
+    def request(self, rel_path):
+        """Keep a ciphertext hydrated from now on, until it is evicted."""
+        with self._lock:
+            self._db.execute("UPDATE files SET requested = 1 WHERE path = ?", (rel_path,))
+
+    def is_kept(self, rel_path):
+        """True if rel_path was requested or is hydrated, so new versions are decrypted too."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT hydrated OR requested FROM files WHERE path = ?", (rel_path,)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def matching(self, rel_prefix=None, plaintext_prefix=None):
+        """Ciphertext paths equal to or below a ciphertext or plaintext path prefix."""
+        column, prefix = ('path', rel_prefix) if rel_prefix is not None else ('plaintext', str(plaintext_prefix))
+        separator = '/' if column == 'path' else os.sep
+        with self._lock:
+            if not prefix:
+                rows = self._db.execute("SELECT path FROM files ORDER BY path").fetchall()
+            else:
+                rows = self._db.execute(
+                    f"SELECT path FROM files WHERE {column} = ? OR {column} = ?"
+                    f" OR substr({column}, 1, ?) = ? ORDER BY path",
+                    (prefix, prefix + '.gpg', len(prefix) + 1, prefix + separator),
+                ).fetchall()
+        return [row[0] for row in rows]
+
+    def hydrated_files(self):
+        """[(path, plaintext, plain_size, plain_mtime_ns, last_used)] of all hydrated ciphertexts."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT path, plaintext, plain_size, plain_mtime_ns, last_used FROM files WHERE hydrated = 1"
+            ).fetchall()
+
+    def hydrated_bytes(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(plain_size), 0) FROM files WHERE hydrated = 1").fetchone()[0]
+
+    def evicted(self, rel_path):
+        with self._lock:
+            self._db.execute(
+                "UPDATE files SET hydrated = 0, requested = 0, plain_size = NULL, plain_mtime_ns = NULL"
+                " WHERE path = ?", (rel_path,)
+            )
+
+    def stats(self):
+        with self._lock:
+            files, hydrated, hydrated_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hydrated), 0),"
+                " COALESCE(SUM(CASE WHEN hydrated = 1 THEN plain_size END), 0) FROM files"
+            ).fetchone()
+        return {'files': files, 'hydrated': hydrated, 'hydrated_bytes': hydrated_bytes}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def evict_to_budget(catalog, budget, keep=None):
+    """
+    Delete hydrated plaintexts, least recently used first, until their total
+    size fits in budget. A plaintext is only deleted while it is exactly as
+    it was decrypted, since the ciphertext can then restore it.
+
+    Args:
+        catalog: Catalog of hydrated files
+        budget: Disk budget in bytes
+        keep: Ciphertext path that must not be evicted (the one just hydrated)
+
+    Returns:
+        Number of files evicted
+    """
+    total = catalog.hydrated_bytes()
+    if budget is None or total <= budget:
+        return 0
+    candidates = []
+    for rel_path, plaintext, plain_size, plain_mtime_ns, last_used in catalog.hydrated_files():
+        if rel_path == keep:
+            continue
+        try:
+            st = os.stat(plaintext)
+        except FileNotFoundError:
+            # Deleted by the user; it no longer takes up space
+            catalog.evicted(rel_path)
+            total -= plain_size or 0
+            continue
+        except OSError:
+            continue
+        if (st.st_size, st.st_mtime_ns) != (plain_size, plain_mtime_ns):
+            continue
+        # Reads show up in atime where the filesystem records it
+        candidates.append((max(last_used or 0, st.st_atime), rel_path, plaintext, plain_size))
+    evicted = 0
+    for _, rel_path, plaintext, plain_size in sorted(candidates):
+        if total <= budget:
+            break
+        try:
+            os.remove(plaintext)
+        except OSError as e:
+            logging.warning(f"Failed to evict {plaintext}: {str(e)}")
+            continue
+        catalog.evicted(rel_path)
+        total -= plain_size
+        evicted += 1
+    if evicted:
+        logging.info(f"Evicted {evicted} decrypted file(s) to stay within the hydration disk budget")
+    return evicted
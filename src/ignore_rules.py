@@ -0,0 +1,351 @@
+import os
+import re
+import logging
+
+IGNORE_FILE = '.guardianignore'
+
+
+class _Rule:
+    __slots__ = ('pattern', 'negate', 'dir_only', 'anchored', 'literal', 'body')
+
+    def __init__(self, pattern, negate, dir_only, anchored, literal, body):
+        self.pattern = pattern
+        self.negate = negate
+        self.dir_only = dir_only
+        self.anchored = anchored
+        self.literal = literal  # pattern without wildcards, escapes removed
+        self.body = body  # regex source for the pattern itself
+
+
+def _translate(pattern):
+    """Regex source for a gitignore glob, and its literal form if it has no wildcards."""
+    out = []
+    literal = []
+    has_wildcard = False
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '\\' and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            literal.append(pattern[i + 1])
+            i += 2
+            continue
+        if c == '*':
+            has_wildcard = True
+            if pattern.startswith('**', i):
+                before = i == 0 or pattern[i - 1] == '/'
+                after = i + 2 == n or pattern[i + 2] == '/'
+                if before and after:
+                    if i + 2 == n:
+                        out.append('.*')  # "a/**" matches everything inside a
+                    else:
+                        out.append('(?:.*/)?')  # "**/" matches zero or more directories
+                        i += 1
+                    i += 2
+                    continue
+            out.append('[^/]*')
+        elif c == '?':
+            has_wildcard = True
+            out.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+                literal.append(c)
+            else:
+                has_wildcard = True
+                content = pattern[i + 1:end]
+                if content[0] in '!^':
+                    content = '^' + content[1:]
+                out.append('[' + content.replace('\\', '\\\\') + ']')
+                i = end
+        else:
+            out.append(re.escape(c))
+            literal.append(c)
+        i += 1
+    return ''.join(out), None if has_wildcard else ''.join(literal)
+
+
+def parse_rule(line):
+    """Parse one line of an ignore file. Returns None for blank lines and comments."""
+    line = line.rstrip('\n').rstrip('\r')
+    # Trailing spaces are ignored unless escaped
+    while line.endswith(' ') and not line.endswith('\\ '):
+        line = line[:-1]
+    if not line or line.startswith('#'):
+        return None
+    negate = line.startswith('!')
+    if negate:
+        line = line[1:]
+    elif line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    anchored = '/' in line
+    line = line.lstrip('/')
+    body, literal = _translate(line)
+    return _Rule(line, negate, dir_only, anchored, literal, body)
+
+
+class IgnoreRules:
+    def __init__(self, root, lines=()):
+        """
+        Gitignore-style ignore rules for the files below root.
+
+        Patterns are compiled once into the cheapest structure that can
+        evaluate them: plain names go into sets, anchored literal paths into a
+        prefix trie, and all remaining globs into a single combined regex.
+        Negated patterns make the outcome depend on rule order, so their
+        presence switches to evaluating the rules one by one.
+
+        A path is ignored when it or any of its parent directories matches.
+
+        Args:
+            root: Directory the patterns are relative to
+            lines: Lines of an ignore file
+        """
+        self.root = os.path.abspath(root)
+        self._prefix = self.root + os.sep
+        self.rules = [rule for rule in map(parse_rule, lines) if rule is not None]
+        self._names = set()
+        self._dir_names = set()
+        self._trie = {}
+        self._ordered = None
+        self._regex = None
+
+        if any(rule.negate for rule in self.rules):
+            self._ordered = [
+                (re.compile(('^' if rule.anchored else '^(?:.*/)?') + rule.body + '$'), rule)
+                for rule in self.rules
+            ]
+            return
+
+        globs = []
+        for rule in self.rules:
+            if rule.literal is not None and not rule.anchored:
+                (self._dir_names if rule.dir_only else self._names).add(rule.literal)
+            elif rule.literal is not None:
+                node = self._trie
+                for part in rule.literal.split('/'):
+                    node = node.setdefault(part, {})
+                # None marks a match; True if it only matches directories
+                node[None] = node.get(None, True) and rule.dir_only
+            else:
+                start = '^' if rule.anchored else '(?:^|/)'
+                end = '/' if rule.dir_only else '(?:/|$)'
+                globs.append(start + rule.body + end)
+        if globs:
+            self._regex = re.compile('|'.join(f'(?:{g})' for g in globs))
+
+    @classmethod
+    def load(cls, root, ignore_file=IGNORE_FILE, builtin=()):
+        """
+        Read the ignore file (relative to root unless absolute); missing files mean no rules.
+
+        builtin lines are added after the file's, so the file cannot re-include them.
+        """
+        path = os.path.join(root, ignore_file)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            lines = []
+        except OSError as e:
+            logging.warning(f"Failed to read ignore file {path}: {str(e)}")
+            lines = []
+        rules = cls(root, list(lines) + list(builtin))
+        if len(rules.rules) > len(builtin):
+            logging.info(f"Loaded {len(rules.rules) - len(builtin)} ignore rule(s) from {path}")
+        return rules
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def ignored(self, path, is_dir=False):
+        """True if path (absolute, or relative to the root) is ignored."""
+        if not self.rules:
+            return False
+        path = os.fspath(path)
+        if os.path.isabs(path):
+            if not path.startswith(self._prefix):
+                path = os.path.abspath(path)
+                if not path.startswith(self._prefix):
+                    return False
+            path = path[len(self._prefix):]
+        if os.sep != '/':
+            path = path.replace(os.sep, '/')
+        if not path:
+            return False
+        return self.match(path, is_dir)
+
+    def match(self, rel_path, is_dir=False):
+        """True if the '/'-separated path relative to the root is ignored."""
+        parts = rel_path.split('/')
+        if self._ordered is not None:
+            return self._match_ordered(parts, is_dir)
+
+        last = len(parts) - 1
+        node = self._trie
+        for i, part in enumerate(parts):
+            part_is_dir = i < last or is_dir
+            if part in self._names or (part_is_dir and part in self._dir_names):
+                return True
+            if node is not None:
+                node = node.get(part)
+                if node is not None and None in node and (part_is_dir or not node[None]):
+                    return True
+        if self._regex is not None:
+            return self._regex.search(rel_path + '/' if is_dir else rel_path) is not None
+        return False
+
+    def _match_ordered(self, parts, is_dir):
+        # Git semantics: the last matching rule wins, and nothing below an
+        # ignored directory can be re-included
+        for i in range(1, len(parts) + 1):
+            sub = '/'.join(parts[:i])
+            sub_is_dir = i < len(parts) or is_dir
+            ignored = False
+            for regex, rule in self._ordered:
+                if rule.dir_only and not sub_is_dir:
+                    continue
+                if regex.match(sub):
+                    ignored = not rule.negate
+            if ignored:
+                return True
+        return False
+
+
+def plan_watches(root, rules):
+    """
+    Decide which directories to watch so that ignored directories get no watch.
+
+    Subtrees without ignored directories are covered by one recursive watch.
+    Directories containing ignored directories get a non-recursive watch and
+    the plan continues into their non-ignored children.
+
+    Returns:
+        List of (directory, recursive) tuples
+    """
+    root = os.path.abspath(root)
+    if not rules:
+        return [(root, True)]
+
+    def walk(directory, rel):
+        # Returns (clean, plan) for the subtree at directory
+        children = []
+        dirty = False
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                    child_rel = f"{rel}/{entry.name}" if rel else entry.name
+                    if rules.match(child_rel, is_dir=True):
+                        dirty = True
+                        continue
+                    children.append((entry.path, child_rel))
+        except OSError as e:
+            logging.warning(f"Failed to scan {directory}: {str(e)}")
+            return True, [(directory, True)]
+        child_plans = [walk(path, child_rel) for path, child_rel in children]
+        if not dirty and all(clean for clean, _ in child_plans):
+            return True, [(directory, True)]
+        plan = [(directory, False)]
+        for _, child_plan in child_plans:
+            plan.extend(child_plan)
+        return False, plan
+
+    return walk(root, '')[1]
+
+
+def new_observer():
+    """A watchdog Observer; watchdog picks and imports its platform backend only here."""
+    from watchdog.observers import Observer
+    return Observer()
+
+
+class WatchSet:
+    def __init__(self, observer, handler, root, rules):
+        """
+        Watches scheduled on an observer according to plan_watches().
+
+        Directories created later below a non-recursive watch are not covered
+        by any watch, so the owner calls directory_created() for them.
+        """
+        self.observer = observer
+        self.handler = handler
+        self.root = os.path.abspath(root)
+        self.rules = rules
+        self.watches = {}  # directory -> (ObservedWatch, recursive)
+
+    def schedule(self):
+        plan = plan_watches(self.root, self.rules)
+        for directory, recursive in plan:
+            self._add(directory, recursive)
+        if len(plan) > 1:
+            logging.info(f"Watching {self.root} with {len(plan)} watches, skipping ignored directories")
+
+    def _add(self, directory, recursive):
+        if directory in self.watches:
+            return
+        try:
+            watch = self.observer.schedule(self.handler, directory, recursive=recursive)
+        except OSError as e:
+            logging.warning(f"Failed to watch {directory}: {str(e)}")
+            return
+        self.watches[directory] = (watch, recursive)
+
+    def _covered(self, directory):
+        # True if a recursive watch on an ancestor already reports events for directory
+        parent = os.path.dirname(directory)
+        while parent.startswith(self.root):
+            entry = self.watches.get(parent)
+            if entry is not None:
+                return entry[1]
+            if parent == self.root:
+                break
+            parent = os.path.dirname(parent)
+        return False
+
+    def directory_created(self, directory):
+        """Watch a new directory unless it is ignored or already covered."""
+        directory = os.path.abspath(directory)
+        if self.rules.ignored(directory, is_dir=True) or self._covered(directory):
+            return
+        for path, recursive in plan_watches(directory, _Subtree(self.rules, directory)):
+            self._add(path, recursive)
+
+    def directory_removed(self, directory):
+        """Drop watches on a directory that was deleted or moved away, and below it."""
+        directory = os.path.abspath(directory)
+        prefix = directory + os.sep
+        for path in [p for p in self.watches if p == directory or p.startswith(prefix)]:
+            watch, _ = self.watches.pop(path)
+            try:
+                self.observer.unschedule(watch)
+            except (KeyError, OSError):
+                pass
+
+    def unschedule_all(self):
+        for watch, _ in self.watches.values():
+            try:
+                self.observer.unschedule(watch)
+            except (KeyError, OSError):
+                pass
+        self.watches.clear()
+
+
+class _Subtree:
+    # Rules re-rooted at a subdirectory, so plan_watches can start below the root
+    def __init__(self, rules, directory):
+        self.rules = rules
+        self.rel = os.path.relpath(directory, rules.root).replace(os.sep, '/')
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def match(self, rel_path, is_dir=False):
+        return self.rules.match(f"{self.rel}/{rel_path}", is_dir)
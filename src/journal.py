@@ -0,0 +1,127 @@
+import os
+import glob
+import json
+import logging
+import threading
+from contextlib import contextmanager
+
+# Rewrite the journal once it grows past this size and nothing is in flight
+COMPACT_BYTES = 64 * 1024
+
+
+class OperationJournal:
+    def __init__(self, path, durable=False):
+        """
+        Write-ahead journal of in-flight sync operations.
+
+        Before an operation creates staging files it records its intent (kind,
+        source file and staging paths); once finished it records completion.
+        After a crash, recover() removes the staging files of exactly the
+        operations that never completed and returns them so they can be redone.
+
+        Args:
+            path: Journal file (JSON lines)
+            durable: fsync every record instead of only flushing it
+        """
+        self.path = path
+        self.durable = durable
+        self.in_flight = {}  # op id -> record
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._file = None
+
+    def recover(self):
+        """Roll back operations left unfinished by a crash and return their records."""
+        pending = {}
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn final write
+                        continue
+                    if record.get('done'):
+                        pending.pop(record['op'], None)
+                    else:
+                        pending[record['op']] = record
+        except FileNotFoundError:
+            pass
+
+        for record in pending.values():
+            leftovers = [p for p in record.get('staging', []) if os.path.lexists(p)]
+            for pattern in record.get('staging_globs', []):
+                leftovers.extend(glob.glob(pattern))
+            for path in leftovers:
+                try:
+                    os.remove(path)
+                    logging.info(f"Removed leftover staging file {path}")
+                except OSError as e:
+                    logging.warning(f"Failed to remove leftover staging file {path}: {str(e)}")
+        if pending:
+            logging.warning(f"Rolled back {len(pending)} interrupted operation(s)")
+
+        with self._lock:
+            self._reopen(truncate=True)
+        return list(pending.values())
+
+    @contextmanager
+    def operation(self, kind, source, staging=(), staging_globs=()):
+        """Journal an operation for the duration of the block."""
+        op_id = self.begin(kind, source, staging, staging_globs)
+        try:
+            yield op_id
+        finally:
+            # Failed operations clean up after themselves, so they are done too
+            self.end(op_id)
+
+    def begin(self, kind, source, staging=(), staging_globs=()):
+        """
+        Record the intent of an operation.
+
+        Args:
+            kind: Operation kind, e.g. 'local' or 'remote'
+            source: File the operation works on
+            staging: Paths the operation may create and leave behind
+            staging_globs: Glob patterns for staging files with generated names
+        """
+        with self._lock:
+            op_id = self._next_id
+            self._next_id += 1
+            record = {
+                'op': op_id, 'kind': kind, 'source': str(source),
+                'staging': [str(p) for p in staging],
+                'staging_globs': list(staging_globs),
+            }
+            self.in_flight[op_id] = record
+            self._append(record)
+        return op_id
+
+    def end(self, op_id):
+        """Record that an operation finished."""
+        with self._lock:
+            self.in_flight.pop(op_id, None)
+            self._append({'op': op_id, 'done': True})
+            if not self.in_flight and self._file.tell() > COMPACT_BYTES:
+                self._reopen(truncate=True)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _reopen(self, truncate=False):
+        # Called with self._lock held
+        if self._file:
+            self._file.close()
+        self._file = open(self.path, 'w' if truncate else 'a')
+
+    def _append(self, record):
+        # Called with self._lock held
+        if self._file is None:
+            self._reopen()
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        if self.durable:
+            os.fsync(self._file.fileno())
@@ -11,12 +11,28 @@ try:
     from .sync_folder_client import SyncFolderClient
     from .file_monitor import FileMonitor
     from .sync_manager import SyncManager
+    from .metrics import MetricsServer
+    from .control import ControlServer, available as control_available, send_command, socket_path
+    from .governor import ResourceGovernor
+    from .profiler import profile_for
+    from .tracing import TRACER
+    from .bulk import COMMANDS as BULK_COMMANDS, BulkJob, format_bytes, format_duration
+    from .manifest import Manifest, diff as manifest_diff
+    from .pairs import SyncPairs, pair_configs, pgp_identity, select_pair
 except ImportError:
     # Absolute imports if running as script
     from pgp_handler import PGPHandler
     from sync_folder_client import SyncFolderClient
     from file_monitor import FileMonitor
     from sync_manager import SyncManager
+    from metrics import MetricsServer
+    from control import ControlServer, available as control_available, send_command, socket_path
+    from governor import ResourceGovernor
+    from profiler import profile_for
+    from tracing import TRACER
+    from bulk import COMMANDS as BULK_COMMANDS, BulkJob, format_bytes, format_duration
+    from manifest import Manifest, diff as manifest_diff
+    from pairs import SyncPairs, pair_configs, pgp_identity, select_pair
 
 def load_config(config_path):
     """Load configuration JSON data"""
@@ -47,10 +63,124 @@ def check_android_permissions():
     except Exception as e:
         logging.warning(f"Error checking Android permissions: {str(e)}")
 
+def run_ctl(args):
+    """Send a control command to the running daemon and print the result."""
+    config = load_config(args.config)
+    request = {}
+    if args.path:
+        # The daemon may run in another working directory
+        request['path'] = os.path.abspath(args.path)
+    if args.set:
+        try:
+            request['limits'] = {
+                key: (None if value in ('', 'none') else value)
+                for key, value in (item.split('=', 1) for item in args.set)
+            }
+        except ValueError:
+            print("Error: --set expects KEY=VALUE", file=sys.stderr)
+            return 1
+    try:
+        result = send_command(socket_path(config), args.action, **request)
+    except (ConnectionError, RuntimeError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+    if result is not None:
+        print(json.dumps(result, indent=2))
+    return 0
+
+def run_bulk(args, config):
+    """Run a one-shot encrypt-all / restore-all / verify-all job and print its summary."""
+    governor = ResourceGovernor(config)
+    pgp_handler = PGPHandler(config, governor)
+    sync_folder_client = SyncFolderClient(config, governor)
+    sync_manager = SyncManager(config, sync_folder_client, pgp_handler)
+    job = BulkJob(
+        sync_manager, args.command, workers=args.workers, restart=args.restart, recipient=getattr(args, 'to', None)
+    )
+    try:
+        summary = job.run()
+    except KeyboardInterrupt:
+        print(f"{args.command} interrupted; run it again to resume", file=sys.stderr)
+        return 130
+    finally:
+        sync_manager.stop()
+        TRACER.close()
+    print(
+        f"{summary['command']}: {summary['done']} done, {summary['skipped']} skipped, "
+        f"{summary['failed']} failed, {summary['resumed']} already done before; "
+        f"{format_bytes(summary['bytes'])} in {format_duration(summary['seconds'])}"
+    )
+    for failure in summary['failures']:
+        print(f"  FAILED {failure['path']}: {failure['error']}", file=sys.stderr)
+    if args.command == 'rotate-key' and not summary['failed']:
+        print(f"All ciphertexts are now encrypted to '{args.to}'; set pgp.key_name to it and restart the daemon")
+    return 1 if summary['failed'] else 0
+
+def run_remote_diff(args, config):
+    """Compare the monitored directory with the encrypted manifest and print the differences."""
+    pgp_handler = PGPHandler(config)
+    sync_folder_client = SyncFolderClient(config)
+    sync_manager = SyncManager(config, sync_folder_client, pgp_handler)
+    try:
+        manifest = Manifest(
+            sync_manager.sync_folder_encrypted_path, sync_manager.device_id, pgp_handler, sync_folder_client
+        )
+        devices = manifest.devices()
+        if not devices:
+            print("No manifest in the encrypted folder; enable sync.manifest on the devices that upload", file=sys.stderr)
+            return 2
+        entries = manifest.load()
+        differences = manifest_diff(entries, sync_manager)
+    finally:
+        sync_manager.stop()
+    if args.json:
+        print(json.dumps([{'status': status, 'path': path} for status, path in differences], indent=2))
+    else:
+        for status, path in differences:
+            print(f"{status:<12} {path}")
+        print(
+            f"{len(entries)} file(s) in the manifest of {len(devices)} device(s), "
+            f"{len(differences)} difference(s)",
+            file=sys.stderr,
+        )
+    return 1 if differences else 0
+
 def main():
     parser = argparse.ArgumentParser(description='guardian-sync: PGP Encryption Middleware for any cloud sync folder')
     parser.add_argument('--config', default='config.json', help='Path to configuration file')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='Write per-stage timing spans to FILE (JSON lines for .jsonl, else Chrome trace format)')
+    parser.add_argument('--profile', type=float, metavar='SECONDS',
+                        help='Sample all threads for SECONDS after startup and write a profile report')
+    parser.add_argument('--profile-output', default='guardian-sync-profile.txt',
+                        help='Profile report path (collapsed stacks are written next to it)')
+    subparsers = parser.add_subparsers(dest='command')
+    ctl_parser = subparsers.add_parser('ctl', help='Control the running daemon through its control socket')
+    ctl_parser.add_argument('action', choices=['status', 'pause', 'resume', 'flush', 'rescan', 'boost', 'hydrate', 'limits'])
+    ctl_parser.add_argument('path', nargs='?', help='Subtree to rescan, file to boost, or file or directory to hydrate')
+    ctl_parser.add_argument('--set', action='append', metavar='KEY=VALUE',
+                            help='With limits: change a resource limit, e.g. max_write_mbps=5 (none removes it)')
+    bulk_help = {
+        'encrypt-all': 'Encrypt every file in the monitored directory into the sync folder',
+        'restore-all': 'Decrypt every file in the encrypted sync folder',
+        'verify-all': 'Check that every local file has a ciphertext that decrypts to the same content',
+        'rotate-key': 'Re-encrypt every ciphertext in the encrypted folder to a new key',
+    }
+    for command in BULK_COMMANDS:
+        bulk_parser = subparsers.add_parser(command, help=bulk_help[command])
+        bulk_parser.add_argument('--workers', type=int, help='Parallel workers (default: sync.batch.workers)')
+        bulk_parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint of an interrupted run')
+        bulk_parser.add_argument('--pair', metavar='NAME', help='Sync pair to work on, when several are configured')
+        if command == 'rotate-key':
+            bulk_parser.add_argument('--to', required=True, metavar='KEY', help='Key (name, email or fingerprint) to re-encrypt to')
+    diff_parser = subparsers.add_parser(
+        'remote-diff', help='List files that differ between the monitored directory and the encrypted manifest'
+    )
+    diff_parser.add_argument('--json', action='store_true', help='Print the differences as JSON')
+    diff_parser.add_argument('--pair', metavar='NAME', help='Sync pair to compare, when several are configured')
     args = parser.parse_args()
+    if args.command == 'ctl':
+        sys.exit(run_ctl(args))
     try:
         # Check Android permissions
         check_android_permissions()
@@ -61,33 +191,82 @@ def main():
         # Allow overriding or disabling file logging via config
         log_file = config.get('log_file', None)
         setup_logging(log_file)
+
+        # Optional span tracing, from the command line or the config
+        tracing = config.get('tracing', {})
+        if args.trace or tracing.get('enabled'):
+            TRACER.configure(
+                args.trace or tracing.get('output', 'guardian-sync-trace.json'),
+                tracing.get('format'),
+            )
+
+        if args.command in BULK_COMMANDS:
+            sys.exit(run_bulk(args, select_pair(config, args.pair)))
+        if args.command == 'remote-diff':
+            sys.exit(run_remote_diff(args, select_pair(config, args.pair)))
         
-        # Core components
-        pgp_handler = PGPHandler(config)
-        sync_folder_client = SyncFolderClient(config)
+        # Core components. All sync pairs share one set of resource limits,
+        # one observer and worker pool, and one PGPHandler per key. The gpg
+        # and key checks run once the watchers are up (see below)
+        governor = ResourceGovernor(config)
+        sync_pairs = SyncPairs.from_config(config)
+        pgp_handlers = {}
+        for pair in pair_configs(config):
+            identity = pgp_identity(pair)
+            if identity not in pgp_handlers:
+                pgp_handlers[identity] = PGPHandler(pair, governor, defer_verify=True)
+            sync_manager = SyncManager(
+                pair, SyncFolderClient(pair, governor), pgp_handlers[identity],
+                observer=sync_pairs.observer, executor=sync_pairs.executor,
+            )
+            file_monitor = FileMonitor(
+                pair['local']['monitored_path'],
+                sync_manager.submit_local_change,
+                sync_manager.local_guard.invalidate,
+                sync_manager.local_ignore,
+                observer=sync_pairs.observer,
+            )
+            sync_pairs.add(pair.get('name', 'default'), sync_manager, file_monitor)
         
-        # Sync manager
-        sync_manager = SyncManager(config, sync_folder_client, pgp_handler)
+        # Optional Prometheus metrics endpoint
+        metrics_server = None
+        if config.get('metrics', {}).get('enabled'):
+            metrics_server = MetricsServer(config)
         
-        # File monitor
-        file_monitor = FileMonitor(
-            config['local']['monitored_path'],
-            sync_manager.handle_local_change
-        )
+        # Runtime control socket
+        control_server = None
+        if control_available() and config.get('control', {}).get('enabled', True):
+            # A single pair is controlled as before; with `pairs`, status is per pair
+            control_server = ControlServer(config, sync_pairs if 'pairs' in config else sync_manager, governor)
         
         # Set up signal handlers for graceful shutdown
         def signal_handler(sig, frame):
             logging.info("Shutting down...")
-            sync_manager.stop()
-            file_monitor.stop()
+            if control_server:
+                control_server.stop()
+            sync_pairs.stop()
+            if metrics_server:
+                metrics_server.stop()
+            TRACER.close()
             sys.exit(0)
             
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
         
         # Start components
-        sync_manager.start()
-        file_monitor.start()
+        if args.profile:
+            profile_for(args.profile, args.profile_output)
+        if metrics_server:
+            metrics_server.start()
+        # Start watching right away; changes seen before gpg and the key are
+        # verified are held and processed on resume()
+        sync_pairs.pause()
+        sync_pairs.start()
+        for pgp_handler in pgp_handlers.values():
+            pgp_handler.verify()
+        sync_pairs.resume()
+        if control_server:
+            control_server.start()
         
         logging.info("guardian-sync: PGP Encryption Middleware started")
         
@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import logging
+import threading
+
+try:
+    from .fingerprints import sha256_file
+    from .versions import dominates, unchanged_since
+except ImportError:
+    from fingerprints import sha256_file
+    from versions import dominates, unchanged_since
+
+# Directory below the encrypted folder holding the manifest; never synced as files
+MANIFEST_DIR = '.guardian-manifest'
+SNAPSHOT_SUFFIX = '.snapshot.gpg'
+LOG_SUFFIX = '.log.gpg'
+FORMAT_VERSION = 1
+
+
+def newer(a, b):
+    """The later of two manifest entries for the same path, by version vector, else by upload time."""
+    if a is None or b is None:
+        return a or b
+    vector_a, vector_b = a.get('vector') or {}, b.get('vector') or {}
+    if dominates(vector_a, vector_b) != dominates(vector_b, vector_a):
+        return a if dominates(vector_a, vector_b) else b
+    return a if a.get('time', 0) >= b.get('time', 0) else b
+
+
+class Manifest:
+    def __init__(self, root, device, pgp_handler, sync_folder_client, flush_interval=60.0, compact_segments=16):
+        """
+        Encrypted listing of the files in the encrypted folder.
+
+        Kept in root/.guardian-manifest, where every device writes only its
+        own files: a compacted snapshot (<device>.snapshot.gpg) and log
+        segments (<device>.<seq>.log.gpg), each one encrypted JSON document.
+        Uploads are recorded as they happen and written out together as one
+        new segment per flush. Once compact_segments segments have piled up
+        they are folded into the snapshot, so a reader usually decrypts one
+        small file per device instead of walking and statting the folder.
+        Segment numbers only ever grow: the snapshot records the last one it
+        holds, so names are not reused after a compaction, and leftover
+        segments it already holds are skipped.
+
+        Entries are keyed by the ciphertext's '/'-separated path below the
+        encrypted folder and hold the ciphertext and plaintext SHA-256, the
+        plaintext size, the version vector, the device and the upload time.
+
+        Args:
+            root: Encrypted folder
+            device: Id of this device (see versions.device_id)
+            pgp_handler: Encrypts and decrypts the manifest files
+            sync_folder_client: Publishes the manifest files
+            flush_interval: Seconds between flushes of recorded entries
+            compact_segments: Segments kept before compacting into the snapshot
+        """
+        self.root = os.fspath(root)
+        self.directory = os.path.join(self.root, MANIFEST_DIR)
+        self.device = device
+        self.pgp_handler = pgp_handler
+        self.sync_folder_client = sync_folder_client
+        self.flush_interval = flush_interval
+        self.compact_segments = compact_segments
+
+        self._pending = {}
+        self._seq = None  # last segment number written by this device
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config, root, device, pgp_handler, sync_folder_client):
+        """The manifest configured under `sync.manifest`, or None if it is not enabled."""
+        options = (config.get('sync', {}) or {}).get('manifest', {}) or {}
+        if not options.get('enabled', False):
+            return None
+        return cls(
+            root, device, pgp_handler, sync_folder_client,
+            flush_interval=float(options.get('flush_interval_seconds', 60)),
+            compact_segments=max(1, int(options.get('compact_segments', 16))),
+        )
+
+    def _files(self):
+        # {device: (snapshot name or None, [(seq, segment name)] in order)}
+        devices = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return devices
+        for name in names:
+            if name.endswith(SNAPSHOT_SUFFIX):
+                device = name[:-len(SNAPSHOT_SUFFIX)]
+                devices.setdefault(device, [None, []])[0] = name
+            elif name.endswith(LOG_SUFFIX):
+                device, _, seq = name[:-len(LOG_SUFFIX)].rpartition('.')
+                if device and seq.isdigit():
+                    devices.setdefault(device, [None, []])[1].append((int(seq), name))
+        for files in devices.values():
+            files[1].sort()
+        return devices
+
+    def _read(self, name):
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            document = json.loads(self.pgp_handler.decrypt_data(f.read()))
+        if document.get('version') != FORMAT_VERSION:
+            raise ValueError(f"unsupported manifest format {document.get('version')}")
+        return document
+
+    def _write(self, name, entries, **fields):
+        document = dict(fields, version=FORMAT_VERSION, device=self.device, entries=entries)
+        data = json.dumps(document).encode()
+        self.sync_folder_client.upload_bytes(self.pgp_handler.encrypt_data(data), os.path.join(self.directory, name))
+
+    def _load_device(self, snapshot, segments):
+        # (entries, number of the last segment the snapshot holds)
+        entries, seq = {}, 0
+        if snapshot:
+            try:
+                document = self._read(snapshot)
+                entries.update(document['entries'])
+                seq = int(document.get('seq', 0))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable manifest file {snapshot}: {str(e)}")
+        for segment_seq, name in segments:
+            if segment_seq <= seq:
+                continue  # left over from a compaction
+            try:
+                entries.update(self._read(name)['entries'])
+            except FileNotFoundError:
+                continue  # compacted away while reading
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable manifest file {name}: {str(e)}")
+        return entries, seq
+
+    def _last_seq(self, snapshot, segments):
+        seq = segments[-1][0] if segments else 0
+        if snapshot:
+            try:
+                seq = max(seq, int(self._read(snapshot).get('seq', 0)))
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable manifest file {snapshot}: {str(e)}")
+        return seq
+
+    def load(self):
+        """Merge the manifests of all devices into {path: entry}."""
+        merged = {}
+        for snapshot, segments in self._files().values():
+            for path, entry in self._load_device(snapshot, segments)[0].items():
+                merged[path] = newer(merged.get(path), entry)
+        return merged
+
+    def devices(self):
+        return sorted(self._files())
+
+    def record(self, path, entry):
+        """Add an entry for the ciphertext at path; written out with the next flush."""
+        with self._lock:
+            self._pending[path] = dict(entry, device=self.device, time=time.time())
+
+    def flush(self):
+        """Write recorded entries as a new segment, compacting when enough have piled up."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            snapshot, segments = self._files().get(self.device, (None, []))
+            if self._seq is None:
+                self._seq = self._last_seq(snapshot, segments)
+            # Never reuse a number, not even that of a segment that failed to write
+            self._seq = seq = max(self._seq, segments[-1][0] if segments else 0) + 1
+            try:
+                self._write(f"{self.device}.{seq:08d}{LOG_SUFFIX}", pending)
+            except Exception as e:
+                logging.warning(f"Failed to write manifest segment: {str(e)}")
+                with self._lock:
+                    # Keep newer entries recorded meanwhile
+                    self._pending = dict(pending, **self._pending)
+                return
+            segments.append((seq, f"{self.device}.{seq:08d}{LOG_SUFFIX}"))
+            if len(segments) >= self.compact_segments:
+                self._compact(snapshot, segments)
+
+    def _compact(self, snapshot, segments):
+        entries, _ = self._load_device(snapshot, segments)
+        try:
+            self._write(f"{self.device}{SNAPSHOT_SUFFIX}", entries, seq=segments[-1][0])
+        except Exception as e:
+            logging.warning(f"Failed to compact manifest: {str(e)}")
+            return
+        # The snapshot now holds everything; readers skip a segment left over here
+        for _, name in segments:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+        logging.info(f"Compacted manifest of {len(entries)} entries from {len(segments)} segment(s)")
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="manifest", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+
+def diff(entries, sync_manager):
+    """
+    Compare manifest entries with the monitored directory.
+
+    Returns sorted (status, plaintext path relative to the monitored
+    directory) pairs for everything that differs; status is 'remote-only',
+    'local-only' or 'modified'. Files whose size differs are modified without
+    reading them, and files still as this device last synced them at the
+    manifest's version are equal without reading them; only the rest are hashed.
+    """
+    local_root = os.fspath(sync_manager.local_path)
+    remote = {}
+    for key, entry in entries.items():
+        plain_rel = sync_manager.path_mapper.plaintext_rel(key.replace('/', os.sep))
+        if plain_rel is not None:
+            remote[plain_rel] = (key, entry)
+
+    differences = []
+    for plain_rel, (key, entry) in remote.items():
+        path = os.path.join(local_root, plain_rel)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            differences.append(('remote-only', plain_rel))
+            continue
+        if st.st_size != entry.get('size'):
+            differences.append(('modified', plain_rel))
+            continue
+        base = sync_manager.versions.get(key)
+        if unchanged_since(base, path, st) and base['vector'] == entry.get('vector'):
+            continue
+        if sha256_file(path) != entry.get('sha256'):
+            differences.append(('modified', plain_rel))
+
+    rules = sync_manager.local_ignore
+    for directory, dirnames, filenames in os.walk(local_root):
+        dirnames[:] = [d for d in dirnames if not rules.ignored(os.path.join(directory, d), is_dir=True)]
+        for name in filenames:
+            if name.startswith('.') or name.endswith('.tmp') or name.endswith('.gpg'):
+                continue
+            path = os.path.join(directory, name)
+            plain_rel = os.path.relpath(path, local_root)
+            if plain_rel not in remote and not rules.ignored(path):
+                differences.append(('local-only', plain_rel))
+    return sorted(differences, key=lambda item: (item[1], item[0]))
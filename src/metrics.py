@@ -0,0 +1,278 @@
+import os
+import bisect
+import logging
+import threading
+import socketserver
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function, **labels):
+        """Report the return value of function() at collection time, so updates cost nothing."""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def value(self, **labels):
+        key = self._key(labels)
+        if key in self._functions:
+            return self._functions[key]()
+        return self._values.get(key, 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                items.append((key, function()))
+            except Exception as e:
+                logging.debug(f"Failed to collect {self.name}: {str(e)}")
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[-1] if state else 0
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, state):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', '+Inf')])} {state[-1]}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {state[-2]}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Outcomes of file system events: every event is received, most then get one more
+# outcome on the way through the handlers
+EVENT_OUTCOMES = (
+    'received', 'deduplicated', 'dropped', 'ignored', 'held', 'batched',
+    'skipped', 'unchanged', 'superseded', 'deferred',
+)
+
+# Sync pipeline metrics, shared by all components
+EVENTS = REGISTRY.counter(
+    'guardian_sync_events_total', f"File system events by handler and outcome ({', '.join(EVENT_OUTCOMES)})",
+    ('handler', 'outcome'))
+QUEUE_DEPTH = REGISTRY.gauge(
+    'guardian_sync_queue_depth', 'Entries waiting in internal queues', ('queue',))
+GPG_DURATION = REGISTRY.histogram(
+    'guardian_sync_gpg_duration_seconds', 'Duration of gpg encrypt/decrypt calls', ('operation',))
+CRYPTO_BYTES = REGISTRY.counter(
+    'guardian_sync_crypto_bytes_total', 'Plaintext bytes encrypted or decrypted', ('operation',))
+COPIED_BYTES = REGISTRY.counter(
+    'guardian_sync_copied_bytes_total', 'Bytes copied between files, by copy method (reflink, copy)', ('method',))
+CONFLICTS = REGISTRY.counter(
+    'guardian_sync_conflicts_total', 'Conflict copies created')
+FAILURES = REGISTRY.counter(
+    'guardian_sync_failures_total', 'Failed sync operations by operation and error type', ('operation', 'type'))
+SYNC_LAG = REGISTRY.histogram(
+    'guardian_sync_lag_seconds', 'Time from a file change to its synced counterpart being written', ('direction',))
+
+
+def _request_handler(registry):
+    # http.server is only imported when the endpoint is enabled; it is slow to import
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsRequestHandler
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects an address tuple
+        return request, ('local', 0)
+
+
+class MetricsServer:
+    def __init__(self, config, registry=REGISTRY):
+        """
+        Serve metrics in Prometheus text format over HTTP.
+
+        Listens on `metrics.host`:`metrics.port` (default 127.0.0.1:9464), or on
+        the Unix socket `metrics.unix_socket` if set.
+
+        Args:
+            config: Application configuration
+            registry: Registry to expose
+        """
+        metrics_config = config.get('metrics', {}) or {}
+        self.host = metrics_config.get('host', '127.0.0.1')
+        self.port = int(metrics_config.get('port', 9464))
+        self.unix_socket = metrics_config.get('unix_socket')
+        self.registry = registry
+        self.server = None
+        self._thread = None
+
+    def start(self):
+        """Start serving in a background thread."""
+        handler = _request_handler(self.registry)
+        if self.unix_socket:
+            if os.path.exists(self.unix_socket):
+                os.remove(self.unix_socket)
+            self.server = _UnixHTTPServer(self.unix_socket, handler)
+            os.chmod(self.unix_socket, 0o600)
+            address = self.unix_socket
+        else:
+            from http.server import ThreadingHTTPServer
+            self.server = ThreadingHTTPServer((self.host, self.port), handler)
+            self.server.daemon_threads = True
+            address = f"http://{self.host}:{self.server.server_address[1]}/metrics"
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        logging.info(f"Serving metrics on {address}")
+
+    def stop(self):
+        """Stop serving."""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            if self.unix_socket and os.path.exists(self.unix_socket):
+                os.remove(self.unix_socket)
@@ -0,0 +1,198 @@
+import os
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from .ignore_rules import new_observer
+except ImportError:
+    from ignore_rules import new_observer
+
+
+def _merged(base, override):
+    # Deep merge of two config dicts; values from override win
+    result = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = _merged(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def _roots(config):
+    sync_folder = config.get('sync_folder', {}) or {}
+    return [
+        os.path.abspath(os.path.expanduser(path)) for path in (
+            config['local']['monitored_path'],
+            config['local'].get('decrypted_path') or config['local']['monitored_path'],
+            os.path.join(sync_folder.get('path') or '', sync_folder.get('encrypted_folder', 'encrypted_files')),
+        )
+    ]
+
+
+def _overlap(a, b):
+    return a == b or a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep)
+
+
+def pair_configs(config):
+    """
+    The configuration of every sync pair.
+
+    Without a `pairs` list the config itself is the only pair. Otherwise each
+    entry of `pairs` is merged over the rest of the config, so settings shared
+    by all pairs (a gnupghome, sync options) are written once at the top
+    level and a pair only lists what is its own: `local`, `sync_folder`, its
+    `pgp.key_name` and ignore files. Each pair gets a `name`, by default the
+    name of its monitored directory.
+
+    Raises:
+        ValueError: If names repeat or the folders of two pairs overlap
+    """
+    if 'pairs' not in config:
+        return [config]
+    base = {key: value for key, value in config.items() if key != 'pairs'}
+    pairs = []
+    for entry in config['pairs'] or []:
+        pair = _merged(base, entry)
+        if 'local' not in pair or 'sync_folder' not in pair:
+            raise ValueError("Every sync pair needs 'local' and 'sync_folder' settings")
+        pair['name'] = str(entry.get('name') or os.path.basename(os.path.normpath(pair['local']['monitored_path'])))
+        pairs.append(pair)
+    if not pairs:
+        raise ValueError("'pairs' lists no sync pairs")
+
+    names = [pair['name'] for pair in pairs]
+    for name in names:
+        if names.count(name) > 1:
+            raise ValueError(f"Sync pair name '{name}' is used more than once; give the pairs distinct 'name's")
+    for i, pair in enumerate(pairs):
+        for other in pairs[i + 1:]:
+            for a in _roots(pair):
+                for b in _roots(other):
+                    if _overlap(a, b):
+                        raise ValueError(
+                            f"Sync pairs '{pair['name']}' and '{other['name']}' overlap at {a} and {b}"
+                        )
+    return pairs
+
+
+def select_pair(config, name=None):
+    """
+    The configuration of one sync pair, for commands that work on a single pair.
+
+    Raises:
+        ValueError: If name is not a pair, or it is missing and there are several pairs
+    """
+    pairs = pair_configs(config)
+    if name is None:
+        if len(pairs) > 1:
+            raise ValueError(f"Several sync pairs are configured; choose one of {', '.join(p['name'] for p in pairs)}")
+        return pairs[0]
+    for pair in pairs:
+        if pair.get('name') == name:
+            return pair
+    raise ValueError(f"Unknown sync pair '{name}', expected one of {', '.join(p.get('name', '') for p in pairs)}")
+
+
+def pgp_identity(config):
+    """Settings that make two PGPHandlers interchangeable; pairs with equal identities share one."""
+    pgp = config['pgp']
+    return (
+        os.path.abspath(os.path.expanduser(pgp['gnupghome'])),
+        pgp['key_name'],
+        pgp.get('passphrase'),
+        bool(pgp.get('always_trust', False)),
+    )
+
+
+class SyncPairs:
+    def __init__(self, workers=None):
+        """
+        Sync pairs served by one process.
+
+        All pairs share one watchdog observer and one worker pool that runs
+        their changes (and their batches, when batching). Everything else that
+        is shared, like the resource governor, PGPHandlers for the same key
+        and the metrics registry, is passed to the pairs' components by the
+        caller. The control commands of a SyncManager are offered for all
+        pairs together; commands taking a path go to the pair the path is in.
+
+        Args:
+            workers: Size of the shared worker pool
+        """
+        self.observer = new_observer()
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="sync-worker")
+        self.pairs = {}  # name -> (SyncManager, FileMonitor)
+
+    @classmethod
+    def from_config(cls, config):
+        """Pool size from `sync.workers`, defaulting to `sync.batch.workers`."""
+        sync_config = config.get('sync', {}) or {}
+        batch_config = sync_config.get('batch', {}) or {}
+        return cls(int(sync_config.get('workers', batch_config.get('workers', min(4, os.cpu_count() or 1)))))
+
+    def add(self, name, sync_manager, file_monitor):
+        self.pairs[name] = (sync_manager, file_monitor)
+
+    @property
+    def managers(self):
+        return [sync_manager for sync_manager, _ in self.pairs.values()]
+
+    def start(self):
+        """Start every pair, then the shared observer."""
+        for sync_manager in self.managers:
+            sync_manager.start()
+        for _, file_monitor in self.pairs.values():
+            file_monitor.start()
+        self.observer.start()
+        logging.info(f"Serving {len(self.pairs)} sync pair(s)")
+
+    def stop(self):
+        """Stop every pair, finishing the changes already handed to the workers."""
+        for _, file_monitor in self.pairs.values():
+            file_monitor.stop()
+        for sync_manager in self.managers:
+            sync_manager.stop()
+        if self.observer.is_alive():
+            self.observer.stop()
+            self.observer.join()
+        self.executor.shutdown()
+
+    def _owner(self, path):
+        path = Path(os.path.abspath(path))
+        for sync_manager in self.managers:
+            if sync_manager._kind_for(path) is not None:
+                return sync_manager
+        raise ValueError(f"{path} is not inside the monitored or encrypted folder of any sync pair")
+
+    def status(self):
+        return {'pairs': {name: sync_manager.status() for name, (sync_manager, _) in self.pairs.items()}}
+
+    def pause(self):
+        for sync_manager in self.managers:
+            sync_manager.pause()
+
+    def resume(self):
+        for sync_manager in self.managers:
+            sync_manager.resume()
+
+    def flush(self, timeout=None):
+        for sync_manager in self.managers:
+            sync_manager.flush(timeout=timeout)
+
+    def retry_now(self):
+        for sync_manager in self.managers:
+            sync_manager.retry_now()
+
+    def rescan(self, path=None):
+        if path:
+            return self._owner(path).rescan(path)
+        return sum(sync_manager.rescan() for sync_manager in self.managers)
+
+    def boost(self, path):
+        return self._owner(path).boost(path)
+
+    def hydrate(self, path):
+        return self._owner(path).hydrate(path)
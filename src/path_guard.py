@@ -0,0 +1,170 @@
+import os
+import stat
+import errno
+import logging
+import threading
+from collections import OrderedDict
+
+# openat()-style opens need dir_fd support and O_NOFOLLOW (missing on Windows)
+_HAS_OPENAT = os.open in os.supports_dir_fd and hasattr(os, 'O_NOFOLLOW') and hasattr(os, 'O_DIRECTORY')
+
+
+class UnsafePathError(OSError):
+    """Raised when a path leaves its root or traverses a symlink."""
+
+
+class PathGuard:
+    def __init__(self, root, max_open_dirs=128):
+        """
+        Symlink-safe access to the files below a trusted root directory.
+
+        The root is resolved once. After that, containment is checked lexically
+        and directories are verified symlink-free with lstat() only the first
+        time they are seen, so a check usually costs a single lstat() of the
+        file itself. Cached directories are dropped with invalidate() when the
+        watcher reports a directory event.
+
+        Where the platform supports it, open() walks from a directory fd with
+        O_NOFOLLOW at every step, so a symlink swapped in after the check still
+        cannot redirect the open outside the root.
+
+        Args:
+            root: Trusted root directory
+            max_open_dirs: Number of directory fds kept open for open()
+        """
+        self.root = os.path.realpath(root)
+        # The root may be reached through a symlink the user configured; both spellings are trusted
+        self._prefixes = {self.root, os.path.abspath(root)}
+        self.max_open_dirs = max_open_dirs
+        self._verified = set()  # relative directory paths known to be real directories
+        self._dir_fds = OrderedDict()  # relative directory path -> fd, LRU
+        self._lock = threading.Lock()
+
+    def relative(self, path):
+        """Path relative to the root, or None if it lies outside. Purely lexical."""
+        path = os.path.abspath(path)
+        for prefix in self._prefixes:
+            if path == prefix:
+                return ''
+            if path.startswith(prefix + os.sep):
+                return path[len(prefix) + 1:]
+        return None
+
+    def check(self, path):
+        """
+        True if path lies below the root without traversing symlinks.
+
+        A path whose final component does not exist yet passes as long as its
+        existing directories are safe, matching what open() would allow.
+        """
+        rel = self.relative(path)
+        if rel is None:
+            return False
+        if not rel:
+            return True
+        parent, name = os.path.split(rel)
+        if not self._verify_dir(parent):
+            return False
+        try:
+            return not stat.S_ISLNK(os.lstat(os.path.join(self.root, rel)).st_mode)
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+
+    def _verify_dir(self, rel_dir):
+        # Walk down from the root, lstat()ing only directories not seen before
+        if not rel_dir or rel_dir in self._verified:
+            return True
+        current = ''
+        for part in rel_dir.split(os.sep):
+            current = os.path.join(current, part) if current else part
+            if current in self._verified:
+                continue
+            try:
+                if not stat.S_ISDIR(os.lstat(os.path.join(self.root, current)).st_mode):
+                    return False
+            except FileNotFoundError:
+                # Nothing to traverse yet; don't cache
+                return True
+            except OSError:
+                return False
+            with self._lock:
+                self._verified.add(current)
+        return True
+
+    def invalidate(self, path):
+        """Forget what is known about path and everything below it."""
+        rel = self.relative(path)
+        if rel is None:
+            return
+        prefix = rel + os.sep
+        with self._lock:
+            for d in [d for d in self._verified if not rel or d == rel or d.startswith(prefix)]:
+                self._verified.discard(d)
+            for d in [d for d in self._dir_fds if d and (not rel or d == rel or d.startswith(prefix))]:
+                os.close(self._dir_fds.pop(d))
+
+    def open(self, path):
+        """
+        Open a file below the root for binary reading without following symlinks.
+
+        Raises:
+            UnsafePathError: If the path is outside the root or a component is a symlink
+        """
+        rel = self.relative(path)
+        if not rel:
+            raise UnsafePathError(f"Refusing to open {path}: outside {self.root}")
+        if not _HAS_OPENAT:
+            if not self.check(path):
+                raise UnsafePathError(f"Refusing to open {path}: path traverses a symlink")
+            return open(os.path.join(self.root, rel), 'rb')
+
+        parent, name = os.path.split(rel)
+        try:
+            with self._lock:
+                fd = os.open(name, os.O_RDONLY | os.O_NOFOLLOW | getattr(os, 'O_CLOEXEC', 0),
+                             dir_fd=self._dir_fd(parent))
+                self._trim()
+        except OSError as e:
+            # O_NOFOLLOW fails with ELOOP on a symlink, ENOTDIR when one stands in for a directory
+            if e.errno in (errno.ELOOP, errno.ENOTDIR):
+                raise UnsafePathError(f"Refusing to open {path}: path traverses a symlink") from e
+            raise
+        return os.fdopen(fd, 'rb')
+
+    def _dir_fd(self, rel_dir):
+        # Return a cached fd for rel_dir, opening missing levels from the
+        # nearest cached ancestor with O_NOFOLLOW. Caller holds the lock.
+        fd = self._dir_fds.get(rel_dir)
+        if fd is not None:
+            self._dir_fds.move_to_end(rel_dir)
+            return fd
+        if not rel_dir:
+            fd = os.open(self.root, os.O_RDONLY | os.O_DIRECTORY | getattr(os, 'O_CLOEXEC', 0))
+        else:
+            parent, name = os.path.split(rel_dir)
+            parent_fd = self._dir_fd(parent)
+            fd = os.open(
+                name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW | getattr(os, 'O_CLOEXEC', 0),
+                dir_fd=parent_fd,
+            )
+            self._verified.add(rel_dir)
+        self._dir_fds[rel_dir] = fd
+        return fd
+
+    def _trim(self):
+        # Close least recently used directory fds beyond the limit. Caller holds the lock.
+        while len(self._dir_fds) > self.max_open_dirs:
+            _, fd = self._dir_fds.popitem(last=False)
+            os.close(fd)
+
+    def close(self):
+        """Close all cached directory fds."""
+        with self._lock:
+            for fd in self._dir_fds.values():
+                try:
+                    os.close(fd)
+                except OSError as e:
+                    logging.debug(f"Failed to close directory fd: {e}")
+            self._dir_fds.clear()
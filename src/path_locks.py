@@ -0,0 +1,43 @@
+import threading
+from contextlib import contextmanager
+
+
+class PathLocks:
+    def __init__(self):
+        """
+        One lock per key, created on demand and dropped when unused.
+
+        Operations on different files run concurrently, while two operations
+        touching the same file are still serialized.
+        """
+        self._locks = {}  # key -> [lock, holders and waiters]
+        self._guard = threading.Lock()
+
+    def acquire(self, key):
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        entry[0].acquire()
+
+    def release(self, key):
+        with self._guard:
+            entry = self._locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    @contextmanager
+    def hold(self, key):
+        """Hold the lock for key for the duration of the block."""
+        self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def __len__(self):
+        with self._guard:
+            return len(self._locks)
@@ -0,0 +1,69 @@
+import os
+import threading
+
+ENCRYPTED_SUFFIX = '.gpg'
+
+
+class PathMapper:
+    def __init__(self, max_entries=65536):
+        """
+        Cached mapping between plaintext and encrypted paths, relative to their roots.
+
+        `a/b/c.txt` in the plaintext tree corresponds to `a/b/c.txt.gpg` in
+        the encrypted folder; the nested structure is preserved in both
+        directions. Each mapping is cached both ways, so the handlers on
+        either side resolve a path they have seen before with one lookup.
+
+        Directories on the plaintext side are created through ensure_dir(),
+        which only calls makedirs the first time a directory is needed.
+
+        Args:
+            max_entries: Mappings kept before the cache is reset
+        """
+        self.max_entries = max_entries
+        self._to_encrypted = {}
+        self._to_plaintext = {}
+        self._dirs = set()  # directories known to exist
+        self._lock = threading.Lock()
+
+    def _remember(self, plain_rel, encrypted_rel):
+        with self._lock:
+            if len(self._to_encrypted) >= self.max_entries:
+                self._to_encrypted.clear()
+                self._to_plaintext.clear()
+            self._to_encrypted[plain_rel] = encrypted_rel
+            self._to_plaintext[encrypted_rel] = plain_rel
+
+    def encrypted_rel(self, plain_rel):
+        """Encrypted counterpart of a plaintext path relative to its root."""
+        encrypted_rel = self._to_encrypted.get(plain_rel)
+        if encrypted_rel is None:
+            encrypted_rel = os.path.normpath(plain_rel) + ENCRYPTED_SUFFIX
+            self._remember(plain_rel, encrypted_rel)
+        return encrypted_rel
+
+    def plaintext_rel(self, encrypted_rel):
+        """Plaintext counterpart of an encrypted path relative to its root, or None if it is not a .gpg file."""
+        plain_rel = self._to_plaintext.get(encrypted_rel)
+        if plain_rel is None:
+            if not encrypted_rel.endswith(ENCRYPTED_SUFFIX) or encrypted_rel == ENCRYPTED_SUFFIX:
+                return None
+            plain_rel = os.path.normpath(encrypted_rel[:-len(ENCRYPTED_SUFFIX)])
+            self._remember(plain_rel, encrypted_rel)
+        return plain_rel
+
+    def ensure_dir(self, directory):
+        """Create directory (and parents) unless it was created or seen before."""
+        directory = os.fspath(directory)
+        if directory in self._dirs:
+            return
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._dirs.add(directory)
+
+    def forget_dir(self, directory):
+        """Drop directory and everything below it from the known directories, e.g. after it was deleted."""
+        directory = os.fspath(directory)
+        prefix = directory + os.sep
+        with self._lock:
+            self._dirs = {d for d in self._dirs if d != directory and not d.startswith(prefix)}
@@ -1,119 +1,370 @@
 import os
-import gnupg
+import time
 import logging
 import subprocess
 import getpass
 import shutil
 import tempfile
 import hashlib
+import threading
+import contextlib
+
+try:
+    from .errors import CorruptCiphertextError
+    from .metrics import CRYPTO_BYTES, GPG_DURATION
+    from .probe import ProbeCache, file_signature
+except ImportError:
+    from errors import CorruptCiphertextError
+    from metrics import CRYPTO_BYTES, GPG_DURATION
+    from probe import ProbeCache, file_signature
+
+# Markers in gpg's status/stderr output for the two failure classes we act on
+PASSPHRASE_FAILURE_MARKERS = ('bad_passphrase', 'bad passphrase', 'missing_passphrase', 'need_passphrase')
+CORRUPT_INPUT_MARKERS = (
+    'nodata', 'no valid openpgp data', 'invalid packet', 'unexpected eof', 'premature',
+    'crc error', 'invalid armor', 'truncated', 'packet with unknown version', 'block_filter',
+)
+
+# Files whose change can alter which secret keys gpg finds
+KEYRING_FILES = ('pubring.kbx', 'pubring.gpg', 'secring.gpg', 'trustdb.gpg', 'private-keys-v1.d')
+
+
+def __getattr__(name):
+    # gnupg is imported on first use; `pgp_handler.gnupg` still resolves for callers and tests
+    if name == 'gnupg':
+        return _gnupg()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _gnupg():
+    import gnupg
+    return gnupg
+
 
 class PGPHandler:
     MAX_PASSPHRASE_RETRIES = 3
 
-    def __init__(self, config):
-        # Initialize PGP handler with configuration
+    def __init__(self, config, governor=None, defer_verify=False):
+        # Initialize PGP handler with configuration; an optional ResourceGovernor
+        # limits gpg concurrency, priority and pipe bandwidth. With defer_verify
+        # the caller runs verify() itself, e.g. after the watchers are up.
         self.config = config
-        try:
-            result = subprocess.run(['gpg', '--version'], capture_output=True, text=True)
-            if result.returncode != 0:
-                raise EnvironmentError("GnuPG is installed but returned an error.")
-            logging.info(f"Using GnuPG: {result.stdout.splitlines()[0]}")
-        except FileNotFoundError:
-            raise EnvironmentError("GnuPG binary not found. Please install it and ensure it's on the PATH.")
+        self.governor = governor
+        self.gnupg_home = os.path.expanduser(config['pgp']['gnupghome'])
+        self.key_name = config['pgp']['key_name']
+        self.passphrase = config['pgp'].get('passphrase')
+        self.always_trust = bool(config['pgp'].get('always_trust', False))
+        self.gpg_version = None
+        self.key_fingerprint = None
+        self._gpg = None
+        if not defer_verify:
+            self.verify()
+
+    @property
+    def gpg(self):
+        # gnupg.GPG() runs gpg once on construction, so it is only created when first needed
+        if self._gpg is None:
+            self._gpg = _gnupg().GPG(gnupghome=self.gnupg_home)
+            if self.governor:
+                self.governor.instrument(self._gpg)
+        return self._gpg
+
+    @gpg.setter
+    def gpg(self, value):
+        self._gpg = value
+
+    def verify(self):
+        """
+        Check that gpg runs and the configured private key exists.
+
+        Both results are cached in the state directory together with the mtimes
+        of the gpg binary and the keyring files, so a restart with an unchanged
+        environment does not spawn gpg at all.
+
+        Raises:
+            EnvironmentError: If gpg is missing or broken
+            RuntimeError: If the key is not in the keyring
+        """
+        probes = ProbeCache(self.config)
+        gpg_binary = shutil.which('gpg')
+        binary = file_signature([gpg_binary])
+        self.gpg_version = probes.get('gpg_version', binary) if gpg_binary else None
+        if self.gpg_version is None:
+            try:
+                result = subprocess.run(['gpg', '--version'], capture_output=True, text=True)
+                if result.returncode != 0:
+                    raise EnvironmentError("GnuPG is installed but returned an error.")
+            except FileNotFoundError:
+                raise EnvironmentError("GnuPG binary not found. Please install it and ensure it's on the PATH.")
+            self.gpg_version = result.stdout.splitlines()[0]
+            probes.put('gpg_version', binary, self.gpg_version)
+        logging.info(f"Using GnuPG: {self.gpg_version}")
 
-        gnupg_home = os.path.expanduser(config['pgp']['gnupghome'])
         # Ensure GnuPG home exists + has strict permissions
-        os.makedirs(gnupg_home, exist_ok=True)
+        os.makedirs(self.gnupg_home, exist_ok=True)
         try:
-            st = os.stat(gnupg_home)
+            st = os.stat(self.gnupg_home)
             # If group/other have any permissions, tighten to 0700
             if (st.st_mode & 0o077) != 0:
                 try:
-                    os.chmod(gnupg_home, 0o700)
-                    logging.warning(f"Adjusted permissions on GnuPG home to 0700: {gnupg_home}")
+                    os.chmod(self.gnupg_home, 0o700)
+                    logging.warning(f"Adjusted permissions on GnuPG home to 0700: {self.gnupg_home}")
                 except Exception as e:
-                    logging.warning(f"GnuPG home has permissive permissions and could not be fixed automatically: {gnupg_home} ({e})")
+                    logging.warning(f"GnuPG home has permissive permissions and could not be fixed automatically: {self.gnupg_home} ({e})")
         except FileNotFoundError:
             pass # Already ensured exists
 
-        self.gpg = gnupg.GPG(gnupghome=gnupg_home)
-        self.key_name = config['pgp']['key_name']
-        self.passphrase = config['pgp'].get('passphrase')
-        self.always_trust = bool(config['pgp'].get('always_trust', False))
+        keyring = [self.key_name] + file_signature(
+            [os.path.join(self.gnupg_home, name) for name in KEYRING_FILES]
+        ) + binary
+        cached = probes.get('key', keyring)
+        if cached is not None:
+            self.key_fingerprint = cached.get('fingerprint')
+            return
         self._verify_key()
+        probes.put('key', keyring, {'fingerprint': self.key_fingerprint})
 
     def _verify_key(self):
         # Verify that the specified private key exists
         try:
             keys = self.gpg.list_keys(True)
-            key_exists = any(self.key_name in key['uids'][0] for key in keys if 'uids' in key)
-            if not key_exists:
+            key = next((key for key in keys if 'uids' in key and self.key_name in key['uids'][0]), None)
+            if key is None:
                 raise ValueError(
                     f"PGP key '{self.key_name}' not found in keyring. Use 'gpg --import' or generate it with 'gpg --full-generate-key'."
                 )
+            self.key_fingerprint = key.get('fingerprint')
         except Exception as e:
             raise RuntimeError(f"Failed to access GPG keyring: {str(e)}")
 
-    def encrypt_file(self, file_path, output_path=None):
+    def encrypt_file(self, file_path, output_path=None, source=None):
+        # source, if given, is file_path already opened for binary reading (e.g.
+        # symlink-safely); it is encrypted instead of opening file_path again
         if output_path is None:
             output_path = str(file_path) + '.gpg'
 
+        start = time.perf_counter()
         try:
-            with open(file_path, 'rb') as f:
+            with self._gpg_slot(), (contextlib.nullcontext(source) if source is not None else open(file_path, 'rb')) as f:
                 status = self.gpg.encrypt_file(
-                    f, recipients=[self.key_name],
+                    self.governor.reader(f) if self.governor else f,
+                    recipients=[self.key_name],
                     output=output_path,
                     always_trust=self.always_trust
                 )
+                size = f.tell()
         except Exception as e:
             raise RuntimeError(f"Encryption failed: I/O or GPG error: {str(e)}")
+        GPG_DURATION.observe(time.perf_counter() - start, operation='encrypt')
 
         if status.ok:
+            CRYPTO_BYTES.inc(size, operation='encrypt')
+            if self.governor:
+                self.governor.written(os.path.getsize(output_path))
             logging.info(f"Encrypted {file_path} to {output_path}")
             return output_path
         else:
             self._remove(output_path)
             raise RuntimeError(f"Encryption failed: {status.status} — {status.stderr}")
 
-    def decrypt_file(self, encrypted_path, output_path=None, verify_with=None):
+    def encrypt_data(self, data, recipient=None):
+        """Encrypt an in-memory plaintext (to recipient, default the configured key) and return the ciphertext bytes."""
+        start = time.perf_counter()
+        try:
+            with self._gpg_slot():
+                status = self.gpg.encrypt(
+                    data, recipients=[recipient or self.key_name],
+                    always_trust=self.always_trust
+                )
+        except Exception as e:
+            raise RuntimeError(f"Encryption failed: I/O or GPG error: {str(e)}")
+        GPG_DURATION.observe(time.perf_counter() - start, operation='encrypt')
+
+        if not status.ok:
+            raise RuntimeError(f"Encryption failed: {status.status} — {status.stderr}")
+        CRYPTO_BYTES.inc(len(data), operation='encrypt')
+        return status.data
+
+    def decrypt_file(self, encrypted_path, output_path=None, verify_with=None, source=None):
+        # source, if given, is encrypted_path already opened for binary reading;
+        # it is decrypted (from the start on every attempt) instead of the path
         if output_path is None:
             output_path = str(encrypted_path)
             if output_path.endswith('.gpg'):
                 output_path = output_path[:-4]
 
-        last_error = None
-        for attempt in range(1, self.MAX_PASSPHRASE_RETRIES + 1):
-            temp_fd, temp_path = tempfile.mkstemp()
+        def attempt_decrypt(passphrase):
+            # Stage next to the output so the final move is a rename
+            temp_fd, temp_path = tempfile.mkstemp(
+                prefix=f".{os.path.basename(output_path)}.", suffix=".partial",
+                dir=os.path.dirname(os.path.abspath(output_path))
+            )
             os.close(temp_fd)  # Write to it with GPG
-
             try:
-                passphrase = self.passphrase or getpass.getpass(
-                    f"Enter PGP passphrase (attempt {attempt}/{self.MAX_PASSPHRASE_RETRIES}): "
-                )
-
-                with open(encrypted_path, 'rb') as f:
+                if source is not None:
+                    source.seek(0)
+                with self._gpg_slot(), (contextlib.nullcontext(source) if source is not None else open(encrypted_path, 'rb')) as f:
                     status = self.gpg.decrypt_file(
-                        f, passphrase=passphrase,
+                        self.governor.reader(f) if self.governor else f,
+                        passphrase=passphrase,
                         output=temp_path
                     )
-
                 if status.ok:
+                    size = os.path.getsize(temp_path)
+                    CRYPTO_BYTES.inc(size, operation='decrypt')
+                    if self.governor:
+                        self.governor.written(size)
                     if verify_with:
                         if not self._validate_decryption(verify_with, temp_path):
                             raise ValueError("Checksum mismatch: decrypted file does not match original.")
                     shutil.move(temp_path, output_path)
-                    logging.info(f"Decrypted {encrypted_path} to {output_path}")
-                    return output_path
-                else:
-                    logging.warning(f"Attempt {attempt}: Decryption failed — {status.status}")
-                    last_error = RuntimeError(f"Decryption failed: {status.status} — {status.stderr}")
+                return status
+            finally:
+                self._remove(temp_path)
+
+        self._decrypt_with_retries(attempt_decrypt)
+        logging.info(f"Decrypted {encrypted_path} to {output_path}")
+        return output_path
+
+    def decrypt_data(self, data):
+        """Decrypt an in-memory ciphertext and return the plaintext bytes."""
+        def attempt_decrypt(passphrase):
+            with self._gpg_slot():
+                return self.gpg.decrypt(data, passphrase=passphrase)
+
+        plaintext = self._decrypt_with_retries(attempt_decrypt).data
+        CRYPTO_BYTES.inc(len(plaintext), operation='decrypt')
+        return plaintext
+
+    def reencrypt_file(self, encrypted_path, output_path, recipient):
+        """
+        Re-encrypt a ciphertext to another key without writing the plaintext anywhere.
+
+        `gpg --decrypt` streams straight into `gpg --encrypt` through a pipe.
+        Needs the passphrase in the config or a gpg-agent that has it, as
+        there is nobody to prompt.
+
+        Raises:
+            CorruptCiphertextError: If the input is truncated or corrupt
+            RuntimeError: If either gpg process fails
+        """
+        base = ['gpg', '--homedir', self.gnupg_home, '--batch', '--quiet', '--yes']
+        decrypt_cmd = base + ['--decrypt']
+        pass_fds = ()
+        if self.passphrase:
+            # Hand the passphrase over through a pipe, not the command line
+            read_fd, write_fd = os.pipe()
+            os.write(write_fd, self.passphrase.encode() + b'\n')
+            os.close(write_fd)
+            decrypt_cmd[len(base):len(base)] = ['--pinentry-mode', 'loopback', '--passphrase-fd', str(read_fd)]
+            pass_fds = (read_fd,)
+        encrypt_cmd = base + ['--armor', '--encrypt', '--recipient', recipient, '--output', str(output_path)]
+        if self.always_trust:
+            encrypt_cmd[len(base):len(base)] = ['--trust-model', 'always']
+
+        start = time.perf_counter()
+        with self._gpg_slot(), open(encrypted_path, 'rb') as f:
+            throttled = self.governor is not None and self.governor.read_bucket.rate is not None
+            try:
+                decrypt = subprocess.Popen(
+                    decrypt_cmd, stdin=subprocess.PIPE if throttled else f,
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, pass_fds=pass_fds,
+                )
+            finally:
+                for fd in pass_fds:
+                    os.close(fd)
+            encrypt = subprocess.Popen(
+                encrypt_cmd, stdin=decrypt.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+            decrypt.stdout.close()  # only gpg --encrypt reads the plaintext
+            if self.governor:
+                self.governor.apply_priority(decrypt.pid)
+                self.governor.apply_priority(encrypt.pid)
+            feeder = None
+            if throttled:
+                feeder = threading.Thread(target=self._feed, args=(self.governor.reader(f), decrypt.stdin), daemon=True)
+                feeder.start()
+            decrypt_error = decrypt.stderr.read()
+            encrypt_error = encrypt.stderr.read()
+            decrypt.wait()
+            encrypt.wait()
+            if feeder:
+                feeder.join()
+        GPG_DURATION.observe(time.perf_counter() - start, operation='reencrypt')
+
+        if decrypt.returncode != 0:
+            self._remove(str(output_path))
+            message = decrypt_error.decode(errors='replace').strip()
+            if any(marker in message.lower() for marker in CORRUPT_INPUT_MARKERS):
+                raise CorruptCiphertextError(f"Re-encryption failed: ciphertext is truncated or corrupt — {message}")
+            raise RuntimeError(f"Re-encryption failed: decrypt error — {message}")
+        if encrypt.returncode != 0:
+            self._remove(str(output_path))
+            raise RuntimeError(f"Re-encryption failed: encrypt error — {encrypt_error.decode(errors='replace').strip()}")
+        if self.governor:
+            self.governor.written(os.path.getsize(output_path))
+        return output_path
+
+    @staticmethod
+    def _feed(source, pipe):
+        # Copy the ciphertext into gpg's stdin, through the read limit
+        try:
+            for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                pipe.write(chunk)
+        except BrokenPipeError:
+            pass  # gpg gave up; its exit status tells why
+        finally:
+            try:
+                pipe.close()
+            except BrokenPipeError:
+                pass
+
+    def _decrypt_with_retries(self, attempt_decrypt):
+        # Run attempt_decrypt(passphrase) until it succeeds or retries run out.
+        # Only passphrase failures are retried with a new prompt; corrupt input
+        # is raised right away so the caller can re-queue it for later.
+        last_error = None
+        for attempt in range(1, self.MAX_PASSPHRASE_RETRIES + 1):
+            try:
+                passphrase = self.passphrase or getpass.getpass(
+                    f"Enter PGP passphrase (attempt {attempt}/{self.MAX_PASSPHRASE_RETRIES}): "
+                )
+                start = time.perf_counter()
+                status = attempt_decrypt(passphrase)
+                GPG_DURATION.observe(time.perf_counter() - start, operation='decrypt')
+                if status.ok:
+                    return status
+                failure = self._classify_failure(status)
+                if failure == 'corrupt':
+                    raise CorruptCiphertextError(
+                        f"Decryption failed: ciphertext is truncated or corrupt — {status.status}"
+                    )
+                logging.warning(f"Attempt {attempt}: Decryption failed — {status.status}")
+                last_error = RuntimeError(f"Decryption failed: {status.status} — {status.stderr}")
+                if failure == 'passphrase' and self.passphrase:
+                    # A configured passphrase won't get any better by retrying
+                    break
+            except CorruptCiphertextError:
+                raise
             except Exception as e:
                 logging.error(f"Attempt {attempt}: Decryption raised an error: {str(e)}")
                 last_error = e
-            finally:
-                self._remove(temp_path)
 
-        raise RuntimeError(f"Decryption failed after {self.MAX_PASSPHRASE_RETRIES} attempts. Last error: {last_error}")
+        attempts = f"{attempt} attempt" + ("s" if attempt != 1 else "")
+        raise RuntimeError(f"Decryption failed after {attempts}. Last error: {last_error}")
+
+    def _gpg_slot(self):
+        # Held while a gpg process runs, to cap concurrent gpg processes
+        return self.governor.gpg_slots if self.governor else contextlib.nullcontext()
+
+    def _classify_failure(self, status):
+        # Sort a failed gpg result into 'passphrase', 'corrupt' or 'other'
+        output = f"{status.status or ''}\n{status.stderr or ''}".lower()
+        if any(marker in output for marker in PASSPHRASE_FAILURE_MARKERS):
+            return 'passphrase'
+        if any(marker in output for marker in CORRUPT_INPUT_MARKERS):
+            return 'corrupt'
+        return 'other'
 
     def _remove(self, path):
         try:
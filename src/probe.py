@@ -0,0 +1,57 @@
+import os
+import logging
+
+try:
+    from .state import state_dir, load_json, save_json
+except ImportError:
+    from state import state_dir, load_json, save_json
+
+
+def file_signature(paths):
+    """
+    Cheap fingerprint of a set of files: (path, mtime_ns, size) for each one.
+
+    Missing files are recorded as such, so creating one changes the signature too.
+    """
+    signature = []
+    for path in paths:
+        if not path:
+            signature.append([None, None, None])
+            continue
+        try:
+            st = os.stat(path)
+            signature.append([path, st.st_mtime_ns, st.st_size])
+        except OSError:
+            signature.append([path, None, None])
+    return signature
+
+
+class ProbeCache:
+    def __init__(self, config):
+        """
+        Results of expensive environment probes (gpg version, key lookup),
+        persisted in the state directory.
+
+        Every entry is stored with the signature of its inputs; a lookup whose
+        signature differs is a miss, so replacing the gpg binary or changing
+        the keyring invalidates the cached result.
+
+        Args:
+            config: Application configuration
+        """
+        self.path = os.path.join(state_dir(config), 'probe.json')
+        self.entries = load_json(self.path, {})
+
+    def get(self, name, signature):
+        """Cached value for name, or None if missing or recorded for other inputs."""
+        entry = self.entries.get(name)
+        if entry and entry.get('signature') == signature:
+            return entry.get('value')
+        return None
+
+    def put(self, name, signature, value):
+        self.entries[name] = {'signature': signature, 'value': value}
+        try:
+            save_json(self.path, self.entries)
+        except OSError as e:
+            logging.debug(f"Failed to save probe cache {self.path}: {e}")
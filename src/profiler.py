@@ -0,0 +1,103 @@
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        """
+        Statistical profiler sampling the stacks of all threads.
+
+        Unlike cProfile it sees the watchdog and worker threads where the
+        sync work actually happens, and its overhead is bounded by the
+        sampling interval rather than the number of function calls.
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.stacks = Counter()  # tuple of frames (outermost first) -> samples
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = None
+        self._started_at = None
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    def report(self, limit=40):
+        """Text report of the functions with the most self and cumulative samples."""
+        own = Counter()
+        cumulative = Counter()
+        total = sum(self.stacks.values()) or 1
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                cumulative[function] += count
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0
+        lines = [f"Sampling profile: {self.samples} samples over {elapsed:.1f}s, every {self.interval * 1000:.1f}ms", ""]
+        for title, counts in (("Self time", own), ("Cumulative time", cumulative)):
+            lines.append(f"{title}:")
+            lines.append(f"{'samples':>9} {'%':>6}  function")
+            for function, count in counts.most_common(limit):
+                lines.append(f"{count:9d} {100 * count / total:5.1f}%  {function}")
+            lines.append("")
+        return "\n".join(lines)
+
+    def collapsed(self):
+        """Stacks in collapsed format, one per line, for flame graph tools."""
+        return "\n".join(
+            ";".join(stack) + f" {count}" for stack, count in self.stacks.most_common()
+        ) + "\n"
+
+    def write_report(self, path):
+        """Write the text report to path and the collapsed stacks to path + '.collapsed'."""
+        with open(path, 'w') as f:
+            f.write(self.report())
+        with open(f"{path}.collapsed", 'w') as f:
+            f.write(self.collapsed())
+        logging.info(f"Profile written to {path} (flame graph input: {path}.collapsed)")
+
+
+def profile_for(seconds, path, interval=0.005):
+    """Profile all threads for a fixed time in the background, then write the report."""
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+
+    def finish():
+        profiler.stop()
+        try:
+            profiler.write_report(path)
+        except OSError as e:
+            logging.error(f"Failed to write profile to {path}: {str(e)}")
+
+    timer = threading.Timer(seconds, finish)
+    timer.daemon = True
+    timer.start()
+    logging.info(f"Profiling for {seconds}s")
+    return profiler
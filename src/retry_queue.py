@@ -0,0 +1,166 @@
+import os
+import time
+import random
+import logging
+import threading
+from pathlib import Path
+
+try:
+    from .state import load_json, save_json
+except ImportError:
+    from state import load_json, save_json
+
+
+class RetryQueue:
+    def __init__(self, path, handlers, max_attempts=8, base_delay=2.0, max_delay=3600.0):
+        """
+        Durable queue of failed operations, retried with exponential backoff.
+
+        Each (kind, path) pair has at most one entry. Entries survive restarts
+        in a JSON file and are dropped after `max_attempts` failed attempts.
+        While paused, nothing is retried and every entry is kept.
+
+        Args:
+            path: JSON file the queue is persisted to
+            handlers: Dict mapping an operation kind to the function retrying it.
+                The function is expected to call record_failure() if it fails again.
+            max_attempts: Attempts per path before giving up
+            base_delay: Delay in seconds before the first retry
+            max_delay: Upper bound on the delay between retries
+        """
+        self.path = path
+        self.handlers = handlers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.entries = {}  # (kind, path) -> {kind, path, attempts, next_at, error}
+        for entry in load_json(path, []):
+            self.entries[(entry['kind'], entry['path'])] = entry
+        if self.entries:
+            logging.info(f"Loaded {len(self.entries)} pending retries from {path}")
+
+        self.paused = False
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def record_failure(self, kind, path, error):
+        """Schedule a failed operation for another attempt."""
+        key = (kind, str(path))
+        with self._lock:
+            entry = self.entries.get(key)
+            attempts = (entry['attempts'] if entry else 0) + 1
+            if attempts > self.max_attempts:
+                del self.entries[key]
+                logging.error(f"Giving up on {kind} change for {path} after {self.max_attempts} attempts: {str(error)}")
+            else:
+                delay = self._backoff(attempts)
+                self.entries[key] = {
+                    'kind': kind, 'path': str(path), 'attempts': attempts,
+                    'next_at': time.time() + delay, 'error': str(error),
+                }
+                logging.warning(f"Retrying {kind} change for {path} in {delay:.1f}s (attempt {attempts}/{self.max_attempts})")
+            self._save()
+        self._wakeup.set()
+
+    def record_success(self, kind, path):
+        """Forget a pending retry after the operation succeeded."""
+        key = (kind, str(path))
+        if key not in self.entries:
+            return
+        with self._lock:
+            if self.entries.pop(key, None) is not None:
+                self._save()
+
+    def retry_now(self):
+        """Make every pending entry due immediately."""
+        with self._lock:
+            for entry in self.entries.values():
+                entry['next_at'] = 0
+            if self.entries:
+                self._save()
+        self._wakeup.set()
+
+    def pause(self):
+        """Stop retrying until resume(); a paused handler would only hold the change."""
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+        self._wakeup.set()
+
+    def start(self):
+        """Start retrying due entries in the background."""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="retry-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop retrying; pending entries stay persisted."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _backoff(self, attempts):
+        # Exponential backoff with jitter in [delay / 2, delay]
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return random.uniform(delay / 2, delay)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                waiting = [e['next_at'] for k, e in self.entries.items() if k not in self._running]
+            timeout = max(0.0, min(waiting) - time.time()) if waiting and not self.paused else None
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            if not self._stopped.is_set():
+                self.run_due()
+
+    def run_due(self):
+        """Retry all entries whose backoff has expired."""
+        if self.paused:
+            return
+        now = time.time()
+        with self._lock:
+            due = [
+                dict(e) for k, e in self.entries.items()
+                if e['next_at'] <= now and k not in self._running
+            ]
+            self._running.update((e['kind'], e['path']) for e in due)
+        for entry in due:
+            key = (entry['kind'], entry['path'])
+            try:
+                if self._stopped.is_set() or self.paused:
+                    continue
+                handler = self.handlers.get(entry['kind'])
+                if handler is None or not os.path.lexists(entry['path']):
+                    # Nothing left to retry
+                    self.record_success(*key)
+                    continue
+                handler(Path(entry['path']))
+                with self._lock:
+                    current = self.entries.get(key)
+                    if current is not None and current['attempts'] == entry['attempts']:
+                        # The handler did not fail again (succeeded or skipped the file)
+                        del self.entries[key]
+                        self._save()
+            except Exception as e:
+                self.record_failure(entry['kind'], entry['path'], e)
+            finally:
+                with self._lock:
+                    self._running.discard(key)
+
+    def _save(self):
+        # Called with self._lock held
+        try:
+            save_json(self.path, list(self.entries.values()))
+        except OSError as e:
+            logging.warning(f"Failed to persist retry queue to {self.path}: {str(e)}")
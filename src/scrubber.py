@@ -0,0 +1,464 @@
+import os
+import time
+import base64
+import hashlib
+import logging
+import binascii
+import threading
+
+try:
+    from .governor import MB, ThrottledReader, TokenBucket
+    from .metrics import REGISTRY
+    from .stability import is_partial_download
+    from .state import load_json, save_json
+except ImportError:
+    from governor import MB, ThrottledReader, TokenBucket
+    from metrics import REGISTRY
+    from stability import is_partial_download
+    from state import load_json, save_json
+
+SCRUBBED = REGISTRY.counter(
+    'guardian_sync_scrubbed_total', 'Ciphertexts checked by the scrubber, by result', ('result',))
+
+ARMOR_BEGIN = b'-----BEGIN PGP MESSAGE-----'
+ARMOR_END = b'-----END PGP MESSAGE-----'
+READ_CHUNK = 256 * 1024
+
+# Packets that may appear at the top level of an encrypted message (RFC 9580):
+# public-key and symmetric-key encrypted session keys, marker, and the
+# (integrity protected / AEAD) encrypted data packets
+SESSION_KEY_TAGS = {1, 3}
+ENCRYPTED_DATA_TAGS = {9, 18, 20}
+TOP_LEVEL_TAGS = SESSION_KEY_TAGS | ENCRYPTED_DATA_TAGS | {10}
+
+
+def _crc24_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 16
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= 0x1864CFB
+        table.append(crc & 0xFFFFFF)
+    return table
+
+
+_CRC24_TABLE = _crc24_table()
+
+
+def crc24(data, crc=0xB704CE):
+    """OpenPGP armor checksum (CRC-24) of data, continuing from crc."""
+    table = _CRC24_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFF) ^ table[(crc >> 16) ^ byte]
+    return crc
+
+
+class PacketScanner:
+    def __init__(self):
+        """
+        Incremental check of the OpenPGP packet framing of an encrypted message.
+
+        Only packet headers are parsed; bodies are skipped by their declared
+        length. Fed the whole message, finish() tells whether it is a sequence
+        of complete packets of the kinds an encrypted message consists of.
+        """
+        self.buffer = b''
+        self.skip = 0  # body bytes of the current packet still to come
+        self.partial = False  # current body uses partial lengths, another length follows
+        self.indeterminate = False  # old-format packet running to the end of the data
+        self.tags = []
+        self.error = None
+
+    def feed(self, data):
+        if self.error or self.indeterminate:
+            return
+        self.buffer += data
+        while self.buffer and not self.error:
+            if self.skip:
+                taken = min(self.skip, len(self.buffer))
+                self.skip -= taken
+                self.buffer = self.buffer[taken:]
+                continue
+            if not self._header():
+                return
+
+    def _header(self):
+        # Parse the next packet header (or partial body length) from the buffer;
+        # False if more data is needed
+        buffer = self.buffer
+        if self.partial:
+            length = self._new_length(buffer, 0)
+            if length is None:
+                return False
+            self.skip, self.partial, used = length
+            self.buffer = buffer[used:]
+            return True
+        first = buffer[0]
+        if not first & 0x80:
+            self.error = f"invalid packet header byte 0x{first:02x} after {len(self.tags)} packet(s)"
+            return True
+        if first & 0x40:
+            tag = first & 0x3F
+            length = self._new_length(buffer, 1)
+            if length is None:
+                return False
+            self.skip, self.partial, used = length
+        else:
+            tag = (first >> 2) & 0x0F
+            length_type = first & 0x03
+            if length_type == 3:
+                self.indeterminate = True
+                used = 1
+            else:
+                size = 1 << length_type
+                if len(buffer) < 1 + size:
+                    return False
+                self.skip = int.from_bytes(buffer[1:1 + size], 'big')
+                used = 1 + size
+        if tag not in TOP_LEVEL_TAGS:
+            self.error = f"unexpected packet type {tag} in an encrypted message"
+            return True
+        self.tags.append(tag)
+        self.buffer = buffer[used:]
+        return True
+
+    @staticmethod
+    def _new_length(buffer, offset):
+        # New-format body length at offset: (length, partial, bytes used) or None if incomplete
+        if len(buffer) <= offset:
+            return None
+        octet = buffer[offset]
+        if octet < 192:
+            return octet, False, offset + 1
+        if octet < 224:
+            if len(buffer) < offset + 2:
+                return None
+            return ((octet - 192) << 8) + buffer[offset + 1] + 192, False, offset + 2
+        if octet == 255:
+            if len(buffer) < offset + 5:
+                return None
+            return int.from_bytes(buffer[offset + 1:offset + 5], 'big'), False, offset + 5
+        return 1 << (octet & 0x1F), True, offset + 1
+
+    def finish(self):
+        """None if the message is structurally complete, else the reason it is not."""
+        if self.error:
+            return self.error
+        if self.skip or self.partial or self.buffer:
+            return "truncated: the last packet is incomplete"
+        if not any(tag in ENCRYPTED_DATA_TAGS for tag in self.tags):
+            return "no encrypted data packet"
+        if not any(tag in SESSION_KEY_TAGS for tag in self.tags):
+            return "no session key packet"
+        return None
+
+
+class _ArmorReader:
+    def __init__(self, scanner):
+        # Decodes an ASCII-armored message line by line into the scanner, checking its CRC-24
+        self.scanner = scanner
+        self.state = 'begin'
+        self.pending = b''
+        self.crc = 0xB704CE
+        self.checksum = None
+        self.error = None
+
+    def feed(self, data):
+        lines = (self.pending + data).split(b'\n')
+        self.pending = lines.pop()
+        for line in lines:
+            self._line(line.strip())
+            if self.error:
+                return
+
+    def _line(self, line):
+        if self.state == 'begin':
+            if line == ARMOR_BEGIN:
+                self.state = 'headers'
+            elif line:
+                self.error = "invalid armor: no BEGIN PGP MESSAGE line"
+        elif self.state == 'headers':
+            if not line:
+                self.state = 'body'
+            elif b': ' not in line:
+                # No armor headers: this is already the first body line
+                self.state = 'body'
+                self._line(line)
+        elif self.state == 'body':
+            if line == ARMOR_END:
+                self.state = 'end'
+            elif line.startswith(b'=') and len(line) == 5:
+                self.checksum = line[1:]
+                self.state = 'footer'
+            elif line:
+                try:
+                    data = base64.b64decode(line, validate=True)
+                except (binascii.Error, ValueError):
+                    self.error = "invalid armor: bad base64 line"
+                    return
+                self.crc = crc24(data, self.crc)
+                self.scanner.feed(data)
+        elif self.state == 'footer':
+            if line == ARMOR_END:
+                self.state = 'end'
+            elif line:
+                self.error = "invalid armor: text after the checksum"
+
+    def finish(self):
+        if self.pending and not self.error:
+            self._line(self.pending.strip())
+            self.pending = b''
+            if self.error and self.state != 'end':
+                # The file ends in the middle of a line
+                return "truncated: no END PGP MESSAGE line"
+        if self.error:
+            return self.error
+        if self.state != 'end':
+            return "truncated: no END PGP MESSAGE line"
+        if self.checksum is not None:
+            try:
+                expected = int.from_bytes(base64.b64decode(self.checksum, validate=True), 'big')
+            except (binascii.Error, ValueError):
+                return "invalid armor: bad checksum line"
+            if expected != self.crc:
+                return "armor checksum (CRC-24) mismatch"
+        return self.scanner.finish()
+
+
+def check_ciphertext(stream):
+    """
+    Structural check of an OpenPGP message read from a binary stream, armored or not.
+
+    Returns (problem or None, SHA-256 of the bytes read). Nothing is decrypted.
+    """
+    digest = hashlib.sha256()
+    scanner = PacketScanner()
+    reader = None
+    first = True
+    for chunk in iter(lambda: stream.read(READ_CHUNK), b''):
+        digest.update(chunk)
+        if first:
+            first = False
+            reader = _ArmorReader(scanner) if chunk.lstrip().startswith(b'-----') else scanner
+        reader.feed(chunk)
+    if reader is None:
+        return "empty file", digest.hexdigest()
+    return reader.finish(), digest.hexdigest()
+
+
+class Scrubber:
+    def __init__(self, sync_manager, max_read_mbps=1.0, pass_interval=86400.0, min_age=60.0, republish=True):
+        """
+        Background integrity check of the ciphertexts in the encrypted folder.
+
+        Walks the encrypted folder in a fixed order, one file at a time,
+        reading at most max_read_mbps. All work is proportional to the bytes
+        read, so this also bounds the CPU used. Each ciphertext gets a
+        structural check (armor, CRC-24 and packet framing, without running
+        gpg) and, if it still has the size and mtime recorded when it was
+        last decrypted or uploaded here, a comparison with the recorded
+        SHA-256. Files changed within min_age seconds are left for later.
+
+        The position is persisted, so the walk resumes where it stopped
+        after a restart; a new pass starts pass_interval seconds after the
+        previous one completed. Damaged ciphertexts are logged and listed in
+        scrub.json in the state directory. With republish, one whose local
+        plaintext is still the version synced here is encrypted and uploaded
+        again.
+
+        Args:
+            sync_manager: SyncManager whose encrypted folder is checked
+            max_read_mbps: Read budget in MB/s
+            pass_interval: Seconds from the end of one pass to the start of the next
+            min_age: Seconds a file must be unchanged before it is checked
+            republish: Re-upload damaged ciphertexts from local plaintext
+        """
+        self.sync_manager = sync_manager
+        self.bucket = TokenBucket(int(max_read_mbps * MB) if max_read_mbps else None)
+        self.pass_interval = pass_interval
+        self.min_age = min_age
+        self.republish = republish
+        self.path = os.path.join(sync_manager.state_path, 'scrub.json')
+
+        state = load_json(self.path, {}) or {}
+        self.cursor = state.get('cursor')
+        self.pass_started = state.get('pass_started')
+        self.last_pass_completed = state.get('last_pass_completed')
+        self.checked = state.get('checked', 0)
+        self.corrupt = state.get('corrupt', {})
+        self._saved = time.monotonic()
+        self._walker = None  # walk of the current pass, resumed by each step
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config, sync_manager):
+        """The scrubber configured under `sync.scrub`, or None if it is not enabled."""
+        options = (config.get('sync', {}) or {}).get('scrub', {}) or {}
+        if not options.get('enabled', False):
+            return None
+        return cls(
+            sync_manager,
+            max_read_mbps=float(options.get('max_read_mbps', 1)),
+            pass_interval=float(options.get('pass_interval_seconds', 86400)),
+            min_age=float(options.get('min_age_seconds', 60)),
+            republish=bool(options.get('republish', True)),
+        )
+
+    def _walk(self, after=None):
+        # Ciphertexts below the encrypted folder in depth-first name order, as
+        # ('/'-separated relative path, path); with after, only those following it
+        root = os.fspath(self.sync_manager.remote_guard.root)
+        return self._walk_dir((), root, tuple(after.split('/')) if after else None)
+
+    def _walk_dir(self, parts, directory, after):
+        rules = self.sync_manager.remote_ignore
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            logging.warning(f"Scrubber failed to list {directory}: {str(e)}")
+            return
+        for entry in entries:
+            entry_parts = parts + (entry.name,)
+            if entry.is_dir(follow_symlinks=False):
+                # Directories entirely before the cursor were done in this pass
+                if after and entry_parts < after[:len(entry_parts)]:
+                    continue
+                if not rules.ignored(entry.path, is_dir=True):
+                    yield from self._walk_dir(entry_parts, entry.path, after)
+            elif entry.is_file(follow_symlinks=False):
+                if not entry.name.endswith('.gpg') or is_partial_download(entry.name):
+                    continue
+                if after and entry_parts <= after:
+                    continue
+                if not rules.ignored(entry.path):
+                    yield '/'.join(entry_parts), entry.path
+
+    def check(self, path):
+        """
+        Check one ciphertext; returns the problem found, or None.
+
+        Returns None without a verdict for files that are too new or that
+        change while being read.
+        """
+        # Through the guard, so a symlink planted in the encrypted folder is not followed
+        with self.sync_manager.remote_guard.open(path) as f:
+            st = os.fstat(f.fileno())
+            if time.time() - st.st_mtime < self.min_age:
+                return None
+            problem, digest = check_ciphertext(ThrottledReader(f, self.bucket) if self.bucket.rate else f)
+        after = os.stat(path, follow_symlinks=False)
+        if (after.st_size, after.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+            return None  # rewritten meanwhile; checked again next pass
+        if problem is None:
+            entry = self.sync_manager.fingerprints.get(self.sync_manager._remote_key(path))
+            if (entry is not None and (entry['size'], entry['mtime_ns']) == (st.st_size, st.st_mtime_ns)
+                    and entry['sha256'] != digest):
+                problem = "content differs from the SHA-256 recorded when it was synced"
+        return problem
+
+    def step(self):
+        """Check the next ciphertext of the current pass; False once the pass is complete."""
+        if self.pass_started is None:
+            self.pass_started = time.time()
+            self.checked = 0
+        if self._walker is None:
+            # A new pass, or the first step after a restart or an error: start at the cursor
+            self._walker = self._walk(self.cursor)
+        try:
+            found = next(self._walker, None)
+            if found is not None:
+                self._check_one(*found)
+        except Exception:
+            # Start again at the cursor on the next step
+            self._walker = None
+            raise
+        if found is not None:
+            self.cursor = found[0]
+            self.checked += 1
+            if time.monotonic() - self._saved > 30:
+                self._save()
+            return True
+        self._walker = None
+        self.cursor = None
+        self.last_pass_completed = time.time()
+        logging.info(f"Scrub pass complete: {self.checked} ciphertext(s) checked, {len(self.corrupt)} damaged")
+        self.pass_started = None
+        self._save()
+        return False
+
+    def _check_one(self, rel, path):
+        try:
+            problem = self.check(path)
+        except FileNotFoundError:
+            problem = None
+        except OSError as e:
+            logging.warning(f"Scrubber failed to read {path}: {str(e)}")
+            SCRUBBED.inc(result='error')
+            return
+        if problem is None:
+            with self._lock:
+                self.corrupt.pop(rel, None)
+            SCRUBBED.inc(result='ok')
+            return
+        logging.warning(f"Damaged ciphertext {path}: {problem}")
+        republished = False
+        if self.republish:
+            try:
+                republished = self.sync_manager.republish(path)
+            except Exception as e:
+                logging.warning(f"Failed to republish {path}: {str(e)}")
+        if republished:
+            logging.info(f"Republished {path} from its local plaintext")
+        SCRUBBED.inc(result='republished' if republished else 'damaged')
+        with self._lock:
+            self.corrupt[rel] = {'problem': problem, 'detected': time.time(), 'republished': republished}
+
+    def snapshot(self):
+        """Progress and damaged ciphertexts, as written to scrub.json."""
+        with self._lock:
+            return {
+                'cursor': self.cursor,
+                'pass_started': self.pass_started,
+                'last_pass_completed': self.last_pass_completed,
+                'checked': self.checked,
+                'corrupt': dict(self.corrupt),
+            }
+
+    def _save(self):
+        save_json(self.path, self.snapshot())
+        self._saved = time.monotonic()
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="scrubber", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._save()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if self.pass_started is None and self.last_pass_completed is not None:
+                # Wait for the next pass
+                delay = self.last_pass_completed + self.pass_interval - time.time()
+                if delay > 0 and self._stopped.wait(min(delay, 3600)):
+                    return
+                if delay > 0:
+                    continue
+            if self.sync_manager.paused:
+                self._stopped.wait(1.0)
+                continue
+            try:
+                self.step()
+            except Exception as e:
+                logging.error(f"Scrubber error: {str(e)}")
+                self._stopped.wait(60)
@@ -0,0 +1,115 @@
+import os
+import time
+import logging
+import threading
+
+# Names sync clients give files while they are still being downloaded
+PARTIAL_DOWNLOAD_PREFIXES = ('.syncthing.', '.~', '~$', '.dropbox')
+PARTIAL_DOWNLOAD_SUFFIXES = (
+    '.partial', '.part', '.tmp', '.crdownload', '.download', '.!sync', '.filepart', '.~tmp~'
+)
+
+
+def is_partial_download(name):
+    """Check whether a file name marks an incomplete download."""
+    lower = name.lower()
+    return lower.startswith(PARTIAL_DOWNLOAD_PREFIXES) or lower.endswith(PARTIAL_DOWNLOAD_SUFFIXES)
+
+
+class StabilityTracker:
+    def __init__(self, callback, settle_seconds=2.0, poll_interval=0.25):
+        """
+        Hold back files until they have stopped changing.
+
+        A submitted path is passed to the callback once its size and mtime
+        have been unchanged for `settle_seconds`. Paths can also be submitted
+        as ready (e.g. after a partial download was renamed to its final name).
+
+        Args:
+            callback: Function to call with a path once it is stable
+            settle_seconds: How long size and mtime must stay unchanged
+            poll_interval: How often pending paths are checked
+        """
+        self.callback = callback
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        # path -> [stat signature, stable since]
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def submit(self, path, ready=False):
+        """Queue a path; it is passed on once stable."""
+        if self.settle_seconds <= 0:
+            self.callback(path)
+            return
+        now = time.monotonic()
+        with self._lock:
+            # A ready file is passed on with the next poll
+            stable_since = now - self.settle_seconds if ready else now
+            self.pending[path] = [self._signature(path), stable_since]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stability-tracker", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def discard(self, path):
+        """Stop tracking path. Returns True if it was pending."""
+        with self._lock:
+            return self.pending.pop(path, None) is not None
+
+    def stop(self):
+        """Stop tracking; paths still pending are dropped."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _signature(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                has_pending = bool(self.pending)
+            if not has_pending:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            if self._stopped.wait(self.poll_interval):
+                break
+            for path in self._collect_stable():
+                try:
+                    self.callback(path)
+                except Exception as e:
+                    logging.error(f"Error handling stable file {path}: {str(e)}")
+
+    def _collect_stable(self):
+        now = time.monotonic()
+        with self._lock:
+            items = list(self.pending.items())
+        stable = []
+        for path, entry in items:
+            current = self._signature(path)
+            with self._lock:
+                if self.pending.get(path) is not entry:
+                    # Resubmitted meanwhile
+                    continue
+                signature, stable_since = entry
+                if current is None:
+                    # Gone (renamed or deleted) before it settled
+                    del self.pending[path]
+                elif current != signature:
+                    entry[0] = current
+                    entry[1] = now
+                elif now - stable_since >= self.settle_seconds:
+                    del self.pending[path]
+                    stable.append(path)
+        return stable
@@ -0,0 +1,52 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+DEFAULT_MEMORY_BUDGET_BYTES = 64 * 1024 * 1024
+
+
+class MemoryStaging:
+    def __init__(self, config):
+        """
+        Decide whether a file is staged in memory or on disk.
+
+        Files up to `sync.memory_staging_max_bytes` are passed to gpg through
+        in-memory buffers, so no temporary file is written. All in-flight
+        in-memory stages together never exceed `sync.memory_staging_budget_bytes`;
+        once the budget is used up, further files fall back to disk staging.
+
+        Args:
+            config: Application configuration
+        """
+        sync_config = config.get('sync', {}) or {}
+        self.max_file_bytes = int(sync_config.get('memory_staging_max_bytes', 0) or 0)
+        self.budget_bytes = int(sync_config.get('memory_staging_budget_bytes', DEFAULT_MEMORY_BUDGET_BYTES))
+        self.in_use = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_file_bytes > 0 and self.budget_bytes > 0
+
+    @contextmanager
+    def reserve(self, size):
+        """
+        Reserve `size` bytes of the memory budget for the duration of the block.
+
+        Yields True if the file should be staged in memory, False if it should
+        be staged on disk. Never blocks.
+        """
+        reserved = False
+        if self.enabled and size <= self.max_file_bytes:
+            with self._lock:
+                if self.in_use + size <= self.budget_bytes:
+                    self.in_use += size
+                    reserved = True
+            if not reserved:
+                logging.debug(f"Memory staging budget exhausted, staging {size} bytes on disk")
+        try:
+            yield reserved
+        finally:
+            if reserved:
+                with self._lock:
+                    self.in_use -= size
@@ -0,0 +1,62 @@
+import os
+import json
+import hashlib
+import tempfile
+
+DEFAULT_STATE_DIR = "~/.guardian-sync"
+
+
+def base_state_dir(config):
+    """
+    Return the directory holding the state of all sync pairs.
+
+    Taken from the top-level `state_dir` setting, the GUARDIAN_SYNC_STATE_DIR
+    environment variable or ~/.guardian-sync.
+    """
+    base = config.get('state_dir') or os.environ.get('GUARDIAN_SYNC_STATE_DIR') or DEFAULT_STATE_DIR
+    path = os.path.expanduser(base)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def state_dir(config):
+    """
+    Return the directory holding persistent state for a sync pair.
+
+    Each pair of monitored path and encrypted folder gets its own
+    subdirectory of base_state_dir.
+    """
+    sync_config = config.get('sync_folder', {})
+    pair = "\0".join([
+        os.path.abspath(config.get('local', {}).get('monitored_path', '')),
+        os.path.abspath(sync_config.get('path') or ''),
+        sync_config.get('encrypted_folder', 'encrypted_files'),
+    ])
+    path = os.path.join(base_state_dir(config), hashlib.sha256(pair.encode()).hexdigest()[:16])
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def load_json(path, default=None):
+    """Load a JSON state file, returning default if it is missing or unreadable."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def save_json(path, data):
+    """Atomically replace a JSON state file."""
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".partial", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -1,11 +1,24 @@
 import os
 import logging
+import tempfile
+
+try:
+    from .file_ops import clone_file
+    from .durability import Durability
+except ImportError:
+    from file_ops import clone_file
+    from durability import Durability
 
 
 class SyncFolderClient:
-    def __init__(self, config):
-        """Initialize sync folder client with configuration."""
+    def __init__(self, config, governor=None):
+        """
+        Initialize sync folder client with configuration.
+
+        An optional ResourceGovernor limits the bandwidth of uploads and downloads.
+        """
         self.config = config
+        self.governor = governor
         # Get sync folder path from config or try to detect it
         self.sync_folder_path = config.get("sync_folder", {}).get("path")
         if not self.sync_folder_path:
@@ -20,6 +33,8 @@ class SyncFolderClient:
         )
         # Create encrypted folder if it doesn't exist
         os.makedirs(self.encrypted_path, exist_ok=True)
+        # Controls how uploads are made durable before the sync client sees them
+        self.durability = Durability(config)
 
     def _detect_sync_folder_path(self):
         """Try to detect a likely sync folder path (fallback for user convenience)."""
@@ -89,18 +104,69 @@ class SyncFolderClient:
             else:
                 raise FileNotFoundError(f"File '{file_id}' not found in sync folder.")
         os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-        with open(src, "rb") as fsrc, open(dest_path, "wb") as fdst:
-            fdst.write(fsrc.read())
+        if self.governor:
+            self.governor.read(os.path.getsize(src))
+        clone_file(src, dest_path)
         return dest_path
 
     def upload_file(self, src_path, dest_path=None):
         """Upload a file to the sync folder."""
         if dest_path is None:
             dest_path = os.path.join(self.encrypted_path, os.path.basename(src_path))
-        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-        with open(src_path, "rb") as fsrc, open(dest_path, "wb") as fdst:
-            fdst.write(fsrc.read())
-        return {"id": dest_path, "name": os.path.basename(dest_path)}
+        if self.governor:
+            self.governor.written(os.path.getsize(src_path))
+        st = self._publish(dest_path, lambda temp_path: clone_file(src_path, temp_path))
+        return self._uploaded(dest_path, st)
+
+    def upload_bytes(self, data, dest_path):
+        """Upload in-memory file content to the sync folder."""
+        def write(temp_path):
+            with open(temp_path, "wb") as fdst:
+                fdst.write(data)
+        if self.governor:
+            self.governor.written(len(data))
+        st = self._publish(dest_path, write)
+        return self._uploaded(dest_path, st)
+
+    def publish(self, dest_path, write):
+        """Create a sync folder file by calling write(temp_path), then move it into place atomically."""
+        st = self._publish(dest_path, write)
+        return self._uploaded(dest_path, st)
+
+    @staticmethod
+    def _uploaded(dest_path, st):
+        # size and mtime_ns are those dest_path will have once published; with
+        # group durability it may not be in place yet, so don't stat it
+        return {
+            "id": dest_path, "name": os.path.basename(dest_path),
+            "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+        }
+
+    def _publish(self, dest_path, write):
+        # Write to a hidden temp next to dest, then rename it into place,
+        # so the sync client never picks up a partially written file.
+        # Returns the stat of the written file; the rename keeps size and mtime
+        dest_dir = os.path.dirname(dest_path)
+        os.makedirs(dest_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            prefix=f".{os.path.basename(dest_path)}.", suffix=".partial", dir=dest_dir
+        )
+        os.close(fd)
+        try:
+            write(temp_path)
+            st = os.stat(temp_path)
+            self.durability.publish(temp_path, dest_path)
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        return st
+
+    def close(self):
+        """Commit pending uploads."""
+        self.durability.close()
 
     def ensure_folder_exists(self, folder_path):
         """Ensure a folder exists in the sync folder."""
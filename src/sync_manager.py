@@ -1,32 +1,110 @@
 import os
+import json
 import time
-import shutil
+import hashlib
 import logging
+import tempfile
 import threading
+import weakref
 
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from pathlib import Path
-from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+try:
+    from .activity import Activity
+    from .batcher import ChangeBatcher
+    from .errors import CorruptCiphertextError
+    from .file_ops import clone_atomic, clone_file, partial_path_pattern, write_atomic
+    from .fingerprints import FingerprintIndex, sha256_file, sha256_stream
+    from .hydration import Catalog, HydrationPolicy, evict_to_budget
+    from .ignore_rules import IGNORE_FILE, IgnoreRules, WatchSet, new_observer
+    from .journal import OperationJournal
+    from .manifest import MANIFEST_DIR, Manifest
+    from .metrics import CONFLICTS, EVENTS, FAILURES, QUEUE_DEPTH, SYNC_LAG
+    from .path_guard import PathGuard
+    from .path_mapper import PathMapper
+    from .path_locks import PathLocks
+    from .retry_queue import RetryQueue
+    from .scrubber import Scrubber
+    from .staging import MemoryStaging
+    from .stability import StabilityTracker, is_partial_download
+    from .state import state_dir
+    from .tracing import span
+    from .versions import VERSION_SUFFIX, VersionStore, device_id, dominates, increment, merge, synced_here, unchanged_since
+except ImportError:
+    from activity import Activity
+    from batcher import ChangeBatcher
+    from errors import CorruptCiphertextError
+    from file_ops import clone_atomic, clone_file, partial_path_pattern, write_atomic
+    from fingerprints import FingerprintIndex, sha256_file, sha256_stream
+    from hydration import Catalog, HydrationPolicy, evict_to_budget
+    from ignore_rules import IGNORE_FILE, IgnoreRules, WatchSet, new_observer
+    from journal import OperationJournal
+    from manifest import MANIFEST_DIR, Manifest
+    from metrics import CONFLICTS, EVENTS, FAILURES, QUEUE_DEPTH, SYNC_LAG
+    from path_guard import PathGuard
+    from path_mapper import PathMapper
+    from path_locks import PathLocks
+    from retry_queue import RetryQueue
+    from scrubber import Scrubber
+    from staging import MemoryStaging
+    from stability import StabilityTracker, is_partial_download
+    from state import state_dir
+    from tracing import span
+    from versions import VERSION_SUFFIX, VersionStore, device_id, dominates, increment, merge, synced_here, unchanged_since
+
+# Every live manager; the queue depth gauges report the sum over all sync pairs
+_MANAGERS = weakref.WeakSet()
+
 class SyncFolderChangeHandler(FileSystemEventHandler):
-    def __init__(self, callback):
-        """Initialize sync folder change handler with callback function."""
+    def __init__(self, callback, ready_callback=None, directory_callback=None, ignore=None,
+                 created_directory_callback=None):
+        """
+        Initialize sync folder change handler.
+
+        Args:
+            callback: Function to call with a changed file path
+            ready_callback: Function to call with a file path that is known to be
+                complete, i.e. a partial download renamed to its final name
+            directory_callback: Function to call with the path of a directory
+                that was moved or deleted
+            ignore: IgnoreRules; matching events are dropped first thing
+            created_directory_callback: Function to call with the path of a
+                directory that was created or moved in
+        """
         self.callback = callback
+        self.ready_callback = ready_callback or callback
+        self.directory_callback = directory_callback
+        self.created_directory_callback = created_directory_callback
+        self.ignore = ignore
         self.last_modified = {}
+
+    def _ignored(self, path, is_directory):
+        if self.ignore and self.ignore.ignored(path, is_directory):
+            EVENTS.inc(handler='remote', outcome='ignored')
+            return True
+        return False
         
     def on_modified(self, event):
         """Handle file modification events."""
-        if event.is_directory:
+        EVENTS.inc(handler='remote', outcome='received')
+        if self._ignored(event.src_path, event.is_directory):
+            return
+        if event.is_directory or is_partial_download(os.path.basename(event.src_path)):
+            EVENTS.inc(handler='remote', outcome='dropped')
             return
             
-        # Get absolute path
-        path = Path(event.src_path).resolve()
+        # Get absolute path; symlinks are rejected later, not resolved here
+        path = Path(os.path.abspath(event.src_path))
         
         # Check if this is a duplicate event
         current_time = time.time()
         if path in self.last_modified:
             # Ignore events that happen within 1 second of the last event for this file
             if current_time - self.last_modified[path] < 1:
+                EVENTS.inc(handler='remote', outcome='deduplicated')
                 return
                 
         self.last_modified[path] = current_time
@@ -36,17 +114,48 @@ class SyncFolderChangeHandler(FileSystemEventHandler):
         
     def on_created(self, event):
         """Handle file creation events."""
-        if event.is_directory:
+        EVENTS.inc(handler='remote', outcome='received')
+        if self._ignored(event.src_path, event.is_directory):
+            return
+        if event.is_directory or is_partial_download(os.path.basename(event.src_path)):
+            EVENTS.inc(handler='remote', outcome='dropped')
+            if event.is_directory and self.created_directory_callback:
+                self.created_directory_callback(event.src_path)
             return
             
-        # Get absolute path
-        path = Path(event.src_path).resolve()
+        # Get absolute path; symlinks are rejected later, not resolved here
+        path = Path(os.path.abspath(event.src_path))
         
         # Call the callback with the created file path
         self.callback(path)
 
+    def on_moved(self, event):
+        """Handle file rename events, e.g. a finished download getting its final name."""
+        EVENTS.inc(handler='remote', outcome='received')
+        if event.is_directory and self.directory_callback:
+            self.directory_callback(event.src_path)
+        if self._ignored(event.dest_path, event.is_directory):
+            return
+        if event.is_directory:
+            EVENTS.inc(handler='remote', outcome='dropped')
+            if self.created_directory_callback:
+                self.created_directory_callback(event.dest_path)
+            return
+
+        path = Path(os.path.abspath(event.dest_path))
+        if is_partial_download(os.path.basename(event.src_path)):
+            # The sync client finished writing it
+            self.ready_callback(path)
+        else:
+            self.callback(path)
+
+    def on_deleted(self, event):
+        """Handle deletions; only directories matter, for cached path checks."""
+        if event.is_directory and self.directory_callback:
+            self.directory_callback(event.src_path)
+
 class SyncManager:
-    def __init__(self, config, sync_folder_client, pgp_handler):
+    def __init__(self, config, sync_folder_client, pgp_handler, observer=None, executor=None):
         """
         Initialize sync manager.
         
@@ -54,10 +163,16 @@ class SyncManager:
             config: Application configuration
             sync_folder_client: Sync folder client instance
             pgp_handler: PGP handler instance
+            observer: Watchdog observer shared with other sync pairs; started and stopped by its owner
+            executor: Worker pool shared with other sync pairs; changes are processed on it
         """
         self.config = config
         self.sync_folder_client = sync_folder_client
         self.pgp_handler = pgp_handler
+        self.shared_observer = observer
+        self.executor = executor
+        self._futures = set()
+        self._futures_lock = threading.Lock()
         
         self.local_path = Path(config['local']['monitored_path']).resolve()
         self.decrypted_path = Path(config['local']['decrypted_path']).resolve()
@@ -74,175 +189,902 @@ class SyncManager:
         # Ensure sync folder encrypted folder exists
         self.sync_folder_client.ensure_folder_exists(self.encrypted_path)
         
+        # Gitignore-style rules per watched root, applied before any other work
+        self.local_ignore = IgnoreRules.load(
+            self.local_path, config['local'].get('ignore_file', IGNORE_FILE)
+        )
+        self.remote_ignore = IgnoreRules.load(
+            self.remote_guard.root, config['sync_folder'].get('ignore_file', IGNORE_FILE),
+            builtin=[f"/{MANIFEST_DIR}/"],
+        )
+        
         # File metadata cache
         self.local_files = {}  # path -> last_modified_time
-        self.remote_files = {}  # path -> {id, last_modified_time}
+        self.remote_files = {}  # path -> (size, last_modified_time) of the last decrypted version
+        
+        # Small files are staged through memory instead of temp files
+        self.staging = MemoryStaging(config)
+        
+        # Remote ciphertexts are only decrypted once the sync client stopped writing them
+        settle_seconds = float(config.get('sync', {}).get('remote_settle_seconds', 2.0))
+        self.remote_stability = StabilityTracker(self.submit_sync_folder_change, settle_seconds)
+        
+        # Optionally collect changes and process them in periodic parallel batches
+        self.batcher = ChangeBatcher(config, self._flush_batch)
+        self.batch_executor = None
+        
+        # Failed operations are retried with backoff, also across restarts
+        self.state_path = state_dir(config)
+        sync_config = config.get('sync', {})
+        self.retry_queue = RetryQueue(
+            os.path.join(self.state_path, 'retry_queue.json'),
+            {'local': self.handle_local_change, 'remote': self.handle_sync_folder_change},
+            max_attempts=int(sync_config.get('retry_max_attempts', 8)),
+            base_delay=float(sync_config.get('retry_base_delay', 2.0)),
+            max_delay=float(sync_config.get('retry_max_delay', 3600.0)),
+        )
+        
+        # Clean up after operations a crash interrupted, then redo them
+        self.journal = OperationJournal(
+            os.path.join(self.state_path, 'journal.log'),
+            durable=sync_config.get('durability', 'none') != 'none',
+        )
+        for record in self.journal.recover():
+            if record['kind'] in self.retry_queue.handlers:
+                self.retry_queue.record_failure(record['kind'], record['source'], "interrupted by shutdown or crash")
+        
+        # Queue depths are read when metrics are collected
+        _MANAGERS.add(self)
+        QUEUE_DEPTH.set_function(lambda: sum(len(m.retry_queue) for m in list(_MANAGERS)), queue='retry')
+        QUEUE_DEPTH.set_function(lambda: sum(len(m.remote_stability.pending) for m in list(_MANAGERS)), queue='settling')
+        QUEUE_DEPTH.set_function(lambda: sum(len(m.batcher) for m in list(_MANAGERS)), queue='batch')
+        
+        # Relative paths map 1:1 between the plaintext and encrypted trees
+        self.path_mapper = PathMapper()
         
-        # Sync lock to prevent concurrent sync operations
-        self.sync_lock = threading.Lock()
+        # Operations on the same plaintext file are serialized, others run concurrently
+        self.path_locks = PathLocks()
+        
+        # Ciphertexts whose content was already decrypted or produced here are not decrypted again
+        self.fingerprints = FingerprintIndex(os.path.join(self.state_path, 'fingerprints.sqlite'))
+        
+        # Version vectors decide conflicts instead of comparing mtimes across devices
+        self.device_id = device_id(config)
+        self.versions = VersionStore(os.path.join(self.state_path, 'versions.sqlite'))
+        
+        # Optional encrypted listing of the encrypted folder, for bootstrapping and remote-diff
+        self.manifest = Manifest.from_config(
+            config, self.sync_folder_encrypted_path, self.device_id, pgp_handler, sync_folder_client
+        )
+        
+        # Optional background integrity check of the encrypted folder
+        self.scrubber = Scrubber.from_config(config, self)
+        
+        # In selective hydration mode only the working set is decrypted on arrival;
+        # everything else is listed in the catalog until hydrate() asks for it
+        self.hydration = HydrationPolicy(config, self.remote_guard.root)
+        self.catalog = None
+        if self.hydration.selective:
+            self.catalog = Catalog(os.path.join(self.state_path, 'catalog.sqlite'))
+        
+        # Runtime control: while paused, changes are held back until resume()
+        self.activity = Activity()
+        self.paused = False
+        self.held = {}  # (kind, path) -> None, in arrival order
+        self._pause_lock = threading.Lock()  # guards paused and held together
         
         # Set up sync folder folder observer
         self.sync_folder_observer = None
+        self.sync_folder_watches = None
         
-    def _is_within(self, base: Path, target: Path) -> bool:
-        # Check if target is within base directory
+    @property
+    def local_path(self):
+        return self._local_path
+
+    @local_path.setter
+    def local_path(self, path):
+        # Symlink-safe access below the root, with cached directory checks
+        self._local_path = Path(path)
+        if getattr(self, 'local_guard', None):
+            self.local_guard.close()
+        self.local_guard = PathGuard(self._local_path)
+
+    @property
+    def sync_folder_encrypted_path(self):
+        return self._sync_folder_encrypted_path
+
+    @sync_folder_encrypted_path.setter
+    def sync_folder_encrypted_path(self, path):
+        self._sync_folder_encrypted_path = path
+        if getattr(self, 'remote_guard', None):
+            self.remote_guard.close()
+        self.remote_guard = PathGuard(path)
+
+    def _decrypted_path_for(self, file_path):
+        # Plaintext path an encrypted sync folder file decrypts to, keeping its subdirectories
+        rel = self.remote_guard.relative(file_path)
+        plain_rel = self.path_mapper.plaintext_rel(rel) if rel else None
+        if plain_rel is None:
+            # Outside the encrypted folder or not a .gpg file; rejected by the handler
+            return self.decrypted_path / file_path.name
+        return self.decrypted_path / plain_rel
+
+    def _encrypted_path_for(self, rel_path):
+        # Sync folder path a plaintext file (relative to the monitored directory) encrypts to
+        return os.path.join(self.sync_folder_encrypted_path, self.path_mapper.encrypted_rel(str(rel_path)))
+
+    def _lock_key(self, direction, file_path):
+        # Key of the ciphertext a change concerns, the same for both directions even
+        # when the decrypted directory is not the monitored one. Version metadata
+        # shares the key of its ciphertext
+        if direction == 'local':
+            rel = self.local_guard.relative(file_path)
+            if rel:
+                return self.path_mapper.encrypted_rel(rel).replace(os.sep, '/')
+        else:
+            rel = self.remote_guard.relative(file_path)
+            if rel:
+                if rel.endswith('.gpg' + VERSION_SUFFIX):
+                    rel = rel[:-len(VERSION_SUFFIX)]
+                return rel.replace(os.sep, '/')
+        return str(file_path)
+
+    @contextmanager
+    def _locked(self, direction, file_path):
+        # Serialize operations on one ciphertext, tracing the wait for the lock separately
+        key = self._lock_key(direction, file_path)
+        with span(f'{direction}.lock_wait'):
+            self.path_locks.acquire(key)
+        token = self.activity.begin(direction, file_path)
         try:
-            base_resolved = base.resolve()
-            target_resolved = target.resolve()
-            return str(target_resolved).startswith(str(base_resolved) + os.sep) or target_resolved == base_resolved
-        except FileNotFoundError:
-            # If target doesn't exist, check with absolute normalization
-            base_abs = base.absolute()
-            target_abs = target.absolute()
-            return str(target_abs).startswith(str(base_abs) + os.sep) or target_abs == base_abs
-
-    def _has_symlink_component(self, path: Path) -> bool:
-        # Check each component for being symlink, avoid traversal
-        current = path
-        while True:
-            if current.exists() and current.is_symlink():
-                return True
-            if current == current.parent:
-                break
-            current = current.parent
-        return False
+            with span(f'{direction}.sync', path=str(file_path)):
+                yield
+        finally:
+            self.activity.end(token)
+            self.path_locks.release(key)
+
+    def submit_local_change(self, file_path):
+        """Process a local change now, or queue it when batching."""
+        if self.batcher.enabled:
+            EVENTS.inc(handler='local', outcome='batched')
+            self.batcher.add('local', file_path)
+        else:
+            self._dispatch(self.handle_local_change, file_path)
+
+    def submit_sync_folder_change(self, file_path):
+        """Process a sync folder change now, or queue it when batching."""
+        if self.batcher.enabled:
+            EVENTS.inc(handler='remote', outcome='batched')
+            self.batcher.add('remote', file_path)
+        else:
+            self._dispatch(self.handle_sync_folder_change, file_path)
+
+    def _dispatch(self, handler, file_path):
+        # On the shared worker pool if there is one, else on the calling (observer) thread
+        if self.executor is None:
+            handler(file_path)
+            return
+        future = self.executor.submit(handler, file_path)
+        with self._futures_lock:
+            self._futures.add(future)
+        future.add_done_callback(self._finished)
+
+    def _finished(self, future):
+        with self._futures_lock:
+            self._futures.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logging.error(f"Sync worker failed: {str(future.exception())}")
+
+    def _wait_running(self, timeout=None):
+        # Wait for changes handed to the shared worker pool
+        with self._futures_lock:
+            futures = list(self._futures)
+        wait(futures, timeout=timeout)
+
+    def flush(self, timeout=None):
+        """Process all queued changes now and wait for them."""
+        if self.batcher.enabled:
+            self.batcher.flush(wait=True, timeout=timeout)
+        self._wait_running(timeout)
+
+    def retry_now(self):
+        """Retry every failed operation now instead of after its backoff."""
+        self.retry_queue.retry_now()
+
+    def pause(self):
+        """Stop starting new operations; changes arriving meanwhile are held."""
+        with self._pause_lock:
+            if self.paused:
+                return
+            self.paused = True
+            self.retry_queue.pause()
+        logging.info("Sync paused")
+
+    def resume(self):
+        """Start processing again, beginning with the changes held while paused."""
+        with self._pause_lock:
+            if not self.paused:
+                return
+            self.paused = False
+            held, self.held = self.held, {}
+            self.retry_queue.resume()
+        logging.info(f"Sync resumed, {len(held)} held change(s)")
+        for kind, path in held:
+            self._submit(kind, path)
+
+    def _hold(self, kind, path):
+        # True if sync is paused and the change was held for resume()
+        with self._pause_lock:
+            if not self.paused:
+                return False
+            self.held[(kind, path)] = None
+        EVENTS.inc(handler=kind, outcome='held')
+        return True
+
+    def _submit(self, kind, path):
+        if kind == 'local':
+            self.submit_local_change(path)
+        else:
+            self.submit_sync_folder_change(path)
+
+    def _kind_for(self, path):
+        # 'local' or 'remote' depending on the root path lies below, else None
+        if self.local_guard.relative(path) is not None:
+            return 'local'
+        if self.remote_guard.relative(path) is not None:
+            return 'remote'
+        return None
+
+    def rescan(self, path=None):
+        """
+        Queue every file below path (default: the monitored directory) as changed.
+
+        Returns:
+            Number of files queued
+        """
+        path = Path(os.path.abspath(path)) if path else self.local_path
+        kind = self._kind_for(path)
+        if kind is None:
+            raise ValueError(f"{path} is not inside the monitored or encrypted folder")
+        rules = self.local_ignore if kind == 'local' else self.remote_ignore
+        count = 0
+        for directory, dirnames, filenames in os.walk(path):
+            dirnames[:] = [d for d in dirnames if not rules.ignored(os.path.join(directory, d), is_dir=True)]
+            for name in filenames:
+                self._submit(kind, Path(directory) / name)
+                count += 1
+        logging.info(f"Rescan of {path} queued {count} file(s)")
+        return count
+
+    def boost(self, path):
+        """
+        Process path right away, ahead of queued changes and even while paused.
+
+        Returns:
+            'local' or 'remote', the kind of change that was processed
+        """
+        path = Path(os.path.abspath(path))
+        kind = self._kind_for(path)
+        if kind is None:
+            raise ValueError(f"{path} is not inside the monitored or encrypted folder")
+        with self._pause_lock:
+            self.held.pop((kind, path), None)
+        self.batcher.discard(kind, path)
+        if kind == 'local':
+            self.handle_local_change(path, force=True)
+        else:
+            self.remote_stability.discard(path)
+            self.handle_sync_folder_change(path, force=True)
+        return kind
+
+    def _remote_key(self, file_path):
+        # Catalog and fingerprint key of a ciphertext: its path below the encrypted folder, '/'-separated
+        return self.remote_guard.relative(file_path).replace(os.sep, '/')
+
+    def hydrate(self, path):
+        """
+        Decrypt files left encrypted by selective hydration, and keep them decrypted.
+
+        path may be a ciphertext or directory in the encrypted folder, or the
+        plaintext path (or directory) the files would decrypt to.
+
+        Returns:
+            Number of files decrypted
+        """
+        if self.catalog is None:
+            raise ValueError("hydrate needs sync.hydration.mode 'selective'")
+        path = os.path.abspath(path)
+        rel = self.remote_guard.relative(path)
+        if rel is not None:
+            entries = self.catalog.matching(rel_prefix=rel.replace(os.sep, '/'))
+        else:
+            entries = self.catalog.matching(plaintext_prefix=path)
+        count = 0
+        for rel_path in entries:
+            self.catalog.request(rel_path)
+            if self.handle_sync_folder_change(Path(self.remote_guard.root) / rel_path, force=True):
+                count += 1
+        logging.info(f"Hydrated {count} of {len(entries)} file(s) for {path}")
+        return count
+
+    def republish(self, file_path):
+        """
+        Encrypt and upload the plaintext of a damaged ciphertext again.
+
+        Only done if the plaintext in the monitored directory is still exactly
+        the version last synced for it. Returns True if the ciphertext was
+        replaced.
+        """
+        rel = self.remote_guard.relative(file_path)
+        plain_rel = self.path_mapper.plaintext_rel(rel) if rel else None
+        if plain_rel is None:
+            return False
+        plaintext = self.local_path / plain_rel
+        base = self.versions.get(self._remote_key(file_path))
+        try:
+            st = os.stat(plaintext)
+        except OSError:
+            return False
+        if not unchanged_since(base, plaintext, st):
+            return False
+        return self.handle_local_change(plaintext, force=True, republish=True) is True
 
-    def handle_local_change(self, file_path):
-        # Handle a local file change using the path to the changed file
-        with self.sync_lock:
+    def status(self):
+        """Live state for the control socket."""
+        status = self.activity.snapshot()
+        status.update({
+            'paused': self.paused,
+            'held': len(self.held),
+            'queues': {
+                'retry': len(self.retry_queue),
+                'settling': len(self.remote_stability.pending),
+                'batch': len(self.batcher),
+            },
+        })
+        if self.catalog is not None:
+            status['hydration'] = self.catalog.stats()
+        if self.scrubber is not None:
+            status['scrub'] = self.scrubber.snapshot()
+        return status
+
+    def _unchanged(self, kind, file_path):
+        # True if the version at file_path was already synced, or it is gone
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return True
+        if kind == 'local':
+            try:
+                rel_path = str(file_path.relative_to(self.local_path))
+            except ValueError:
+                return False
+            return self.local_files.get(rel_path) == st.st_mtime
+        return self.remote_files.get(str(file_path)) == (st.st_size, st.st_mtime)
+
+    def _flush_batch(self, batch):
+        # Run one batch: drop unchanged entries, then process the rest in parallel
+        start = time.monotonic()
+        handlers = {'local': self.handle_local_change, 'remote': self.handle_sync_folder_change}
+        work = [(kind, path) for kind, path in batch if not self._unchanged(kind, path)]
+        with span('batch.flush', size=len(batch), processed=len(work)):
+            list(self.batch_executor.map(lambda entry: handlers[entry[0]](entry[1]), work))
+        logging.info(
+            f"Flushed batch of {len(batch)} change(s): {len(work)} processed, "
+            f"{len(batch) - len(work)} unchanged, in {time.monotonic() - start:.1f}s"
+        )
+
+    def handle_local_change(self, file_path, force=False, republish=False):
+        # Handle a local file change using the path to the changed file.
+        # Returns True once synced, False on failure, None if skipped or held.
+        # republish uploads a file again even though it was synced as it is
+        if self.local_ignore.ignored(file_path):
+            EVENTS.inc(handler='local', outcome='ignored')
+            return
+        if not force and self._hold('local', file_path):
+            return
+        with self._locked('local', file_path):
             try:
                 # Skip temporary files and hidden files
                 if file_path.name.startswith('.') or file_path.name.endswith('.tmp'):
+                    EVENTS.inc(handler='local', outcome='dropped')
                     return
                     
                 # Skip already encrypted files
                 if file_path.name.endswith('.gpg'):
+                    EVENTS.inc(handler='local', outcome='dropped')
                     return
 
                 # Ensure changed path within monitored directory, not a symlink
-                if not self._is_within(self.local_path, file_path) or self._has_symlink_component(file_path):
+                with span('local.path_check'):
+                    allowed = self.local_guard.check(file_path)
+                if not allowed:
+                    EVENTS.inc(handler='local', outcome='skipped')
                     logging.warning(f"Skipping file outside monitored directory or containing symlinks: {file_path}")
                     return
 
                 # Get relative path from monitored directory
                 rel_path = file_path.relative_to(self.local_path)
+                sync_folder_path = self._encrypted_path_for(rel_path)
+                key = self._remote_key(sync_folder_path)
+                local_stat = file_path.stat()
+                local_mtime = local_stat.st_mtime
+                base = self.versions.get(key)
+                if unchanged_since(base, file_path, local_stat) and not republish:
+                    # Already synced in this state, e.g. the event for a file just decrypted here
+                    EVENTS.inc(handler='local', outcome='unchanged')
+                    return
+                base = self._base_version(key, base)
                 
                 logging.info(f"Local file changed: {rel_path}")
                 
-                # Check if there's a newer version in sync folder
-                remote_file_mtime = None
-                reported_remote_mtime = None
-
-                # Compute expected full remote path for file (handles nested paths)
-                # Check directly for speeeeed
-                expected_remote_full_path = os.path.normpath(
-                    os.path.join(self.sync_folder_encrypted_path, f"{rel_path}.gpg")
-                )
-                if os.path.exists(expected_remote_full_path):
-                    try:
-                        remote_file_mtime = os.path.getmtime(expected_remote_full_path)
-                    except OSError:
-                        remote_file_mtime = None
+                # Conflict only if the sync folder holds a version this edit doesn't descend from
+                if republish:
+                    # The ciphertext is damaged; this plaintext is the version it held
+                    conflict_detected, remote_version = False, None
                 else:
-                    # Consult client list_files metadata as fallback
-                    try:
-                        expected_name = os.path.basename(f"{rel_path}.gpg")
-                        for f in self.sync_folder_client.list_files(self.sync_folder_encrypted_path):
-                            fid = os.path.normpath(f.get('id', '') or '')
-                            fname = f.get('name')
-                            if fid == expected_remote_full_path or fname == expected_name:
-                                reported_remote_mtime = f.get('lastModifiedDateTime')
-                                break
-                    except Exception:
-                        # Client lookup failed; ignore, proceed
-                        pass
-                
-                # If remote file exists and is newer -> Create a conflict file
-                local_mtime = file_path.stat().st_mtime
-                conflict_detected = (
-                    (remote_file_mtime is not None and remote_file_mtime > local_mtime) or
-                    (reported_remote_mtime is not None and reported_remote_mtime > local_mtime)
-                )
+                    with span('local.remote_lookup'):
+                        conflict_detected, remote_version = self._local_conflict(
+                            file_path, local_stat, sync_folder_path, key, base
+                        )
                 if conflict_detected:
                     conflict_path = f"{file_path}.conflict"
-                    shutil.copy2(file_path, conflict_path)
+                    self._save_conflict_copy('local', file_path, conflict_path)
                     logging.warning(f"guardian-sync conflict detected for {rel_path}. Local copy saved as {conflict_path}")
                     # Return early: avoid encrypting/uploading on detected conflict
                     return
+
+                temp_encrypted = str(file_path) + '.gpg'
+                with self.journal.operation(
+                    'local', file_path,
+                    staging=[temp_encrypted],
+                    staging_globs=[
+                        partial_path_pattern(sync_folder_path),
+                        partial_path_pattern(sync_folder_path + VERSION_SUFFIX),
+                    ],
+                ):
+                    vector = increment(
+                        merge(base and base['vector'], remote_version and remote_version['vector']), self.device_id
+                    )
+                    with self.staging.reserve(local_stat.st_size) as in_memory:
+                        if in_memory:
+                            # Encrypt and upload straight from memory, no temp file
+                            with span('local.encrypt', bytes=local_stat.st_size, staging='memory'):
+                                with self.local_guard.open(file_path) as f:
+                                    data = f.read()
+                                ciphertext = self.pgp_handler.encrypt_data(data)
+                            digest = hashlib.sha256(ciphertext).hexdigest()
+                            plaintext_digest = hashlib.sha256(data).hexdigest()
+                            # Version metadata goes first, so it is in place when the ciphertext arrives
+                            self._write_version(sync_folder_path, vector, plaintext_digest, digest)
+                            with span('local.upload', staging='memory'):
+                                uploaded = self.sync_folder_client.upload_bytes(ciphertext, sync_folder_path)
+                        else:
+                            # Encrypt the file through the checked fd, so a symlink swapped in
+                            # after the path check is never followed
+                            with self.local_guard.open(file_path) as f:
+                                with span('local.encrypt', bytes=local_stat.st_size, staging='disk'):
+                                    temp_encrypted = self.pgp_handler.encrypt_file(file_path, source=f)
+                                try:
+                                    digest = sha256_file(temp_encrypted)
+                                    f.seek(0)
+                                    plaintext_digest = sha256_stream(f)
+                                    self._write_version(sync_folder_path, vector, plaintext_digest, digest)
+                                    # Upload to sync folder
+                                    with span('local.upload', staging='disk'):
+                                        uploaded = self.sync_folder_client.upload_file(temp_encrypted, sync_folder_path)
+                                finally:
+                                    # Clean up temporary encrypted file
+                                    os.unlink(temp_encrypted)
                 
-                # Encrypt the file
-                temp_encrypted = self.pgp_handler.encrypt_file(file_path)
-                
-                # Upload to sync folder
-                sync_folder_path = os.path.join(self.sync_folder_encrypted_path, f"{rel_path}.gpg")
-                self.sync_folder_client.upload_file(temp_encrypted, sync_folder_path)
+                # Remember the ciphertext, so the sync folder watcher seeing our own upload doesn't decrypt it
+                self._record_upload(sync_folder_path, uploaded, digest, file_path, local_stat)
+                self.versions.put(key, vector, file_path, local_stat)
+                if self.manifest is not None:
+                    self.manifest.record(key, {
+                        'ciphertext_sha256': digest, 'sha256': plaintext_digest,
+                        'size': local_stat.st_size, 'vector': vector,
+                    })
                 
                 # Update local file cache
                 self.local_files[str(rel_path)] = file_path.stat().st_mtime
-                
-                # Clean up temporary encrypted file if it's different from the original
-                if temp_encrypted != str(file_path) + '.gpg':
-                    os.unlink(temp_encrypted)
+                self.activity.record('local', local_stat.st_size)
+                self.retry_queue.record_success('local', file_path)
+                SYNC_LAG.observe(max(0.0, time.time() - local_mtime), direction='local')
+                return True
                     
             except Exception as e:
                 logging.error(f"Error handling local change for {file_path}: {str(e)}")
+                self._record_failure('local', file_path, e)
+                return False
     
-    def handle_sync_folder_change(self, file_path):
+    def handle_sync_folder_change(self, file_path, force=False):
         # Handle a change to a file (via its path) in the sync folder encrypted folder.
-        with self.sync_lock:
+        # Returns True once decrypted, False on failure, None if skipped or held
+        if self.remote_ignore.ignored(file_path):
+            EVENTS.inc(handler='remote', outcome='ignored')
+            return
+        if not force and self._hold('remote', file_path):
+            return
+        with self._locked('remote', file_path):
             try:
-                # Skip non-encrypted files
-                if not file_path.name.endswith('.gpg'):
-                    return
-
-                # Ensure changed path within encrypted sync folder and not a symlink
-                if not self._is_within(Path(self.sync_folder_encrypted_path), file_path) or self._has_symlink_component(file_path):
-                    logging.warning(f"Skipping encrypted file outside sync/encrypted folder or containing symlinks: {file_path}")
-                    return
-
-                logging.info(f"Sync folder file changed: {file_path.name}")
-                
-                # Get the decrypted file name (remove .gpg extension)
-                decrypted_name = file_path.name.rsplit('.gpg', 1)[0]
-                
-                # Create a temporary file for decryption
-                temp_encrypted = self.local_path / f".temp_{file_path.name}"
-                
-                # Copy the encrypted file to the temp location
-                shutil.copy2(file_path, temp_encrypted)
-                
-                # Decrypt the file
-                decrypted_path = self.decrypted_path / decrypted_name
-                os.makedirs(self.decrypted_path, exist_ok=True)
-                self.pgp_handler.decrypt_file(temp_encrypted, str(decrypted_path))
-                # Harden permissions on decrypted output (owner read/write only)
                 try:
-                    os.chmod(decrypted_path, 0o600)
-                except Exception as e:
-                    logging.warning(f"Failed to set secure permissions on {decrypted_path}: {e}")
-                
-                # Clean up temporary encrypted file
-                os.unlink(temp_encrypted)
-                
-                logging.info(f"Decrypted sync folder file to {decrypted_path}")
-                
+                    return self._decrypt_change(file_path)
+                except FileNotFoundError:
+                    # The cached output directory may have been deleted since it was
+                    # created: create it again and try once more right away
+                    directory = self._decrypted_path_for(file_path).parent
+                    if directory.is_dir() or not file_path.exists():
+                        raise
+                    self.path_mapper.forget_dir(directory)
+                    return self._decrypt_change(file_path)
+            except CorruptCiphertextError as e:
+                logging.warning(f"Ciphertext {file_path} is incomplete or corrupt: {str(e)}")
+                self._record_failure('remote', file_path, e)
+                return False
             except Exception as e:
                 logging.error(f"Error handling sync folder change for {file_path}: {str(e)}")
+                self._record_failure('remote', file_path, e)
+                return False
     
+    def _decrypt_change(self, file_path):
+        # handle_sync_folder_change with the lock held; errors are left to the caller
+        if file_path.name.endswith('.gpg' + VERSION_SUFFIX):
+            # Version metadata arriving after its ciphertext was decrypted here
+            self._attach_version(file_path)
+            return
+
+        # Skip non-encrypted files
+        if not file_path.name.endswith('.gpg'):
+            EVENTS.inc(handler='remote', outcome='dropped')
+            return
+
+        # Ensure changed path within encrypted sync folder and not a symlink
+        with span('remote.path_check'):
+            allowed = self.remote_guard.check(file_path)
+        if not allowed:
+            EVENTS.inc(handler='remote', outcome='skipped')
+            logging.warning(f"Skipping encrypted file outside sync/encrypted folder or containing symlinks: {file_path}")
+            return
+
+        decrypted_path = self._decrypted_path_for(file_path)
+        remote_stat = file_path.stat()
+        with span('remote.fingerprint'):
+            unchanged = self._ciphertext_unchanged(file_path, remote_stat, decrypted_path)
+        if unchanged:
+            self.remote_files[str(file_path)] = (remote_stat.st_size, remote_stat.st_mtime)
+            self.retry_queue.record_success('remote', file_path)
+            EVENTS.inc(handler='remote', outcome='unchanged')
+            return
+            
+        catalog_path = None
+        if self.catalog is not None:
+            catalog_path = self._remote_key(file_path)
+            if not (self.catalog.is_kept(catalog_path) or self.hydration.wanted(
+                    catalog_path, remote_stat.st_size, remote_stat.st_mtime)):
+                # Outside the working set: list it, decrypt on request
+                self.catalog.record(catalog_path, decrypted_path, remote_stat.st_size, remote_stat.st_mtime)
+                self.retry_queue.record_success('remote', file_path)
+                EVENTS.inc(handler='remote', outcome='deferred')
+                return
+            
+        key = self._remote_key(file_path)
+        base = self.versions.get(key)
+        conflict_path = None
+        if (synced_here(base, decrypted_path) and os.path.exists(decrypted_path)
+                and not unchanged_since(base, decrypted_path, os.stat(decrypted_path))):
+            # The plaintext was edited here since the last sync
+            base = self._base_version(key, base)
+            remote_version = self._read_version(file_path)
+            if (remote_version is not None and base['vector'] is not None
+                    and dominates(base['vector'], remote_version['vector'])):
+                # Nothing this device hasn't seen: keep the local edit, it gets uploaded
+                self.retry_queue.record_success('remote', file_path)
+                EVENTS.inc(handler='remote', outcome='superseded')
+                return
+            conflict_path = f"{decrypted_path}.conflict"
+            
+        logging.info(f"Sync folder file changed: {file_path.name}")
+            
+        # Decrypt the file (name without .gpg extension), staging next to the
+        # output so files of the same name in other directories don't collide
+        self.path_mapper.ensure_dir(decrypted_path.parent)
+        if conflict_path:
+            # Both sides changed: keep the local edit next to the incoming version
+            self._save_conflict_copy('remote', file_path, conflict_path, decrypted_path)
+            logging.warning(f"guardian-sync conflict detected for {decrypted_path}. Local copy saved as {conflict_path}")
+        temp_encrypted = decrypted_path.parent / f".temp_{file_path.name}"
+        with self.journal.operation(
+            'remote', file_path,
+            staging=[temp_encrypted],
+            staging_globs=[partial_path_pattern(decrypted_path)],
+        ), self.staging.reserve(remote_stat.st_size) as in_memory:
+            if in_memory:
+                # Decrypt from memory and write the plaintext in one go, owner-only
+                with span('remote.decrypt', bytes=remote_stat.st_size, staging='memory'):
+                    with self.remote_guard.open(file_path) as f:
+                        ciphertext = f.read()
+                    plaintext = self.pgp_handler.decrypt_data(ciphertext)
+                digest = hashlib.sha256(ciphertext).hexdigest()
+                with span('remote.write', staging='memory'):
+                    write_atomic(decrypted_path, plaintext, 0o600)
+            else:
+                # Copy the encrypted file to a temp location (reflink where supported),
+                # from the checked fd rather than the path
+                with span('remote.stage_copy'), self.remote_guard.open(file_path) as f:
+                    clone_file(f, temp_encrypted)
+                    
+                try:
+                    with span('remote.decrypt', bytes=remote_stat.st_size, staging='disk'):
+                        self.pgp_handler.decrypt_file(temp_encrypted, str(decrypted_path))
+                    # Fingerprint the bytes that were decrypted, not the live file
+                    digest = sha256_file(temp_encrypted)
+                finally:
+                    # Clean up temporary encrypted file
+                    os.unlink(temp_encrypted)
+            
+        # Harden permissions on decrypted output (owner read/write only)
+        try:
+            with span('remote.chmod'):
+                os.chmod(decrypted_path, 0o600)
+        except Exception as e:
+            logging.warning(f"Failed to set secure permissions on {decrypted_path}: {e}")
+            
+        self.remote_files[str(file_path)] = (remote_stat.st_size, remote_stat.st_mtime)
+        self.fingerprints.put(
+            key, remote_stat.st_size, remote_stat.st_mtime_ns, digest, 'decrypted', decrypted_path,
+        )
+        # Keep the version metadata as read; it is only decrypted if this device edits the file
+        self.versions.put(
+            key, None, decrypted_path, os.stat(decrypted_path),
+            metadata=self._version_bytes(file_path), ciphertext_sha256=digest,
+        )
+        if catalog_path is not None:
+            self.catalog.hydrated(catalog_path, decrypted_path, remote_stat.st_size, remote_stat.st_mtime)
+            evict_to_budget(self.catalog, self.hydration.disk_budget_bytes, keep=catalog_path)
+        self.activity.record('remote', remote_stat.st_size)
+        self.retry_queue.record_success('remote', file_path)
+        SYNC_LAG.observe(max(0.0, time.time() - remote_stat.st_mtime), direction='remote')
+        logging.info(f"Decrypted sync folder file to {decrypted_path}")
+        return True
+
+    def _save_conflict_copy(self, kind, file_path, conflict_path, plaintext=None):
+        # Copy the plaintext (default: file_path) to conflict_path before anything
+        # overwrites it. The copy is complete once renamed into place, and is never
+        # staging of the operation that follows: recovery must not remove it
+        with self.journal.operation(kind, file_path, staging_globs=[partial_path_pattern(conflict_path)]):
+            with span(f'{kind}.conflict_copy'):
+                if plaintext is None:
+                    with self.local_guard.open(file_path) as f:
+                        clone_atomic(f, conflict_path)
+                else:
+                    clone_atomic(plaintext, conflict_path)
+        CONFLICTS.inc()
+
+    def _local_conflict(self, file_path, local_stat, sync_folder_path, key, base):
+        # Returns (conflict, remote version metadata or None) for a local edit.
+        # The common cases need no I/O beyond one stat() of the ciphertext.
+        try:
+            remote_stat = os.stat(sync_folder_path)
+        except OSError:
+            remote_stat = None
+        if remote_stat is None:
+            # Consult client list_files metadata as fallback. Match the full
+            # path only: files of the same name in other directories are unrelated
+            expected = os.path.normpath(sync_folder_path)
+            try:
+                for f in self.sync_folder_client.list_files(self.sync_folder_encrypted_path):
+                    if os.path.normpath(f.get('id', '') or '') == expected:
+                        reported_mtime = f.get('lastModifiedDateTime')
+                        return reported_mtime is not None and reported_mtime > local_stat.st_mtime, None
+            except Exception:
+                # Client lookup failed; ignore, proceed
+                pass
+            return False, None
+
+        seen = self.fingerprints.get(key)
+        if seen is not None and (seen['size'], seen['mtime_ns']) == (remote_stat.st_size, remote_stat.st_mtime_ns):
+            # The sync folder still holds the version last synced here, which this edit builds on
+            return False, None
+
+        remote_version = self._read_version(sync_folder_path)
+        if remote_version is None:
+            # No version metadata (written by an older release): fall back to comparing mtimes
+            return remote_stat.st_mtime > local_stat.st_mtime, None
+        if base is not None and base['vector'] is not None and dominates(base['vector'], remote_version['vector']):
+            # A version this device has already seen
+            return False, remote_version
+        with self.local_guard.open(file_path) as f:
+            if sha256_stream(f) == remote_version.get('sha256'):
+                # Both sides ended up with the same content
+                return False, remote_version
+        return True, remote_version
+
+    def _write_version(self, sync_folder_path, vector, plaintext_digest, ciphertext_digest):
+        # Publish encrypted version metadata next to the ciphertext
+        metadata = {
+            'vector': vector,
+            'device': self.device_id,
+            'sha256': plaintext_digest,
+            'ciphertext_sha256': ciphertext_digest,
+        }
+        try:
+            data = self.pgp_handler.encrypt_data(json.dumps(metadata).encode())
+            self.sync_folder_client.upload_bytes(data, sync_folder_path + VERSION_SUFFIX)
+        except Exception as e:
+            # Other devices fall back to comparing mtimes for this file
+            logging.warning(f"Failed to write version metadata for {sync_folder_path}: {str(e)}")
+
+    def _version_bytes(self, sync_folder_path):
+        # The encrypted version metadata next to a ciphertext, or None if there is none
+        path = str(sync_folder_path) + VERSION_SUFFIX
+        if not os.path.exists(path):
+            return None
+        try:
+            with self.remote_guard.open(path) as f:
+                return f.read()
+        except OSError as e:
+            logging.warning(f"Ignoring unreadable version metadata {path}: {str(e)}")
+            return None
+
+    def _decrypt_version(self, data, path):
+        try:
+            metadata = json.loads(self.pgp_handler.decrypt_data(data))
+            if not isinstance(metadata.get('vector'), dict):
+                raise ValueError("no version vector")
+            return metadata
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable version metadata {path}: {str(e)}")
+            return None
+
+    def _read_version(self, sync_folder_path):
+        # Version metadata stored next to a ciphertext, or None if there is none
+        data = self._version_bytes(sync_folder_path)
+        if data is None:
+            return None
+        return self._decrypt_version(data, str(sync_folder_path) + VERSION_SUFFIX)
+
+    def _base_version(self, key, base):
+        # base with its vector filled in from the metadata kept at decrypt time
+        if base is None or base['vector'] is not None or base['metadata'] is None:
+            return base
+        metadata = self._decrypt_version(base['metadata'], key + VERSION_SUFFIX)
+        vector = None
+        # Version metadata only counts if it describes the ciphertext that was decrypted
+        if metadata is not None and metadata.get('ciphertext_sha256') == base['ciphertext_sha256']:
+            vector = metadata['vector']
+        self.versions.resolve(key, vector)
+        return dict(base, vector=vector, metadata=None)
+
+    def _attach_version(self, file_path):
+        if not self.remote_guard.check(file_path):
+            EVENTS.inc(handler='remote', outcome='skipped')
+            logging.warning(f"Skipping version metadata outside sync/encrypted folder or containing symlinks: {file_path}")
+            return
+        data = self._version_bytes(str(file_path)[:-len(VERSION_SUFFIX)])
+        if data is not None:
+            self.versions.attach(self._remote_key(file_path)[:-len(VERSION_SUFFIX)], data)
+
+    def _record_upload(self, sync_folder_path, uploaded, digest, source, source_stat):
+        # From what upload_* reports, not a stat: a group commit may not have published it yet
+        self.fingerprints.put(
+            self._remote_key(sync_folder_path), uploaded['size'], uploaded['mtime_ns'], digest,
+            'uploaded', source, source_stat.st_size, source_stat.st_mtime_ns,
+        )
+
+    def _ciphertext_unchanged(self, file_path, remote_stat, decrypted_path):
+        # True if the ciphertext matches what was last decrypted or uploaded here
+        # and its plaintext is in place, so gpg need not run. Size and mtime
+        # decide when they match; otherwise the content hash does.
+        key = self._remote_key(file_path)
+        entry = self.fingerprints.get(key)
+        if entry is None or entry['size'] != remote_stat.st_size:
+            return False
+        if entry['mtime_ns'] != remote_stat.st_mtime_ns:
+            with self.remote_guard.open(file_path) as f:
+                if sha256_stream(f) != entry['sha256']:
+                    return False
+            self.fingerprints.touch(key, remote_stat.st_mtime_ns)
+        if entry['origin'] == 'decrypted':
+            return os.path.exists(decrypted_path)
+
+        # Our own upload: its plaintext is the local file it was encrypted from
+        source = entry['source']
+        if os.path.exists(decrypted_path) and os.path.samefile(decrypted_path, source):
+            return True
+        try:
+            source_stat = os.stat(source)
+        except OSError:
+            return False
+        if (source_stat.st_size, source_stat.st_mtime_ns) != (entry['source_size'], entry['source_mtime_ns']):
+            return False
+        # Decrypted copy kept elsewhere: copy the plaintext instead of decrypting
+        self.path_mapper.ensure_dir(decrypted_path.parent)
+        fd, temp_path = tempfile.mkstemp(
+            prefix=f".{decrypted_path.name}.", suffix=".partial", dir=decrypted_path.parent
+        )
+        os.close(fd)
+        try:
+            clone_file(source, temp_path)
+            os.chmod(temp_path, 0o600)
+            os.replace(temp_path, decrypted_path)
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self.fingerprints.put(key, remote_stat.st_size, remote_stat.st_mtime_ns, entry['sha256'], 'decrypted', decrypted_path)
+        return True
+
+    def _record_failure(self, kind, file_path, error):
+        # Queue a failed operation for retry, unless its file is gone
+        FAILURES.inc(operation=kind, type=type(error).__name__)
+        if os.path.lexists(file_path):
+            self.retry_queue.record_failure(kind, file_path, error)
+        else:
+            self.retry_queue.record_success(kind, file_path)
+
+    def _sync_folder_directory_removed(self, path):
+        self.sync_folder_watches.directory_removed(path)
+        self.remote_guard.invalidate(path)
+
     def start(self):
         """Start the sync manager."""
         # Set up sync folder folder observer
-        event_handler = SyncFolderChangeHandler(self.handle_sync_folder_change)
-        self.sync_folder_observer = Observer()
-        self.sync_folder_observer.schedule(event_handler, self.sync_folder_encrypted_path, recursive=True)
-        self.sync_folder_observer.start()
+        event_handler = SyncFolderChangeHandler(
+            self.remote_stability.submit,
+            lambda path: self.remote_stability.submit(path, ready=True),
+            self._sync_folder_directory_removed,
+            self.remote_ignore,
+            lambda path: self.sync_folder_watches.directory_created(path),
+        )
+        self.sync_folder_observer = self.shared_observer or new_observer()
+        self.sync_folder_watches = WatchSet(
+            self.sync_folder_observer, event_handler, self.remote_guard.root, self.remote_ignore
+        )
+        self.sync_folder_watches.schedule()
+        if self.shared_observer is None:
+            self.sync_folder_observer.start()
+        
+        self.retry_queue.start()
+        if self.manifest is not None:
+            self.manifest.start()
+        if self.scrubber is not None:
+            self.scrubber.start()
+        if self.batcher.enabled:
+            self.batch_executor = self.executor or ThreadPoolExecutor(self.batcher.workers, thread_name_prefix="sync-worker")
+            self.batcher.start()
         
         logging.info(f"Started monitoring sync folder: {self.sync_folder_encrypted_path}")
         logging.info("Sync manager started")
     
     def stop(self):
         """Stop the sync manager."""
-        if self.sync_folder_observer:
+        if self.shared_observer is not None:
+            if self.sync_folder_watches:
+                self.sync_folder_watches.unschedule_all()
+        elif self.sync_folder_observer:
             self.sync_folder_observer.stop()
             self.sync_folder_observer.join()
+        self.remote_stability.stop()
+        if self.batch_executor:
+            # Process what is still queued before shutting down
+            self.batcher.stop()
+            if self.batch_executor is not self.executor:
+                self.batch_executor.shutdown()
+            self.batch_executor = None
+        self._wait_running()
+        self.retry_queue.stop()
+        if self.scrubber is not None:
+            self.scrubber.stop()
+        if self.manifest is not None:
+            self.manifest.stop()
+        self.sync_folder_client.close()
+        self.journal.close()
+        self.fingerprints.close()
+        self.versions.close()
+        if self.catalog is not None:
+            self.catalog.close()
+        self.local_guard.close()
+        self.remote_guard.close()
         logging.info("Sync manager stopped") 
\ No newline at end of file
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import logging
+import threading
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ('tracer', 'name', 'attrs', 'start_ns')
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start_ns = 0
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ns = time.perf_counter_ns() - self.start_ns
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.tracer._export(self, duration_ns)
+        return False
+
+    def set(self, **attrs):
+        """Attach attributes to the span."""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    FORMATS = ('chrome', 'jsonl')
+
+    def __init__(self):
+        """
+        Collect timing spans around sync stages.
+
+        Disabled by default, in which case span() returns a shared no-op
+        object. Once configured, every finished span is written to a file as
+        a JSON line or as a Chrome trace event (load it in chrome://tracing
+        or https://ui.perfetto.dev).
+        """
+        self.format = None
+        self._file = None
+        self._lock = threading.Lock()
+        # Span timestamps are relative to this wall-clock origin
+        self._origin_ns = time.time_ns() - time.perf_counter_ns()
+
+    @property
+    def enabled(self):
+        return self._file is not None
+
+    def configure(self, path, format=None):
+        """Start exporting spans to path. Format defaults to 'jsonl' for .jsonl files, else 'chrome'."""
+        if format is None:
+            format = 'jsonl' if str(path).endswith('.jsonl') else 'chrome'
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown trace format '{format}', expected one of {', '.join(self.FORMATS)}")
+        self.close()
+        with self._lock:
+            self.format = format
+            self._file = open(path, 'w')
+            if format == 'chrome':
+                # The closing bracket is optional in the Chrome trace array format
+                self._file.write('[\n')
+        logging.info(f"Writing {format} trace to {path}")
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                if self.format == 'chrome':
+                    self._file.write('{}]\n')
+                self._file.close()
+                self._file = None
+
+    def span(self, name, **attrs):
+        """Time the enclosed block as a span named name."""
+        if self._file is None:
+            return _NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def _export(self, span, duration_ns):
+        start_ns = self._origin_ns + span.start_ns
+        if self.format == 'chrome':
+            record = {
+                'name': span.name, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                'ts': start_ns / 1000, 'dur': duration_ns / 1000, 'args': span.attrs,
+            }
+            line = json.dumps(record, default=str) + ',\n'
+        else:
+            record = {
+                'name': span.name, 'start_ns': start_ns, 'duration_ns': duration_ns,
+                'thread': threading.current_thread().name, 'attrs': span.attrs,
+            }
+            line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            if self._file:
+                self._file.write(line)
+                self._file.flush()
+
+
+TRACER = Tracer()
+span = TRACER.span
@@ -0,0 +1,146 @@
+import os
+import json
+import uuid
+import sqlite3
+import threading
+
+try:
+    from .state import state_dir
+except ImportError:
+    from state import state_dir
+
+# Version metadata is stored encrypted next to each ciphertext, as <name>.gpg.ver
+VERSION_SUFFIX = '.ver'
+
+
+def device_id(config):
+    """
+    Identifier of this device in version vectors.
+
+    Taken from `sync.device_id`, otherwise generated once and kept in the
+    state directory.
+    """
+    configured = (config.get('sync', {}) or {}).get('device_id')
+    if configured:
+        return str(configured)
+    path = os.path.join(state_dir(config), 'device_id')
+    try:
+        with open(path, 'r') as f:
+            value = f.read().strip()
+        if value:
+            return value
+    except FileNotFoundError:
+        pass
+    value = uuid.uuid4().hex[:16]
+    with open(path, 'w') as f:
+        f.write(value + '\n')
+    return value
+
+
+def dominates(a, b):
+    """True if version vector a has seen every update b has (a >= b)."""
+    return all(a.get(device, 0) >= counter for device, counter in b.items())
+
+
+def merge(*vectors):
+    """Smallest vector that dominates all given vectors; None entries are skipped."""
+    merged = {}
+    for vector in vectors:
+        for device, counter in (vector or {}).items():
+            merged[device] = max(merged.get(device, 0), counter)
+    return merged
+
+
+def increment(vector, device):
+    vector = dict(vector)
+    vector[device] = vector.get(device, 0) + 1
+    return vector
+
+
+class VersionStore:
+    def __init__(self, path):
+        """
+        The version of every file as of its last sync on this device.
+
+        Keyed by the ciphertext's '/'-separated path below the encrypted
+        folder. Each entry holds the version vector ({device id: counter},
+        None if the remote side carried no version metadata) and the path,
+        size and mtime of the plaintext involved (the uploaded local file or
+        the decrypted output) right after the sync, which tells whether that
+        plaintext was edited since. Entries are dicts.
+
+        After a decrypt the vector is not known yet: the entry keeps the
+        version metadata found next to the ciphertext as it was read, still
+        encrypted, with the sha256 of the ciphertext decrypted. It is only
+        decrypted (and the vector filled in with resolve) once the vector is
+        needed, i.e. when the plaintext is edited on this device.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS versions ("
+            " path TEXT PRIMARY KEY, vector TEXT, plain_path TEXT, plain_size INTEGER, plain_mtime_ns INTEGER,"
+            " metadata BLOB, ciphertext_sha256 TEXT)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT vector, plain_path, plain_size, plain_mtime_ns, metadata, ciphertext_sha256"
+                " FROM versions WHERE path = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'vector': json.loads(row[0]) if row[0] else None,
+            'plain_path': row[1],
+            'plain_size': row[2],
+            'plain_mtime_ns': row[3],
+            'metadata': row[4],
+            'ciphertext_sha256': row[5],
+        }
+
+    def put(self, key, vector, plain_path, plain_stat, metadata=None, ciphertext_sha256=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO versions"
+                " (path, vector, plain_path, plain_size, plain_mtime_ns, metadata, ciphertext_sha256)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(vector) if vector is not None else None, str(plain_path),
+                 plain_stat.st_size, plain_stat.st_mtime_ns, metadata, ciphertext_sha256),
+            )
+
+    def attach(self, key, metadata):
+        """Keep version metadata that arrived after its ciphertext was decrypted; no-op once resolved."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE versions SET metadata = ? WHERE path = ? AND vector IS NULL", (metadata, key)
+            )
+
+    def resolve(self, key, vector):
+        """Fill in the vector of a decrypted version, dropping its encrypted metadata."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE versions SET vector = ?, metadata = NULL WHERE path = ?",
+                (json.dumps(vector) if vector is not None else None, key),
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def synced_here(entry, path):
+    """True if the sync recorded in entry involved the plaintext at path."""
+    return entry is not None and entry['plain_path'] == str(path)
+
+
+def unchanged_since(entry, path, st):
+    """True if the plaintext at path (stat result st) is still as it was at the sync recorded in entry."""
+    return synced_here(entry, path) and (entry['plain_size'], entry['plain_mtime_ns']) == (st.st_size, st.st_mtime_ns)
@@ -4,6 +4,64 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../"
 import pytest
 import tempfile
 import shutil
+from src.sync_manager import SyncManager
+from src.sync_folder_client import SyncFolderClient
+
+@pytest.fixture(autouse=True)
+def isolated_state_dir(tmp_path_factory, monkeypatch):
+    # Keep persistent state (retry queue, journal, ...) out of the home directory
+    monkeypatch.setenv("GUARDIAN_SYNC_STATE_DIR", str(tmp_path_factory.mktemp("state")))
+
+class PrefixPGP:
+    # "Encrypts" by prefixing, so content round-trips and can be checked.
+    # Files named in fail raise like a failed gpg run; encrypted lists the
+    # files encrypted so far and decrypts counts decrypted payloads.
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.encrypted = []
+        self.decrypts = 0
+
+    def encrypt_data(self, data, recipient=None):
+        return b"ENC:" + data
+
+    def decrypt_data(self, data):
+        self.decrypts += 1
+        return data[4:]
+
+    def encrypt_file(self, file_path, output_path=None, source=None):
+        if os.path.basename(file_path) in self.fail:
+            raise RuntimeError("gpg failed")
+        self.encrypted.append(os.path.basename(file_path))
+        out = output_path or str(file_path) + ".gpg"
+        with open(file_path, "rb") as src, open(out, "wb") as dst:
+            dst.write(self.encrypt_data(src.read()))
+        return out
+
+    def decrypt_file(self, encrypted_path, output_path=None, source=None):
+        with open(encrypted_path, "rb") as src, open(output_path, "wb") as dst:
+            dst.write(self.decrypt_data(src.read()))
+        return output_path
+
+@pytest.fixture
+def make_manager(tmp_path):
+    # make_manager(name, decrypted, pgp, **sync) monitors tmp_path/name and
+    # decrypts into tmp_path/decrypted (the monitored folder by default).
+    # Every manager of a test shares tmp_path/sync; sync becomes the "sync"
+    # section of its config and pgp defaults to a fresh PrefixPGP.
+    def make(name="mon", decrypted=None, pgp=None, **sync):
+        (tmp_path / "sync" / "encrypted_files").mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).mkdir(parents=True, exist_ok=True)
+        cfg = {
+            "local": {
+                "monitored_path": str(tmp_path / name),
+                "decrypted_path": str(tmp_path / (decrypted or name)),
+            },
+            "sync_folder": {"path": str(tmp_path / "sync"), "encrypted_folder": "encrypted_files"},
+            "pgp": {"key_name": "dummy", "passphrase": "", "gnupghome": str(tmp_path)},
+            "sync": sync,
+        }
+        return SyncManager(cfg, SyncFolderClient(cfg), PrefixPGP() if pgp is None else pgp)
+    return make
 
 @pytest.fixture(scope="function")
 def temp_dir():
@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.batcher import ChangeBatcher
+from src.path_locks import PathLocks
+from src.sync_manager import SyncManager
+from src.sync_folder_client import SyncFolderClient
+
+
+def batch_config(**batch):
+    return {"sync": {"batch": dict({"enabled": True}, **batch)}}
+
+
+def test_disabled_by_default():
+    assert not ChangeBatcher({}, print).enabled
+
+
+def test_superseded_changes_collapse_and_flush_on_demand(tmp_path):
+    flushed = []
+    batcher = ChangeBatcher(batch_config(interval_seconds=3600), flushed.append)
+    batcher.start()
+    f = tmp_path / "a.txt"
+    f.write_text("12345")
+    batcher.add("local", f)
+    batcher.add("local", f)
+    batcher.add("remote", tmp_path / "b.gpg")
+    assert len(batcher) == 2
+    assert batcher.pending_bytes == 5
+    batcher.flush(timeout=5)
+    batcher.stop()
+    assert flushed == [[("local", f), ("remote", tmp_path / "b.gpg")]]
+
+
+def test_flush_on_file_count_and_interval(tmp_path):
+    flushed = []
+    batcher = ChangeBatcher(batch_config(interval_seconds=3600, max_files=3), flushed.append)
+    batcher.start()
+    for i in range(3):
+        batcher.add("local", tmp_path / f"{i}.txt")
+    deadline = time.time() + 5
+    while not flushed and time.time() < deadline:
+        time.sleep(0.01)
+    batcher.stop()
+    assert len(flushed[0]) == 3
+
+    flushed.clear()
+    batcher = ChangeBatcher(batch_config(interval_seconds=0.1), flushed.append)
+    batcher.start()
+    batcher.add("local", tmp_path / "x.txt")
+    time.sleep(0.5)
+    assert len(flushed) == 1
+    batcher.stop()
+
+
+def test_stop_flushes_pending(tmp_path):
+    flushed = []
+    batcher = ChangeBatcher(batch_config(interval_seconds=3600), flushed.append)
+    batcher.start()
+    batcher.add("local", tmp_path / "x.txt")
+    batcher.stop()
+    assert flushed == [[("local", tmp_path / "x.txt")]]
+
+
+def test_path_locks_serialize_same_key_only():
+    locks = PathLocks()
+    order = []
+
+    def worker(key):
+        with locks.hold(key):
+            order.append(key)
+
+    with locks.hold("a"):
+        other_key = threading.Thread(target=worker, args=("b",))
+        other_key.start()
+        other_key.join(1)
+        same_key = threading.Thread(target=worker, args=("a",))
+        same_key.start()
+        same_key.join(0.2)
+        assert order == ["b"]
+    same_key.join(1)
+    assert order == ["b", "a"]
+    assert len(locks) == 0
+
+
+class CountingPGP:
+    def __init__(self):
+        self.calls = 0
+
+    def encrypt_file(self, file_path, output_path=None, source=None):
+        self.calls += 1
+        out = str(file_path) + ".gpg"
+        with open(out, "wb") as f:
+            f.write(b"x")
+        return out
+
+    def decrypt_file(self, encrypted_path, output_path=None):
+        return output_path
+
+
+def test_batch_skips_unchanged_files(tmp_path):
+    (tmp_path / "sync" / "encrypted_files").mkdir(parents=True)
+    (tmp_path / "mon").mkdir()
+    cfg = {
+        "local": {"monitored_path": str(tmp_path / "mon"), "decrypted_path": str(tmp_path / "dec")},
+        "sync_folder": {"path": str(tmp_path / "sync"), "encrypted_folder": "encrypted_files"},
+        "pgp": {"key_name": "dummy", "passphrase": "", "gnupghome": str(tmp_path)},
+        "sync": {"batch": {"enabled": True, "interval_seconds": 3600, "workers": 2}},
+    }
+    pgp = CountingPGP()
+    sm = SyncManager(cfg, SyncFolderClient(cfg), pgp)
+    sm.start()
+    try:
+        files = []
+        for i in range(4):
+            f = tmp_path / "mon" / f"f{i}.txt"
+            f.write_text(str(i))
+            files.append(f)
+            sm.submit_local_change(f)
+        sm.flush(timeout=10)
+        assert pgp.calls == 4
+        assert all((tmp_path / "sync" / "encrypted_files" / f"f{i}.txt.gpg").exists() for i in range(4))
+
+        # Nothing changed since the last flush
+        for f in files:
+            sm.submit_local_change(f)
+        sm.flush(timeout=10)
+        assert pgp.calls == 4
+    finally:
+        sm.stop()
@@ -0,0 +1,166 @@
+import os
+import sys
+import io
+import json
+import hashlib
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+import pytest
+from src.bulk import BulkJob, Checkpoint, format_duration
+from conftest import PrefixPGP
+
+
+@pytest.fixture
+def pair(tmp_path):
+    (tmp_path / "sync" / "encrypted_files").mkdir(parents=True)
+    (tmp_path / "mon" / "sub").mkdir(parents=True)
+    (tmp_path / "mon" / "small.txt").write_text("a")
+    (tmp_path / "mon" / "sub" / "big.txt").write_text("b" * 100)
+    (tmp_path / "mon" / ".hidden").write_text("skip me")
+    return tmp_path
+
+
+def test_encrypt_all_then_verify_all(pair, make_manager):
+    tmp_path = pair
+    pgp = PrefixPGP()
+    sm = make_manager(decrypted="dec", pgp=pgp)
+    job = BulkJob(sm, "encrypt-all", workers=2, out=io.StringIO())
+    entries = job.plan()
+    # Largest first, hidden files left out
+    assert [p.name for p, _, _ in entries] == ["big.txt", "small.txt"]
+    summary = job.run()
+    assert summary["done"] == 2 and summary["failed"] == 0
+    assert (tmp_path / "sync" / "encrypted_files" / "sub" / "big.txt.gpg").read_bytes() == b"ENC:" + b"b" * 100
+    assert not os.path.exists(job.checkpoint.path)
+
+    summary = BulkJob(sm, "verify-all", out=io.StringIO()).run()
+    assert summary["done"] == 2 and summary["failed"] == 0
+
+    (tmp_path / "mon" / "small.txt").write_text("changed")
+    summary = BulkJob(sm, "verify-all", out=io.StringIO()).run()
+    assert [f["path"] for f in summary["failures"]] == [str(tmp_path / "mon" / "small.txt")]
+    sm.stop()
+
+
+def test_interrupted_run_resumes_from_checkpoint(pair, make_manager):
+    tmp_path = pair
+    pgp = PrefixPGP(fail={"small.txt"})
+    sm = make_manager(decrypted="dec", pgp=pgp)
+    summary = BulkJob(sm, "encrypt-all", out=io.StringIO()).run()
+    assert summary["done"] == 1 and summary["failed"] == 1
+    assert pgp.encrypted == ["big.txt"]
+
+    # The checkpoint survives the failure, so only the failed file is redone
+    pgp.fail.clear()
+    summary = BulkJob(sm, "encrypt-all", out=io.StringIO()).run()
+    assert summary["resumed"] == 1 and summary["done"] == 1
+    assert pgp.encrypted == ["big.txt", "small.txt"]
+
+    # --restart ignores the (now removed) checkpoint either way
+    summary = BulkJob(sm, "encrypt-all", restart=True, out=io.StringIO()).run()
+    assert summary["resumed"] == 0
+    sm.stop()
+
+
+def test_restore_all_decrypts_every_ciphertext(pair, make_manager):
+    tmp_path = pair
+    enc = tmp_path / "sync" / "encrypted_files"
+    (enc / "one.txt.gpg").write_bytes(b"ENC:one")
+    (enc / "notes.txt").write_text("not a ciphertext")
+    sm = make_manager(decrypted="dec")
+    summary = BulkJob(sm, "restore-all", out=io.StringIO()).run()
+    assert summary["files"] == 1 and summary["done"] == 1
+    assert (tmp_path / "dec" / "one.txt").read_bytes() == b"one"
+    sm.stop()
+
+
+class RotatingPGP(PrefixPGP):
+    # Ciphertexts carry the key they are encrypted to as a prefix
+    def encrypt_data(self, data, recipient=None):
+        return (recipient or "old").encode() + b":" + data
+
+    def decrypt_data(self, data):
+        return data.split(b":", 1)[1]
+
+    def reencrypt_file(self, encrypted_path, output_path, recipient):
+        with open(encrypted_path, "rb") as src, open(output_path, "wb") as dst:
+            dst.write(recipient.encode() + b":" + self.decrypt_data(src.read()))
+        return output_path
+
+
+def test_rotate_key_reencrypts_ciphertexts_and_version_records(pair, make_manager):
+    tmp_path = pair
+    enc = tmp_path / "sync" / "encrypted_files"
+    pgp = RotatingPGP()
+    sm = make_manager(decrypted="dec", pgp=pgp)
+    assert sm.handle_local_change(tmp_path / "mon" / "small.txt") is True
+    (enc / "other.txt.gpg").write_bytes(b"old:other")
+    assert enc.joinpath("small.txt.gpg").read_bytes() == b"old:a"
+
+    summary = BulkJob(sm, "rotate-key", recipient="new", out=io.StringIO()).run()
+    assert summary["done"] == 2 and summary["failed"] == 0
+    assert enc.joinpath("small.txt.gpg").read_bytes() == b"new:a"
+    assert enc.joinpath("other.txt.gpg").read_bytes() == b"new:other"
+    version = enc.joinpath("small.txt.gpg.ver").read_bytes()
+    assert version.startswith(b"new:")
+    assert json.loads(pgp.decrypt_data(version))["ciphertext_sha256"] == hashlib.sha256(b"new:a").hexdigest()
+    # The re-encrypted ciphertext is still recognised as synced here
+    assert sm.handle_sync_folder_change(enc / "small.txt.gpg") is None
+    sm.stop()
+
+
+def test_rotate_key_with_group_commit(pair, make_manager):
+    tmp_path = pair
+    enc = tmp_path / "sync" / "encrypted_files"
+    sm = make_manager(decrypted="dec", pgp=RotatingPGP(), durability="group", group_commit_ms=60000)
+    assert sm.handle_local_change(tmp_path / "mon" / "small.txt") is True
+    sm.sync_folder_client.durability.flush()
+
+    summary = BulkJob(sm, "rotate-key", recipient="new", out=io.StringIO()).run()
+    assert summary["done"] == 1
+    assert enc.joinpath("small.txt.gpg").read_bytes() == b"old:a"
+    sm.sync_folder_client.durability.flush()
+    assert enc.joinpath("small.txt.gpg").read_bytes() == b"new:a"
+    # Fingerprinted as published, not as it was before the group commit
+    st, entry = os.stat(enc / "small.txt.gpg"), sm.fingerprints.get("small.txt.gpg")
+    assert (entry["size"], entry["mtime_ns"]) == (st.st_size, st.st_mtime_ns)
+    assert sm.handle_sync_folder_change(enc / "small.txt.gpg") is None
+    sm.stop()
+
+
+def test_version_record_is_kept_if_rotation_fails(pair, make_manager):
+    tmp_path = pair
+    enc = tmp_path / "sync" / "encrypted_files"
+    pgp = RotatingPGP()
+    sm = make_manager(decrypted="dec", pgp=pgp)
+    assert sm.handle_local_change(tmp_path / "mon" / "small.txt") is True
+    version = enc.joinpath("small.txt.gpg.ver").read_bytes()
+
+    publish = sm.sync_folder_client.durability.publish
+
+    def fail(temp_path, dest_path):
+        # Only the ciphertext fails to go out
+        if dest_path.endswith(".ver"):
+            return publish(temp_path, dest_path)
+        os.remove(temp_path)
+        raise OSError("sync folder full")
+    sm.sync_folder_client.durability.publish = fail
+    summary = BulkJob(sm, "rotate-key", recipient="new", out=io.StringIO()).run()
+    assert summary["failed"] == 1
+    assert enc.joinpath("small.txt.gpg").read_bytes() == b"old:a"
+    assert enc.joinpath("small.txt.gpg.ver").read_bytes() == version
+    sm.stop()
+
+
+def test_checkpoint_ignores_changed_files_and_torn_lines(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "cp.jsonl"))
+    checkpoint.add("/a", 1, 2.0)
+    checkpoint.close()
+    with open(checkpoint.path, "a") as f:
+        f.write('{"path": "/b", "si')
+    assert checkpoint.load() == {"/a": (1, 2.0)}
+
+
+def test_format_duration():
+    assert format_duration(42) == "42s"
+    assert format_duration(125) == "2m05s"
+    assert format_duration(7260) == "2h01m"
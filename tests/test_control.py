@@ -0,0 +1,96 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+import pytest
+from src.control import ControlServer, available, send_command
+from src.sync_manager import SyncManager
+from src.sync_folder_client import SyncFolderClient
+
+pytestmark = pytest.mark.skipif(not available(), reason="Unix domain sockets not available")
+
+
+class WritingPGP:
+    def encrypt_file(self, file_path, output_path=None, source=None):
+        out = str(file_path) + ".gpg"
+        with open(out, "wb") as f:
+            f.write(b"x")
+        return out
+
+    def decrypt_file(self, encrypted_path, output_path=None):
+        return output_path
+
+
+@pytest.fixture
+def controlled(tmp_path):
+    (tmp_path / "sync" / "encrypted_files").mkdir(parents=True)
+    (tmp_path / "mon").mkdir()
+    cfg = {
+        "local": {"monitored_path": str(tmp_path / "mon"), "decrypted_path": str(tmp_path / "dec")},
+        "sync_folder": {"path": str(tmp_path / "sync"), "encrypted_folder": "encrypted_files"},
+        "pgp": {"key_name": "dummy", "passphrase": "", "gnupghome": str(tmp_path)},
+        "control": {"socket": str(tmp_path / "control.sock")},
+    }
+    sm = SyncManager(cfg, SyncFolderClient(cfg), WritingPGP())
+    server = ControlServer(cfg, sm)
+    server.start()
+    yield sm, server.path, tmp_path
+    server.stop()
+
+
+def test_status_reports_queues_and_throughput(controlled):
+    sm, sock, tmp_path = controlled
+    f = tmp_path / "mon" / "a.txt"
+    f.write_text("data")
+    sm.handle_local_change(f)
+    status = send_command(sock, "status")
+    assert status["paused"] is False
+    assert status["queues"] == {"retry": 0, "settling": 0, "batch": 0}
+    assert status["completed"] == {"local": 1}
+    assert status["throughput"]["local"]["files_per_second"] > 0
+    assert status["in_flight"] == []
+
+
+def test_pause_holds_changes_until_resume(controlled):
+    sm, sock, tmp_path = controlled
+    encrypted = tmp_path / "sync" / "encrypted_files"
+    f = tmp_path / "mon" / "a.txt"
+    f.write_text("data")
+    send_command(sock, "pause")
+    sm.handle_local_change(f)
+    assert not (encrypted / "a.txt.gpg").exists()
+    assert send_command(sock, "status")["held"] == 1
+    send_command(sock, "resume")
+    assert (encrypted / "a.txt.gpg").exists()
+
+
+def test_boost_processes_while_paused(controlled):
+    sm, sock, tmp_path = controlled
+    f = tmp_path / "mon" / "urgent.txt"
+    f.write_text("data")
+    send_command(sock, "pause")
+    sm.handle_local_change(f)
+    assert send_command(sock, "boost", path=str(f)) == {"kind": "local"}
+    assert (tmp_path / "sync" / "encrypted_files" / "urgent.txt.gpg").exists()
+    assert send_command(sock, "status")["held"] == 0
+
+
+def test_rescan_subtree(controlled):
+    sm, sock, tmp_path = controlled
+    sub = tmp_path / "mon" / "sub"
+    sub.mkdir()
+    for name in ("x.txt", "y.txt"):
+        (sub / name).write_text(name)
+    (tmp_path / "mon" / "other.txt").write_text("z")
+    assert send_command(sock, "rescan", path=str(sub)) == {"queued": 2}
+    assert (tmp_path / "sync" / "encrypted_files" / "sub" / "x.txt.gpg").exists()
+    assert not (tmp_path / "sync" / "encrypted_files" / "other.txt.gpg").exists()
+
+
+def test_errors_are_reported(controlled, tmp_path):
+    _, sock, _ = controlled
+    with pytest.raises(RuntimeError, match="Unknown command"):
+        send_command(sock, "explode")
+    with pytest.raises(RuntimeError, match="not inside"):
+        send_command(sock, "boost", path="/etc/passwd")
+    with pytest.raises(ConnectionError):
+        send_command(str(tmp_path / "missing.sock"), "status")
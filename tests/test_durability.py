@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+import pytest
+from unittest import mock
+from src.durability import Durability
+from src.sync_folder_client import SyncFolderClient
+
+
+def make_client(tmp_path, **sync):
+    config = {"sync_folder": {"path": str(tmp_path), "encrypted_folder": "encrypted_files"}, "sync": sync}
+    return SyncFolderClient(config)
+
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError, match="Unknown durability mode"):
+        Durability({"sync": {"durability": "sometimes"}})
+
+
+def test_upload_leaves_no_partial_files(tmp_path):
+    client = make_client(tmp_path)
+    src = tmp_path / "foo.txt.gpg"
+    src.write_text("cipher")
+    dest = os.path.join(client.encrypted_path, "sub", "foo.txt.gpg")
+    client.upload_file(str(src), dest)
+    assert open(dest).read() == "cipher"
+    assert os.listdir(os.path.dirname(dest)) == ["foo.txt.gpg"]
+
+
+def test_fsync_mode_syncs_file_and_directory(tmp_path):
+    client = make_client(tmp_path, durability="fsync")
+    dest = os.path.join(client.encrypted_path, "a.gpg")
+    with mock.patch("src.durability.os.fsync", wraps=os.fsync) as fsync:
+        client.upload_bytes(b"cipher", dest)
+    assert fsync.call_count == 2
+    assert open(dest, "rb").read() == b"cipher"
+
+
+def test_group_commit_publishes_batch(tmp_path):
+    client = make_client(tmp_path, durability="group", group_commit_ms=50)
+    dest_a = os.path.join(client.encrypted_path, "a.gpg")
+    dest_b = os.path.join(client.encrypted_path, "b.gpg")
+    client.upload_bytes(b"a1", dest_a)
+    client.upload_bytes(b"a2", dest_a)
+    client.upload_bytes(b"b", dest_b)
+    # Not visible until the batch is committed
+    assert not os.path.exists(dest_a)
+    deadline = time.time() + 5
+    while not os.path.exists(dest_b) and time.time() < deadline:
+        time.sleep(0.02)
+    assert open(dest_a, "rb").read() == b"a2"
+    assert open(dest_b, "rb").read() == b"b"
+    # Superseded temp was discarded
+    assert sorted(os.listdir(client.encrypted_path)) == ["a.gpg", "b.gpg"]
+    client.close()
+
+
+def test_close_commits_pending(tmp_path):
+    client = make_client(tmp_path, durability="group", group_commit_ms=60000)
+    dest = os.path.join(client.encrypted_path, "late.gpg")
+    client.upload_bytes(b"x", dest)
+    client.close()
+    assert open(dest, "rb").read() == b"x"
@@ -59,3 +59,12 @@ def test_file_monitor_ignores_directories(tmp_path):
     time.sleep(1.5)
     monitor.stop()
     assert not called
+
+
+def test_renamed_file_is_reported_under_new_name(tmp_path):
+    from watchdog.events import FileMovedEvent
+    from src.file_monitor import FileChangeHandler
+    called = []
+    handler = FileChangeHandler(called.append)
+    handler.on_moved(FileMovedEvent(str(tmp_path / "before.txt"), str(tmp_path / "after.txt")))
+    assert [p.name for p in called] == ["after.txt"]
@@ -0,0 +1,66 @@
+import os
+import sys
+import errno
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+import pytest
+from unittest import mock
+from src import file_ops
+from src.file_ops import clone_atomic, clone_file
+
+
+def test_clone_file_copies_content_and_mtime(tmp_path):
+    src = tmp_path / "src.bin"
+    src.write_bytes(b"x" * 100000)
+    os.utime(src, (1000000000, 1000000000))
+    dst = tmp_path / "dst.bin"
+    clone_file(src, dst)
+    assert dst.read_bytes() == src.read_bytes()
+    assert int(os.stat(dst).st_mtime) == 1000000000
+
+
+def test_clone_file_falls_back_when_reflink_unsupported(tmp_path, monkeypatch):
+    fcntl = pytest.importorskip("fcntl")
+    src = tmp_path / "src.txt"
+    src.write_text("hello")
+    dst = tmp_path / "dst.txt"
+    monkeypatch.setattr(file_ops, "_reflink_unsupported", set())
+    with mock.patch.object(fcntl, "ioctl", side_effect=OSError(errno.EOPNOTSUPP, "not supported")) as m:
+        clone_file(src, dst)
+        assert dst.read_text() == "hello"
+        # Second copy on the same device skips the ioctl entirely
+        clone_file(src, tmp_path / "dst2.txt")
+    assert m.call_count == 1
+    assert (tmp_path / "dst2.txt").read_text() == "hello"
+
+
+def test_clone_file_overwrites_existing(tmp_path):
+    src = tmp_path / "src.txt"
+    src.write_text("new")
+    dst = tmp_path / "dst.txt"
+    dst.write_text("old content that is longer")
+    clone_file(src, dst)
+    assert dst.read_text() == "new"
+
+
+def test_clone_file_from_open_file(tmp_path):
+    src = tmp_path / "src.txt"
+    src.write_text("hello")
+    os.utime(src, (1000000000, 1000000000))
+    with open(src, "rb") as f:
+        # The path now names another file; the open file is what gets copied
+        os.rename(src, tmp_path / "moved.txt")
+        src.write_text("swapped")
+        clone_file(f, tmp_path / "dst.txt")
+    assert (tmp_path / "dst.txt").read_text() == "hello"
+    assert int(os.stat(tmp_path / "dst.txt").st_mtime) == 1000000000
+
+
+def test_clone_atomic_leaves_no_partial_file(tmp_path, monkeypatch):
+    src = tmp_path / "src.txt"
+    src.write_text("hello")
+    clone_atomic(src, tmp_path / "dst.txt")
+    assert (tmp_path / "dst.txt").read_text() == "hello"
+    monkeypatch.setattr(file_ops, "clone_file", mock.Mock(side_effect=OSError(errno.ENOSPC, "full")))
+    with pytest.raises(OSError):
+        clone_atomic(src, tmp_path / "other.txt")
+    assert sorted(os.listdir(tmp_path)) == ["dst.txt", "src.txt"]
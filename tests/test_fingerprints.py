@@ -0,0 +1,76 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+import pytest
+from src.fingerprints import FingerprintIndex
+
+
+def test_touched_ciphertext_is_not_decrypted_again(tmp_path, make_manager):
+    sm = make_manager(decrypted="dec")
+    enc = tmp_path / "sync" / "encrypted_files" / "a.txt.gpg"
+    enc.write_bytes(b"ENC:hello")
+    assert sm.handle_sync_folder_change(enc) is True
+    assert sm.pgp_handler.decrypts == 1
+
+    # Same size and mtime: fast path
+    assert sm.handle_sync_folder_change(enc) is None
+    # Rewritten with the same content by the sync client: hash matches
+    enc.write_bytes(b"ENC:hello")
+    os.utime(enc, ns=(0, 10 ** 18))
+    assert sm.handle_sync_folder_change(enc) is None
+    assert sm.pgp_handler.decrypts == 1
+
+    # Survives a restart
+    sm.stop()
+    sm = make_manager(decrypted="dec")
+    assert sm.handle_sync_folder_change(enc) is None
+    assert sm.pgp_handler.decrypts == 0
+
+    # New content, or a deleted plaintext, is decrypted
+    enc.write_bytes(b"ENC:HELLO")
+    assert sm.handle_sync_folder_change(enc) is True
+    os.remove(tmp_path / "dec" / "a.txt")
+    assert sm.handle_sync_folder_change(enc) is True
+    assert sm.pgp_handler.decrypts == 2
+    sm.stop()
+
+
+@pytest.mark.parametrize("decrypted", ["mon", "dec"])
+def test_own_upload_is_not_decrypted(tmp_path, decrypted, make_manager):
+    sm = make_manager(decrypted=decrypted)
+    f = tmp_path / "mon" / "notes.txt"
+    f.write_text("plain")
+    assert sm.handle_local_change(f) is True
+    enc = tmp_path / "sync" / "encrypted_files" / "notes.txt.gpg"
+    assert sm.handle_sync_folder_change(enc) is None
+    assert sm.pgp_handler.decrypts == 0
+    # With a separate decrypted folder the plaintext is copied there
+    assert (tmp_path / decrypted / "notes.txt").read_text() == "plain"
+    sm.stop()
+
+
+def test_own_upload_is_recognised_after_group_commit(tmp_path, make_manager):
+    # The ciphertext is only renamed into place by the next group commit
+    sm = make_manager(decrypted="dec", durability="group", group_commit_ms=60000)
+    f = tmp_path / "mon" / "notes.txt"
+    enc = tmp_path / "sync" / "encrypted_files" / "notes.txt.gpg"
+    for content in ("v1", "v2 longer"):
+        f.write_text(content)
+        assert sm.handle_local_change(f) is True
+        sm.sync_folder_client.durability.flush()
+        assert sm.handle_sync_folder_change(enc) is None
+    assert sm.pgp_handler.decrypts == 0
+    sm.stop()
+
+
+def test_index_roundtrip(tmp_path):
+    index = FingerprintIndex(str(tmp_path / "fp.sqlite"))
+    index.put("a/b.gpg", 3, 5, "abc", "uploaded", "/src", 1, 2)
+    index.touch("a/b.gpg", 7)
+    assert index.get("a/b.gpg") == {
+        "size": 3, "mtime_ns": 7, "sha256": "abc", "origin": "uploaded",
+        "source": "/src", "source_size": 1, "source_mtime_ns": 2,
+    }
+    index.forget("a/b.gpg")
+    assert index.get("a/b.gpg") is None
+    index.close()
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+import pytest
+from src.governor import ResizableSemaphore, ResourceGovernor, ThrottledReader, TokenBucket
+
+
+def test_token_bucket_limits_average_rate():
+    bucket = TokenBucket(100_000)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.consume(100_000)
+    # One second of burst, then two seconds of debt
+    assert time.monotonic() - start >= 1.8
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(None)
+    start = time.monotonic()
+    bucket.consume(10 ** 12)
+    assert time.monotonic() - start < 0.1
+
+
+def test_semaphore_limit_can_change_while_held():
+    slots = ResizableSemaphore(1)
+    slots.acquire()
+    acquired = threading.Event()
+    t = threading.Thread(target=lambda: (slots.acquire(), acquired.set()))
+    t.start()
+    assert not acquired.wait(0.2)
+    slots.set_limit(2)
+    assert acquired.wait(1)
+    t.join()
+    assert slots.in_use == 2
+
+
+def test_config_and_runtime_update():
+    governor = ResourceGovernor({"sync": {"max_write_mbps": 2, "max_gpg_processes": 3}})
+    assert governor.write_bucket.rate == 2_000_000
+    assert governor.read_bucket.rate is None
+    assert governor.gpg_slots.limit == 3
+
+    snapshot = governor.update(max_read_mbps="0.5", max_gpg_processes=None)
+    assert governor.read_bucket.rate == 500_000
+    assert governor.gpg_slots.limit is None
+    assert snapshot["max_write_mbps"] == 2.0
+    with pytest.raises(ValueError):
+        governor.update(max_cpu=1)
+    with pytest.raises(ValueError):
+        governor.update(gpg_ionice="turbo")
+
+
+def test_reader_only_wraps_when_limited(tmp_path):
+    f = tmp_path / "data"
+    f.write_bytes(b"x" * 10)
+    governor = ResourceGovernor({})
+    with open(f, "rb") as stream:
+        assert governor.reader(stream) is stream
+    governor.update(max_read_mbps=1)
+    with open(f, "rb") as stream:
+        reader = governor.reader(stream)
+        assert isinstance(reader, ThrottledReader)
+        assert reader.read() == b"x" * 10
+
+
+@pytest.mark.skipif(not hasattr(os, "setpriority"), reason="setpriority not available")
+def test_instrumented_processes_are_reniced():
+    class FakeGPG:
+        def _open_subprocess(self, args, passphrase=False):
+            return subprocess.Popen(["sleep", "2"])
+
+    governor = ResourceGovernor({"sync": {"gpg_nice": 10, "gpg_ionice": "idle"}})
+    gpg = FakeGPG()
+    governor.instrument(gpg)
+    process = gpg._open_subprocess([])
+    try:
+        assert os.getpriority(os.PRIO_PROCESS, process.pid) >= 10
+    finally:
+        process.kill()
+        process.wait()
@@ -10,7 +10,7 @@ from src.sync_folder_client import SyncFolderClient
 
 
 class PGPWriteDummy:
-    def encrypt_file(self, file_path, output_path=None):
+    def encrypt_file(self, file_path, output_path=None, source=None):
         out = (output_path or (str(file_path) + ".gpg"))
         with open(out, "w") as f:
             f.write("encrypted")
@@ -58,6 +58,32 @@ def test_symlink_protection_in_local_changes(tmp_path):
     assert not (sync / "encrypted_files" / "link.txt.gpg").exists()
 
 
+class ReadingPGP:
+    def encrypt_file(self, file_path, output_path=None, source=None):
+        data = source.read() if source is not None else Path(file_path).read_bytes()
+        out = output_path or (str(file_path) + ".gpg")
+        with open(out, "wb") as f:
+            f.write(b"ENC:" + data)
+        return out
+
+
+def test_symlink_swapped_in_after_check_is_not_followed(tmp_path):
+    (tmp_path / "sync" / "encrypted_files").mkdir(parents=True)
+    cfg = make_config(tmp_path)
+    sm = SyncManager(cfg, SyncFolderClient(cfg), ReadingPGP())
+    outside = tmp_path / "outside.txt"
+    outside.write_text("secret")
+    try:
+        (tmp_path / "mon" / "f.txt").symlink_to(outside)
+    except (OSError, NotImplementedError):
+        return
+    # The swap happens between the path check and the encryption
+    sm.local_guard.check = lambda path: True
+    assert sm.handle_local_change(tmp_path / "mon" / "f.txt") is False
+    assert not (tmp_path / "sync" / "encrypted_files" / "f.txt.gpg").exists()
+    sm.stop()
+
+
 def test_secure_permissions_on_decrypted_file(tmp_path):
     mon = tmp_path / "mon"
     dec = tmp_path / "dec"
@@ -78,3 +104,14 @@ def test_secure_permissions_on_decrypted_file(tmp_path):
     assert out.exists()
     mode = stat.S_IMODE(os.lstat(out).st_mode)
     assert mode & 0o077 == 0, f"Permissions too permissive: {oct(mode)}"
+
+
+def test_both_directions_lock_the_same_ciphertext(tmp_path):
+    # With a separate decrypted directory the plaintext paths differ, the ciphertext doesn't
+    (tmp_path / "sync" / "encrypted_files").mkdir(parents=True)
+    cfg = make_config(tmp_path)
+    sm = SyncManager(cfg, SyncFolderClient(cfg), PGPWriteDummy())
+    local_key = sm._lock_key("local", tmp_path / "mon" / "sub" / "f.txt")
+    remote_key = sm._lock_key("remote", tmp_path / "sync" / "encrypted_files" / "sub" / "f.txt.gpg")
+    assert local_key == remote_key == "sub/f.txt.gpg"
+    sm.stop()
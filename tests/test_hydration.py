@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+import pytest
+from src.hydration import HydrationPolicy
+
+
+def selective_manager(make_manager, tmp_path, **hydration):
+    enc = tmp_path / "sync" / "encrypted_files"
+    (enc / "docs").mkdir(parents=True)
+    (enc / "archive").mkdir()
+    sm = make_manager(decrypted="dec", hydration=dict({"mode": "selective"}, **hydration))
+    return sm, enc
+
+
+def test_policy_working_set():
+    policy = HydrationPolicy(
+        {"sync": {"hydration": {"mode": "selective", "include": ["docs/"], "max_age_days": 1, "max_file_bytes": 100}}},
+        "/enc",
+    )
+    now = time.time()
+    assert policy.wanted("docs/a.txt.gpg", 10, now - 10 * 86400)
+    assert policy.wanted("other/new.txt.gpg", 10, now)
+    assert not policy.wanted("other/old.txt.gpg", 10, now - 10 * 86400)
+    assert not policy.wanted("docs/huge.bin.gpg", 1000, now)
+    assert not HydrationPolicy({}, "/enc").selective
+    with pytest.raises(ValueError):
+        HydrationPolicy({"sync": {"hydration": {"mode": "lazy"}}}, "/enc")
+
+
+def test_files_outside_working_set_stay_encrypted_until_hydrated(tmp_path, make_manager):
+    sm, enc = selective_manager(make_manager, tmp_path, include=["docs/"])
+    (enc / "docs" / "a.txt.gpg").write_bytes(b"ENC:a")
+    (enc / "archive" / "b.txt.gpg").write_bytes(b"ENC:b")
+    assert sm.handle_sync_folder_change(enc / "docs" / "a.txt.gpg") is True
+    assert sm.handle_sync_folder_change(enc / "archive" / "b.txt.gpg") is None
+    assert (tmp_path / "dec" / "docs" / "a.txt").read_bytes() == b"a"
+    assert not (tmp_path / "dec" / "archive" / "b.txt").exists()
+    assert sm.status()["hydration"] == {"files": 2, "hydrated": 1, "hydrated_bytes": 1}
+
+    assert sm.hydrate(str(enc / "archive")) == 1
+    assert (tmp_path / "dec" / "archive" / "b.txt").read_bytes() == b"b"
+
+    # A hydrated file keeps following remote updates
+    (enc / "archive" / "b.txt.gpg").write_bytes(b"ENC:b2")
+    assert sm.handle_sync_folder_change(enc / "archive" / "b.txt.gpg") is True
+    assert (tmp_path / "dec" / "archive" / "b.txt").read_bytes() == b"b2"
+    sm.stop()
+
+
+def test_hydrate_by_plaintext_path(tmp_path, make_manager):
+    sm, enc = selective_manager(make_manager, tmp_path, include=["nothing"])
+    (enc / "archive" / "c.txt.gpg").write_bytes(b"ENC:c")
+    sm.handle_sync_folder_change(enc / "archive" / "c.txt.gpg")
+    assert sm.hydrate(str(tmp_path / "dec" / "archive" / "c.txt")) == 1
+    assert (tmp_path / "dec" / "archive" / "c.txt").exists()
+    sm.stop()
+
+
+def test_lru_eviction_spares_modified_files(tmp_path, make_manager):
+    sm, enc = selective_manager(make_manager, tmp_path, disk_budget_bytes=15)
+    for name in ("old", "edited", "new"):
+        (enc / "docs" / f"{name}.txt.gpg").write_bytes(b"ENC:" + b"x" * 10)
+        assert sm.handle_sync_folder_change(enc / "docs" / f"{name}.txt.gpg")
+        if name == "old":
+            # Make "old" the least recently used
+            old = tmp_path / "dec" / "docs" / "old.txt"
+            os.utime(old, ns=(10 ** 9, os.stat(old).st_mtime_ns))
+            sm.catalog._db.execute("UPDATE files SET last_used = 1 WHERE path = 'docs/old.txt.gpg'")
+        if name == "edited":
+            (tmp_path / "dec" / "docs" / "edited.txt").write_bytes(b"local edit")
+    assert not (tmp_path / "dec" / "docs" / "old.txt").exists()
+    assert (tmp_path / "dec" / "docs" / "edited.txt").read_bytes() == b"local edit"
+    assert (tmp_path / "dec" / "docs" / "new.txt").exists()
+    sm.stop()
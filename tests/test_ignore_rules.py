@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.file_monitor import FileMonitor
+from src.ignore_rules import IgnoreRules, plan_watches
+
+
+def rules(*lines, root="/r"):
+    return IgnoreRules(root, lines)
+
+
+def test_plain_names_match_anywhere():
+    r = rules("node_modules", "*.swp", "# comment", "")
+    assert r.match("node_modules", is_dir=True)
+    assert r.match("a/node_modules/pkg/index.js")
+    assert r.match("a/.notes.txt.swp")
+    assert not r.match("a/node_modules_old.txt")
+    assert not r.match("notes.txt")
+
+
+def test_directory_only_patterns():
+    r = rules("build/")
+    assert r.match("build", is_dir=True)
+    assert r.match("src/build/out.o")
+    assert not r.match("build")  # a file named build
+
+
+def test_anchored_patterns():
+    r = rules("/cache", "docs/tmp/", "logs/*.log")
+    assert r.match("cache/x")
+    assert not r.match("sub/cache/x")
+    assert r.match("docs/tmp/a.txt")
+    assert not r.match("docs/tmp")
+    assert r.match("logs/a.log")
+    assert not r.match("logs/sub/a.log")
+
+
+def test_double_star():
+    r = rules("**/target", "a/**/z.txt", "vendor/**")
+    assert r.match("x/y/target/classes")
+    assert r.match("a/z.txt")
+    assert r.match("a/b/c/z.txt")
+    assert r.match("vendor/lib/x.py")
+    assert not r.match("vendor")
+
+
+def test_negation_is_ordered():
+    r = rules("*.log", "!keep.log")
+    assert r.match("debug.log")
+    assert not r.match("keep.log")
+    # Nothing below an ignored directory can be re-included
+    r = rules("out/", "!out/keep.txt")
+    assert r.match("out/keep.txt")
+
+
+def test_character_classes_and_escapes():
+    r = rules("file[0-9].txt", "\\#literal", "\\!bang")
+    assert r.match("file3.txt")
+    assert not r.match("fileA.txt")
+    assert r.match("#literal")
+    assert r.match("!bang")
+
+
+def test_absolute_paths_and_outside_root():
+    r = rules("*.o", root="/r")
+    assert r.ignored("/r/src/x.o")
+    assert not r.ignored("/other/x.o")
+    assert not rules(root="/r").ignored("/r/x.o")
+
+
+def test_load_missing_file_means_no_rules(tmp_path):
+    assert not IgnoreRules.load(tmp_path)
+    (tmp_path / ".guardianignore").write_text("*.tmp\n")
+    assert IgnoreRules.load(tmp_path).ignored(tmp_path / "a.tmp")
+
+
+def test_plan_skips_ignored_directories(tmp_path):
+    for d in ("src/pkg", "src/node_modules/x", "docs"):
+        (tmp_path / d).mkdir(parents=True)
+    plan = plan_watches(tmp_path, IgnoreRules(tmp_path, ["node_modules/"]))
+    assert (str(tmp_path), False) in plan
+    assert (str(tmp_path / "src"), False) in plan
+    assert (str(tmp_path / "src" / "pkg"), True) in plan
+    assert (str(tmp_path / "docs"), True) in plan
+    assert not any("node_modules" in path for path, _ in plan)
+    assert plan_watches(tmp_path, IgnoreRules(tmp_path)) == [(str(tmp_path), True)]
+
+
+def test_file_monitor_drops_ignored_events(tmp_path):
+    (tmp_path / "node_modules").mkdir()
+    called = []
+    monitor = FileMonitor(str(tmp_path), called.append, ignore_rules=IgnoreRules(tmp_path, ["node_modules/", "*.swp"]))
+    monitor.start()
+    (tmp_path / "node_modules" / "dep.js").write_text("x")
+    (tmp_path / "edit.swp").write_text("x")
+    # A directory created below the non-recursive root watch gets its own watch
+    (tmp_path / "new").mkdir()
+    time.sleep(0.5)
+    (tmp_path / "new" / "kept.txt").write_text("x")
+    time.sleep(1.5)
+    monitor.stop()
+    names = {p.name for p in called}
+    assert "kept.txt" in names
+    assert "dep.js" not in names
+    assert "edit.swp" not in names
@@ -6,7 +6,7 @@ from src.sync_manager import SyncManager
 from src.sync_folder_client import SyncFolderClient
 
 class DummyPGP:
-    def encrypt_file(self, file_path, output_path=None):
+    def encrypt_file(self, file_path, output_path=None, source=None):
         out = str(file_path) + ".gpg"
         with open(out, "w") as f:
             f.write("encrypted")
@@ -44,7 +44,8 @@ def test_full_workflow(tmp_path, dummy_config):
     sm.handle_local_change(test_file)
     enc_file = tmp_path / "sync" / "encrypted_files" / "secret.txt.gpg"
     assert enc_file.exists()
-    # Simulate remote change (new encrypted file)
+    # Simulate remote change (new encrypted file from another device)
+    enc_file.write_text("encrypted elsewhere")
     sm.handle_sync_folder_change(enc_file)
     dec_file = tmp_path / "dec" / "secret.txt"
     assert dec_file.exists()
@@ -0,0 +1,85 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src import journal as journal_module
+from src.file_ops import partial_path_pattern
+from src.journal import OperationJournal
+from src.state import state_dir
+from src.sync_manager import SyncManager
+from src.sync_folder_client import SyncFolderClient
+
+
+def test_recover_rolls_back_only_unfinished_operations(tmp_path):
+    path = str(tmp_path / "journal.log")
+    done_temp = tmp_path / "done.txt.gpg"
+    crashed_temp = tmp_path / "crashed.txt.gpg"
+    partial = tmp_path / ".crashed.txt.gpg.abc123.partial"
+    for p in (done_temp, crashed_temp, partial):
+        p.write_text("x")
+
+    journal = OperationJournal(path)
+    journal.recover()
+    with journal.operation("local", tmp_path / "done.txt", staging=[done_temp]):
+        pass
+    journal.begin("local", tmp_path / "crashed.txt", staging=[crashed_temp],
+                  staging_globs=[partial_path_pattern(tmp_path / "crashed.txt.gpg")])
+    journal.close()  # simulated crash
+
+    interrupted = OperationJournal(path).recover()
+    assert [r["source"] for r in interrupted] == [str(tmp_path / "crashed.txt")]
+    assert not crashed_temp.exists()
+    assert not partial.exists()
+    assert done_temp.exists(), "staging of finished operations must be left alone"
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    path = tmp_path / "journal.log"
+    path.write_text('{"op": 1, "kind": "local", "source": "a", "staging": []}\n{"op": 1, "do')
+    assert [r["op"] for r in OperationJournal(str(path)).recover()] == [1]
+
+
+def test_journal_compacts_when_idle(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal_module, "COMPACT_BYTES", 200)
+    path = tmp_path / "journal.log"
+    journal = OperationJournal(str(path))
+    journal.recover()
+    for i in range(20):
+        with journal.operation("local", tmp_path / f"{i}.txt"):
+            pass
+    journal.close()
+    assert path.stat().st_size < 400
+
+
+class NoopPGP:
+    def encrypt_file(self, file_path, output_path=None, source=None):
+        out = str(file_path) + ".gpg"
+        with open(out, "w") as f:
+            f.write("encrypted")
+        return out
+
+    def decrypt_file(self, encrypted_path, output_path=None):
+        return output_path
+
+
+def test_interrupted_operation_is_redone_on_startup(tmp_path):
+    (tmp_path / "sync" / "encrypted_files").mkdir(parents=True)
+    (tmp_path / "mon").mkdir()
+    cfg = {
+        "local": {"monitored_path": str(tmp_path / "mon"), "decrypted_path": str(tmp_path / "dec")},
+        "sync_folder": {"path": str(tmp_path / "sync"), "encrypted_folder": "encrypted_files"},
+        "pgp": {"key_name": "dummy", "passphrase": "", "gnupghome": str(tmp_path)},
+        "sync": {"retry_base_delay": 0},
+    }
+    source = tmp_path / "mon" / "doc.txt"
+    source.write_text("plain")
+    leftover = tmp_path / "mon" / "doc.txt.gpg"
+    leftover.write_text("half")
+    journal = OperationJournal(os.path.join(state_dir(cfg), "journal.log"))
+    journal.begin("local", source, staging=[leftover])
+    journal.close()
+
+    sm = SyncManager(cfg, SyncFolderClient(cfg), NoopPGP())
+    assert not leftover.exists()
+    sm.retry_queue.run_due()
+    assert (tmp_path / "sync" / "encrypted_files" / "doc.txt.gpg").exists()
+    assert not leftover.exists()
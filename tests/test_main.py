@@ -36,3 +36,35 @@ def test_main_entry(
     assert MockSyncManager.called
     assert MockODC.called
     assert MockPGP.called
+
+@mock.patch("main.setup_logging")
+@mock.patch("main.check_android_permissions")
+@mock.patch("main.load_config")
+@mock.patch("main.PGPHandler")
+@mock.patch("main.SyncFolderClient")
+@mock.patch("main.SyncManager")
+@mock.patch("main.FileMonitor")
+def test_main_verifies_key_after_watchers_start(
+    MockFileMonitor, MockSyncManager, MockODC, MockPGP, MockLoadConfig, MockCheckAndroid, MockSetupLogging, tmp_path
+):
+    MockLoadConfig.return_value = {
+        "local": {"monitored_path": str(tmp_path), "decrypted_path": str(tmp_path)},
+        "sync_folder": {"path": str(tmp_path), "encrypted_folder": "encrypted_files"},
+        "pgp": {"key_name": "dummy", "passphrase": "", "gnupghome": str(tmp_path)},
+        "control": {"enabled": False},
+    }
+    calls = mock.Mock()
+    calls.attach_mock(MockSyncManager.return_value, "sync_manager")
+    calls.attach_mock(MockFileMonitor.return_value.start, "monitor_start")
+    calls.attach_mock(MockPGP.return_value.verify, "verify")
+    sys_argv = sys.argv
+    sys.argv = ["guardian-sync", "--config", "dummy.json"]
+    with mock.patch("signal.pause", side_effect=SystemExit):
+        import main
+        with pytest.raises(SystemExit):
+            main.main()
+    sys.argv = sys_argv
+    assert MockPGP.call_args.kwargs["defer_verify"] is True
+    order = [name for name, _, _ in calls.mock_calls
+             if name in ("sync_manager.pause", "sync_manager.start", "monitor_start", "verify", "sync_manager.resume")]
+    assert order == ["sync_manager.pause", "sync_manager.start", "monitor_start", "verify", "sync_manager.resume"]
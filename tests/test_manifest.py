@@ -0,0 +1,92 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.manifest import MANIFEST_DIR, Manifest, diff, newer
+from conftest import PrefixPGP
+
+
+def manifest_manager(make_manager, name="mon", **manifest):
+    return make_manager(name, device_id=name, manifest=dict({"enabled": True}, **manifest))
+
+
+def test_uploads_are_listed_and_compacted(tmp_path, make_manager):
+    sm = manifest_manager(make_manager, compact_segments=2)
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / "mon" / name).write_bytes(name.encode())
+        assert sm.handle_local_change(tmp_path / "mon" / name) is True
+        sm.manifest.flush()
+    sm.stop()
+
+    # Two segments were folded into the snapshot
+    assert sorted(os.listdir(tmp_path / "sync" / "encrypted_files" / MANIFEST_DIR)) == ["mon.snapshot.gpg"]
+    reader = Manifest(tmp_path / "sync" / "encrypted_files", "other", PrefixPGP(), None)
+    entries = reader.load()
+    assert sorted(entries) == ["a.txt.gpg", "b.txt.gpg"]
+    assert entries["a.txt.gpg"]["size"] == 5
+    assert entries["a.txt.gpg"]["vector"] == {"mon": 1}
+    assert reader.pgp_handler.decrypts == 1
+
+
+def test_segment_numbers_are_not_reused_after_compaction(tmp_path, make_manager):
+    sm = manifest_manager(make_manager, compact_segments=2)
+    manifest_dir = tmp_path / "sync" / "encrypted_files" / MANIFEST_DIR
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / "mon" / name).write_bytes(name.encode())
+        assert sm.handle_local_change(tmp_path / "mon" / name) is True
+        sm.manifest.flush()
+    sm.stop()
+
+    # A restarted device continues after the segments folded into its snapshot
+    sm = Manifest(tmp_path / "sync" / "encrypted_files", "mon", PrefixPGP(), sm.sync_folder_client)
+    sm.record("c.txt.gpg", {"size": 1})
+    sm.flush()
+    assert sorted(os.listdir(manifest_dir)) == ["mon.00000003.log.gpg", "mon.snapshot.gpg"]
+
+    # A segment the snapshot already holds, left over by a failed delete, is skipped
+    (manifest_dir / "mon.00000001.log.gpg").write_bytes(
+        b'ENC:{"version": 1, "device": "mon", "entries": {"a.txt.gpg": {"size": 0}}}'
+    )
+    entries = Manifest(tmp_path / "sync" / "encrypted_files", "other", PrefixPGP(), None).load()
+    assert entries["a.txt.gpg"]["size"] == 5
+    assert sorted(entries) == ["a.txt.gpg", "b.txt.gpg", "c.txt.gpg"]
+
+
+def test_manifest_files_are_not_synced(tmp_path, make_manager):
+    sm = manifest_manager(make_manager)
+    (tmp_path / "mon" / "a.txt").write_bytes(b"a")
+    sm.handle_local_change(tmp_path / "mon" / "a.txt")
+    sm.manifest.flush()
+    segment = next((tmp_path / "sync" / "encrypted_files" / MANIFEST_DIR).iterdir())
+    assert sm.remote_ignore.ignored(segment)
+    assert sm.handle_sync_folder_change(segment) is None
+    assert not (tmp_path / "mon" / MANIFEST_DIR).exists()
+    sm.stop()
+
+
+def test_newer_entry_wins():
+    old = {"vector": {"a": 1}, "time": 20}
+    new = {"vector": {"a": 1, "b": 1}, "time": 10}
+    assert newer(old, new) is new
+    assert newer(new, old) is new
+    # Concurrent versions: the later upload
+    assert newer({"vector": {"a": 2}, "time": 30}, new)["time"] == 30
+
+
+def test_diff_against_local_tree(tmp_path, make_manager):
+    a = manifest_manager(make_manager, "a")
+    for name, content in (("same.txt", b"same"), ("changed.txt", b"v1"), ("remote.txt", b"r")):
+        (tmp_path / "a" / name).write_bytes(content)
+        assert a.handle_local_change(tmp_path / "a" / name) is True
+    a.stop()
+
+    b = manifest_manager(make_manager, "b")
+    (tmp_path / "b" / "same.txt").write_bytes(b"same")
+    (tmp_path / "b" / "changed.txt").write_bytes(b"v2")
+    (tmp_path / "b" / "local.txt").write_bytes(b"l")
+    entries = b.manifest.load()
+    assert diff(entries, b) == [
+        ("modified", "changed.txt"),
+        ("local-only", "local.txt"),
+        ("remote-only", "remote.txt"),
+    ]
+    b.stop()
@@ -0,0 +1,113 @@
+import os
+import re
+import sys
+import time
+import socket
+import urllib.request
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+import pytest
+from src.metrics import CONFLICTS, EVENT_OUTCOMES, EVENTS, MetricsServer, Registry
+from src.sync_manager import SyncManager
+from src.sync_folder_client import SyncFolderClient
+
+
+def test_render_counter_gauge_histogram():
+    registry = Registry()
+    events = registry.counter("events_total", "Events", ("handler",))
+    events.inc(handler="local")
+    events.inc(2, handler="local")
+    depth = registry.gauge("depth", "Depth", ("queue",))
+    depth.set_function(lambda: 7, queue="retry")
+    lag = registry.histogram("lag_seconds", "Lag", buckets=(0.1, 1))
+    lag.observe(0.05)
+    lag.observe(0.5)
+    lag.observe(5)
+
+    text = registry.render()
+    assert 'events_total{handler="local"} 3' in text
+    assert 'depth{queue="retry"} 7' in text
+    assert 'lag_seconds_bucket{le="0.1"} 1' in text
+    assert 'lag_seconds_bucket{le="1"} 2' in text
+    assert 'lag_seconds_bucket{le="+Inf"} 3' in text
+    assert "lag_seconds_count 3" in text
+    assert "# TYPE lag_seconds histogram" in text
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("c", "C", ("path",)).inc(path='a"b\\c')
+    assert 'c{path="a\\"b\\\\c"} 1' in registry.render()
+
+
+def test_http_endpoint_serves_metrics():
+    registry = Registry()
+    registry.counter("scraped_total", "Scraped").inc()
+    server = MetricsServer({"metrics": {"port": 0}}, registry)
+    server.start()
+    try:
+        port = server.server.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+        assert "scraped_total 1" in body
+    finally:
+        server.stop()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets not available")
+def test_unix_socket_endpoint(tmp_path):
+    registry = Registry()
+    registry.counter("unix_total", "Unix").inc()
+    path = str(tmp_path / "metrics.sock")
+    server = MetricsServer({"metrics": {"unix_socket": path}}, registry)
+    server.start()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(path)
+            s.sendall(b"GET /metrics HTTP/1.0\r\n\r\n")
+            data = b""
+            while chunk := s.recv(4096):
+                data += chunk
+        assert b"unix_total 1" in data
+    finally:
+        server.stop()
+
+
+class DummyPGP:
+    def encrypt_file(self, file_path, output_path=None, source=None):
+        return str(file_path) + ".gpg"
+
+    def decrypt_file(self, encrypted_path, output_path=None):
+        return output_path
+
+
+def test_conflicts_are_counted(tmp_path):
+    enc = tmp_path / "sync" / "encrypted_files"
+    enc.mkdir(parents=True)
+    (tmp_path / "mon").mkdir()
+    cfg = {
+        "local": {"monitored_path": str(tmp_path / "mon"), "decrypted_path": str(tmp_path / "dec")},
+        "sync_folder": {"path": str(tmp_path / "sync"), "encrypted_folder": "encrypted_files"},
+        "pgp": {"key_name": "dummy", "passphrase": "", "gnupghome": str(tmp_path)},
+    }
+    sm = SyncManager(cfg, SyncFolderClient(cfg), DummyPGP())
+    f = tmp_path / "mon" / "a.txt"
+    f.write_text("local")
+    remote = enc / "a.txt.gpg"
+    remote.write_text("remote")
+    future = time.time() + 1000
+    os.utime(remote, (future, future))
+
+    before = CONFLICTS.value()
+    sm.handle_local_change(f)
+    assert CONFLICTS.value() == before + 1
+
+
+def test_event_outcomes_are_documented():
+    src = os.path.join(os.path.dirname(__file__), "..", "src")
+    emitted = set()
+    for name in os.listdir(src):
+        if name.endswith(".py"):
+            with open(os.path.join(src, name)) as f:
+                emitted.update(re.findall(r"EVENTS\.inc\(handler=[^,]+, outcome='(\w+)'\)", f.read()))
+    assert emitted == set(EVENT_OUTCOMES)
+    help_text = EVENTS.documentation
+    assert all(outcome in help_text for outcome in EVENT_OUTCOMES)
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import argparse
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from conftest import PrefixPGP
+from src.pairs import SyncPairs, pair_configs, pgp_identity, select_pair
+from src.sync_manager import SyncManager
+from src.sync_folder_client import SyncFolderClient
+from src.file_monitor import FileMonitor
+from src.control import ControlServer, available as control_available
+from src.main import run_ctl
+
+
+def make_config(tmp_path, *names):
+    return {
+        "state_dir": str(tmp_path / "state"),
+        "sync_folder": {"path": str(tmp_path / "sync")},
+        "pgp": {"key_name": "shared", "passphrase": "", "gnupghome": str(tmp_path / "gnupg")},
+        "sync": {"workers": 2},
+        "pairs": [
+            {
+                "local": {"monitored_path": str(tmp_path / name), "decrypted_path": str(tmp_path / name)},
+                "sync_folder": {"encrypted_folder": f"enc_{name}"},
+            }
+            for name in names
+        ],
+    }
+
+
+def test_pairs_inherit_shared_settings(tmp_path):
+    config = make_config(tmp_path, "docs", "photos")
+    config["pairs"][1]["pgp"] = {"key_name": "photos-key"}
+    docs, photos = pair_configs(config)
+    assert (docs["name"], photos["name"]) == ("docs", "photos")
+    assert photos["sync_folder"] == {"path": str(tmp_path / "sync"), "encrypted_folder": "enc_photos"}
+    assert photos["pgp"]["gnupghome"] == str(tmp_path / "gnupg")
+    assert pgp_identity(docs) != pgp_identity(photos)
+    assert "pairs" not in docs
+    assert select_pair(config, "photos") is not None
+    with pytest.raises(ValueError, match="choose one of docs, photos"):
+        select_pair(config)
+    # A config without pairs is its own single pair
+    assert pair_configs(docs) == [docs]
+
+
+def test_overlapping_pairs_are_rejected(tmp_path):
+    config = make_config(tmp_path, "docs", "docs/sub")
+    with pytest.raises(ValueError, match="overlap"):
+        pair_configs(config)
+    config = make_config(tmp_path, "docs", "docs2")
+    config["pairs"][1]["sync_folder"]["encrypted_folder"] = "enc_docs"
+    with pytest.raises(ValueError, match="overlap"):
+        pair_configs(config)
+
+
+def test_pairs_share_observer_and_workers(tmp_path):
+    config = make_config(tmp_path, "a", "b")
+    (tmp_path / "sync").mkdir()
+    sync_pairs = SyncPairs.from_config(config)
+    pgp = PrefixPGP()
+    for pair in pair_configs(config):
+        sync_manager = SyncManager(
+            pair, SyncFolderClient(pair), pgp, observer=sync_pairs.observer, executor=sync_pairs.executor
+        )
+        file_monitor = FileMonitor(
+            pair["local"]["monitored_path"], sync_manager.submit_local_change,
+            ignore_rules=sync_manager.local_ignore, observer=sync_pairs.observer,
+        )
+        sync_pairs.add(pair["name"], sync_manager, file_monitor)
+    sync_pairs.pause()
+    sync_pairs.start()
+    assert len(sync_pairs.observer.emitters) == 4
+
+    for name in ("a", "b"):
+        (tmp_path / name / "f.txt").write_bytes(name.encode())
+    assert sync_pairs.rescan() == 2
+    assert sync_pairs.status()["pairs"]["a"]["held"] == 1
+    sync_pairs.resume()
+    sync_pairs.flush()
+    for name in ("a", "b"):
+        assert (tmp_path / "sync" / f"enc_{name}" / "f.txt.gpg").read_bytes() == b"ENC:" + name.encode()
+
+    # Path commands go to the pair the path belongs to
+    (tmp_path / "b" / "g.txt").write_bytes(b"g")
+    assert sync_pairs.boost(tmp_path / "b" / "g.txt") == "local"
+    assert (tmp_path / "sync" / "enc_b" / "g.txt.gpg").exists()
+    with pytest.raises(ValueError, match="any sync pair"):
+        sync_pairs.rescan(tmp_path / "elsewhere")
+
+    sync_pairs.stop()
+    assert not sync_pairs.observer.emitters
+
+
+@pytest.mark.skipif(not control_available(), reason="Unix domain sockets not available")
+def test_ctl_finds_the_pairs_daemon_from_any_directory(tmp_path, monkeypatch, capsys):
+    config = make_config(tmp_path, "a")
+    (tmp_path / "sync").mkdir()
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config))
+    (tmp_path / "elsewhere").mkdir()
+    sync_pairs = SyncPairs.from_config(config)
+    for pair in pair_configs(config):
+        sync_pairs.add(pair["name"], SyncManager(pair, SyncFolderClient(pair), PrefixPGP()), None)
+
+    monkeypatch.chdir(tmp_path / "a")
+    server = ControlServer(config, sync_pairs)
+    server.start()
+    try:
+        monkeypatch.chdir(tmp_path / "elsewhere")
+        assert run_ctl(argparse.Namespace(config=str(config_path), action="status", path=None, set=None)) == 0
+        assert "a" in json.loads(capsys.readouterr().out)["pairs"]
+    finally:
+        server.stop()
+        for sync_manager in sync_pairs.managers:
+            sync_manager.stop()
+        sync_pairs.executor.shutdown()
@@ -0,0 +1,85 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+import pytest
+from src.path_guard import PathGuard, UnsafePathError
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "root"
+    (root / "a" / "b").mkdir(parents=True)
+    (root / "a" / "b" / "file.txt").write_text("inside")
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "file.txt").write_text("secret")
+    return root, outside
+
+
+def symlink_or_skip(link, target):
+    try:
+        link.symlink_to(target)
+    except (OSError, NotImplementedError):
+        pytest.skip("Filesystem does not support symlinks")
+
+
+def test_containment_is_lexical(tree):
+    root, outside = tree
+    guard = PathGuard(root)
+    assert guard.relative(root / "a" / "b" / "file.txt") == os.path.join("a", "b", "file.txt")
+    assert guard.relative(root / ".." / "outside" / "file.txt") is None
+    assert guard.relative(str(root) + "-sibling") is None
+    assert guard.check(root / "a" / "b" / "file.txt")
+    assert not guard.check(outside / "file.txt")
+    # Not created yet, but below safe directories
+    assert guard.check(root / "a" / "new.txt")
+
+
+def test_symlinks_rejected(tree):
+    root, outside = tree
+    symlink_or_skip(root / "link.txt", outside / "file.txt")
+    symlink_or_skip(root / "linkdir", outside)
+    guard = PathGuard(root)
+    assert not guard.check(root / "link.txt")
+    assert not guard.check(root / "linkdir" / "file.txt")
+    with pytest.raises(UnsafePathError):
+        guard.open(root / "link.txt")
+    with pytest.raises(UnsafePathError):
+        guard.open(root / "linkdir" / "file.txt")
+
+
+def test_open_reads_file(tree):
+    root, _ = tree
+    guard = PathGuard(root)
+    with guard.open(root / "a" / "b" / "file.txt") as f:
+        assert f.read() == b"inside"
+    guard.close()
+
+
+def test_invalidate_drops_swapped_directory(tree):
+    root, outside = tree
+    guard = PathGuard(root)
+    assert guard.check(root / "a" / "b" / "file.txt")
+
+    # Swap a verified directory for a symlink pointing outside the root
+    os.rename(root / "a" / "b", root / "a" / "old")
+    symlink_or_skip(root / "a" / "b", outside)
+    # The open still refuses to follow it, even before the cache hears about it
+    with pytest.raises(UnsafePathError):
+        guard.open(root / "a" / "b" / "file.txt")
+
+    guard.invalidate(root / "a" / "b")
+    assert not guard.check(root / "a" / "b" / "file.txt")
+
+
+def test_open_closes_least_recently_used_dirs(tree):
+    root, _ = tree
+    for i in range(5):
+        (root / f"d{i}").mkdir()
+        (root / f"d{i}" / "f").write_text(str(i))
+    guard = PathGuard(root, max_open_dirs=2)
+    for i in range(5):
+        with guard.open(root / f"d{i}" / "f") as f:
+            assert f.read() == str(i).encode()
+    assert len(guard._dir_fds) <= 2
+    guard.close()
@@ -1,5 +1,7 @@
 import os
 import sys
+import shutil
+import subprocess
 import pytest
 from unittest import mock
 from pathlib import Path
@@ -177,4 +179,105 @@ def test_encrypt_empty_file(MockGPG, dummy_config, tmp_path):
 def test_gpg_binary_missing(dummy_config):
     with mock.patch("subprocess.run", side_effect=FileNotFoundError):
         with pytest.raises(EnvironmentError, match="GnuPG binary not found"):
-            PGPHandler(dummy_config)
\ No newline at end of file
+            PGPHandler(dummy_config)
+
+
+@mock.patch("src.pgp_handler.gnupg.GPG")
+def test_encrypt_and_decrypt_data_in_memory(MockGPG, dummy_config):
+    MockGPG.return_value.list_keys.return_value = [{"uids": ["dummy-key"]}]
+    MockGPG.return_value.encrypt.return_value.ok = True
+    MockGPG.return_value.encrypt.return_value.data = b"cipher"
+    MockGPG.return_value.decrypt.return_value.ok = True
+    MockGPG.return_value.decrypt.return_value.data = b"plain"
+
+    handler = PGPHandler(dummy_config)
+    assert handler.encrypt_data(b"plain") == b"cipher"
+    assert handler.decrypt_data(b"cipher") == b"plain"
+    MockGPG.return_value.decrypt.assert_called_once_with(b"cipher", passphrase="dummy-passphrase")
+
+
+@mock.patch("src.pgp_handler.gnupg.GPG")
+def test_corrupt_input_is_not_retried(MockGPG, dummy_config, tmp_path):
+    from src.errors import CorruptCiphertextError
+    MockGPG.return_value.list_keys.return_value = [{"uids": ["dummy-key"]}]
+    MockGPG.return_value.decrypt.return_value.ok = False
+    MockGPG.return_value.decrypt.return_value.status = "no data was provided"
+    MockGPG.return_value.decrypt.return_value.stderr = "gpg: no valid OpenPGP data found.\n[GNUPG:] NODATA 3\n"
+
+    handler = PGPHandler(dummy_config)
+    with pytest.raises(CorruptCiphertextError):
+        handler.decrypt_data(b"-----BEGIN PGP MESSAGE-----\ntrunc")
+    assert MockGPG.return_value.decrypt.call_count == 1
+
+
+@mock.patch("src.pgp_handler.gnupg.GPG")
+def test_configured_bad_passphrase_not_retried(MockGPG, dummy_config):
+    MockGPG.return_value.list_keys.return_value = [{"uids": ["dummy-key"]}]
+    MockGPG.return_value.decrypt.return_value.ok = False
+    MockGPG.return_value.decrypt.return_value.status = "decryption failed"
+    MockGPG.return_value.decrypt.return_value.stderr = "[GNUPG:] BAD_PASSPHRASE 0123\n"
+
+    handler = PGPHandler(dummy_config)
+    with pytest.raises(RuntimeError, match="Decryption failed after 1 attempt\\."):
+        handler.decrypt_data(b"cipher")
+    assert MockGPG.return_value.decrypt.call_count == 1
+
+
+@mock.patch("src.pgp_handler.gnupg.GPG")
+def test_probe_results_cached_until_keyring_changes(MockGPG, dummy_config):
+    MockGPG.return_value.list_keys.return_value = [{"uids": ["dummy-key"], "fingerprint": "ABCD"}]
+    with mock.patch("subprocess.run") as run:
+        run.return_value.returncode = 0
+        run.return_value.stdout = "gpg (GnuPG) 2.2.0\n"
+        handler = PGPHandler(dummy_config)
+        assert handler.key_fingerprint == "ABCD"
+        assert MockGPG.return_value.list_keys.call_count == 1
+
+        # Unchanged environment: no gpg process and no keyring listing
+        run.reset_mock()
+        handler = PGPHandler(dummy_config)
+        assert handler.key_fingerprint == "ABCD"
+        assert handler.gpg_version == "gpg (GnuPG) 2.2.0"
+        assert MockGPG.return_value.list_keys.call_count == 1
+        if run.call_count:
+            pytest.skip("gpg is not on the PATH here, so its version is never cached")
+
+        keyring = os.path.join(dummy_config["pgp"]["gnupghome"], "pubring.kbx")
+        with open(keyring, "wb") as f:
+            f.write(b"changed")
+        PGPHandler(dummy_config)
+        assert MockGPG.return_value.list_keys.call_count == 2
+
+
+def test_deferred_verify_runs_no_gpg(dummy_config):
+    with mock.patch("subprocess.run") as run, mock.patch("src.pgp_handler.gnupg.GPG") as MockGPG:
+        handler = PGPHandler(dummy_config, defer_verify=True)
+        assert not run.called
+        assert not MockGPG.called
+
+
+@pytest.mark.skipif(shutil.which("gpg") is None, reason="needs the gpg binary")
+def test_reencrypt_streams_to_new_key(dummy_config, tmp_path):
+    from src.errors import CorruptCiphertextError
+    home = dummy_config["pgp"]["gnupghome"]
+    os.chmod(home, 0o700)
+    for name, passphrase in (("old@example.com", "dummy-passphrase"), ("new@example.com", "other")):
+        subprocess.run(
+            ["gpg", "--homedir", home, "--batch", "--pinentry-mode", "loopback", "--passphrase", passphrase,
+             "--quick-gen-key", name, "future-default", "default", "never"],
+            check=True, capture_output=True,
+        )
+    dummy_config["pgp"].update(key_name="old@example.com", always_trust=True)
+    handler = PGPHandler(dummy_config, defer_verify=True)
+    try:
+        (tmp_path / "a.gpg").write_bytes(handler.encrypt_data(b"secret " * 10000))
+        handler.reencrypt_file(tmp_path / "a.gpg", tmp_path / "b.gpg", "new@example.com")
+        handler.passphrase = "other"
+        assert handler.decrypt_data((tmp_path / "b.gpg").read_bytes()) == b"secret " * 10000
+
+        (tmp_path / "c.gpg").write_bytes((tmp_path / "a.gpg").read_bytes()[:200])
+        with pytest.raises(CorruptCiphertextError):
+            handler.reencrypt_file(tmp_path / "c.gpg", tmp_path / "d.gpg", "new@example.com")
+        assert not (tmp_path / "d.gpg").exists()
+    finally:
+        subprocess.run(["gpgconf", "--homedir", home, "--kill", "gpg-agent"], capture_output=True)
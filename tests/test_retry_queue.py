@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.errors import CorruptCiphertextError
+from src.retry_queue import RetryQueue
+
+
+def test_backoff_grows_and_is_capped(tmp_path):
+    queue = RetryQueue(str(tmp_path / "q.json"), {}, base_delay=1, max_delay=10)
+    assert 0.5 <= queue._backoff(1) <= 1
+    assert 2 <= queue._backoff(3) <= 4
+    assert 5 <= queue._backoff(10) <= 10
+
+
+def test_entries_persist_across_restarts(tmp_path):
+    path = str(tmp_path / "q.json")
+    f = tmp_path / "locked.txt"
+    f.write_text("x")
+    queue = RetryQueue(path, {})
+    queue.record_failure("local", f, OSError("file is locked"))
+    queue.record_failure("local", f, OSError("file is locked"))
+    reloaded = RetryQueue(path, {})
+    assert len(reloaded) == 1
+    assert reloaded.entries[("local", str(f))]["attempts"] == 2
+
+
+def test_gives_up_after_max_attempts(tmp_path):
+    queue = RetryQueue(str(tmp_path / "q.json"), {}, max_attempts=2)
+    for _ in range(3):
+        queue.record_failure("remote", tmp_path / "x.gpg", RuntimeError("boom"))
+    assert len(queue) == 0
+
+
+def test_run_due_retries_and_clears(tmp_path):
+    f = tmp_path / "a.txt"
+    f.write_text("x")
+    handled = []
+    queue = RetryQueue(str(tmp_path / "q.json"), {"local": handled.append}, base_delay=0)
+    queue.record_failure("local", f, OSError("disk full"))
+    queue.run_due()
+    assert handled == [f]
+    assert len(queue) == 0
+
+
+def test_run_due_drops_vanished_files(tmp_path):
+    handled = []
+    queue = RetryQueue(str(tmp_path / "q.json"), {"local": handled.append}, base_delay=0)
+    queue.record_failure("local", tmp_path / "gone.txt", OSError("locked"))
+    queue.run_due()
+    assert handled == []
+    assert len(queue) == 0
+
+
+class FlakyPGP:
+    def __init__(self, failures):
+        self.failures = failures
+
+    def encrypt_file(self, file_path, output_path=None, source=None):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("Encryption failed: resource busy")
+        out = str(file_path) + ".gpg"
+        with open(out, "w") as f:
+            f.write("encrypted")
+        return out
+
+    def decrypt_file(self, encrypted_path, output_path=None):
+        raise CorruptCiphertextError("Decryption failed: ciphertext is truncated or corrupt")
+
+
+def test_failed_local_change_is_retried(tmp_path, make_manager):
+    sm = make_manager(decrypted="dec", pgp=FlakyPGP(failures=1), retry_base_delay=0)
+    f = tmp_path / "mon" / "doc.txt"
+    f.write_text("plain")
+    sm.handle_local_change(f)
+    assert len(sm.retry_queue) == 1
+    sm.retry_queue.run_due()
+    assert len(sm.retry_queue) == 0
+    assert (tmp_path / "sync" / "encrypted_files" / "doc.txt.gpg").exists()
+
+
+def test_retries_are_kept_while_paused(tmp_path, make_manager):
+    sm = make_manager(decrypted="dec", pgp=FlakyPGP(failures=1), retry_base_delay=0)
+    f = tmp_path / "mon" / "doc.txt"
+    f.write_text("plain")
+    sm.handle_local_change(f)
+    # Paused at startup until gpg is verified: a due retry must not be used up
+    sm.pause()
+    sm.retry_queue.run_due()
+    assert len(sm.retry_queue) == 1
+    assert not sm.held
+    sm.resume()
+    sm.retry_queue.run_due()
+    assert len(sm.retry_queue) == 0
+    assert (tmp_path / "sync" / "encrypted_files" / "doc.txt.gpg").exists()
+
+
+def test_change_held_during_resume_is_not_lost(tmp_path, make_manager):
+    sm = make_manager(decrypted="dec", pgp=FlakyPGP(failures=0), retry_base_delay=0)
+    f = tmp_path / "mon" / "doc.txt"
+    f.write_text("plain")
+    sm.pause()
+
+    class SlowHeld(dict):
+        # Resume runs between the paused check and the insert
+        def __setitem__(self, key, value):
+            resumer.start()
+            time.sleep(0.2)
+            super().__setitem__(key, value)
+    sm.held = SlowHeld()
+    resumer = threading.Thread(target=sm.resume)
+    sm.handle_local_change(f)
+    resumer.join()
+    assert not sm.paused and not sm.held
+    assert (tmp_path / "sync" / "encrypted_files" / "doc.txt.gpg").exists()
+
+
+def test_corrupt_ciphertext_is_queued(tmp_path, make_manager):
+    sm = make_manager(decrypted="dec", pgp=FlakyPGP(failures=0), retry_base_delay=0)
+    enc = tmp_path / "sync" / "encrypted_files" / "half.txt.gpg"
+    enc.write_bytes(b"-----BEGIN PGP")
+    sm.handle_sync_folder_change(enc)
+    sm.retry_queue.run_due()
+    assert sm.retry_queue.entries[("remote", str(enc))]["attempts"] == 2
+    assert not list((tmp_path / "mon").iterdir()), "staging copy was not cleaned up"
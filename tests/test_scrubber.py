@@ -0,0 +1,124 @@
+import os
+import sys
+import io
+import base64
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from conftest import PrefixPGP
+from src.path_guard import UnsafePathError
+from src.scrubber import Scrubber, check_ciphertext, crc24
+
+
+def packet(tag, body):
+    # New-format packet with a four-octet length
+    return bytes([0xC0 | tag, 0xFF]) + len(body).to_bytes(4, "big") + body
+
+
+def armor(data):
+    body = base64.b64encode(data).decode()
+    lines = [body[i:i + 64] for i in range(0, len(body), 64)]
+    checksum = base64.b64encode(crc24(data).to_bytes(3, "big")).decode()
+    return "\n".join(
+        ["-----BEGIN PGP MESSAGE-----", "", *lines, "=" + checksum, "-----END PGP MESSAGE-----", ""]
+    ).encode()
+
+
+class PacketPGP(PrefixPGP):
+    # A session key packet followed by an "encrypted" data packet holding the plaintext
+    def encrypt_data(self, data):
+        return armor(packet(1, b"session key") + packet(18, data))
+
+    def decrypt_data(self, data):
+        lines = data.decode().splitlines()
+        return base64.b64decode("".join(lines[2:-2]))[6 + 11 + 6:]
+
+
+def test_structural_checks():
+    message = packet(1, b"k") + packet(18, b"x" * 300)
+    assert check_ciphertext(io.BytesIO(message))[0] is None
+    assert check_ciphertext(io.BytesIO(armor(message)))[0] is None
+    assert "truncated" in check_ciphertext(io.BytesIO(message[:-1]))[0]
+    assert "truncated" in check_ciphertext(io.BytesIO(armor(message)[:-30]))[0]
+    assert "unexpected packet type 11" in check_ciphertext(io.BytesIO(packet(11, b"plain")))[0]
+    assert "no encrypted data" in check_ciphertext(io.BytesIO(packet(1, b"k")))[0]
+    damaged = armor(message).replace(b"eHh4", b"eHh5", 1)
+    assert "CRC-24" in check_ciphertext(io.BytesIO(damaged))[0]
+
+
+def scrub_manager(make_manager, tmp_path):
+    (tmp_path / "mon" / "sub").mkdir(parents=True)
+    scrub = {"enabled": True, "max_read_mbps": 0, "min_age_seconds": 0}
+    return make_manager(pgp=PacketPGP(), scrub=scrub)
+
+
+def test_scrub_pass_finds_and_republishes_damage(tmp_path, make_manager):
+    sm = scrub_manager(make_manager, tmp_path)
+    enc = tmp_path / "sync" / "encrypted_files"
+    for name in ("a.txt", "sub/b.txt", "c.txt"):
+        (tmp_path / "mon" / name).write_bytes(b"content of " + name.encode())
+        assert sm.handle_local_change(tmp_path / "mon" / name) is True
+
+    # Bit rot that keeps size and mtime; the local plaintext is still the synced version
+    st = os.stat(enc / "a.txt.gpg")
+    (enc / "a.txt.gpg").write_bytes(PacketPGP().encrypt_data(b"content of a.tXt"))
+    os.utime(enc / "a.txt.gpg", ns=(st.st_atime_ns, st.st_mtime_ns))
+    # Truncated by the sync client after a local edit; cannot be republished
+    (enc / "c.txt.gpg").write_bytes((enc / "c.txt.gpg").read_bytes()[:40])
+    (tmp_path / "mon" / "c.txt").write_bytes(b"edited")
+
+    scrubber = sm.scrubber
+    while scrubber.step():
+        pass
+    report = scrubber.snapshot()
+    assert report["checked"] == 3
+    assert sorted(report["corrupt"]) == ["a.txt.gpg", "c.txt.gpg"]
+    assert "SHA-256" in report["corrupt"]["a.txt.gpg"]["problem"]
+    assert report["corrupt"]["a.txt.gpg"]["republished"]
+    assert not report["corrupt"]["c.txt.gpg"]["republished"]
+    assert (enc / "a.txt.gpg").read_bytes() == PacketPGP().encrypt_data(b"content of a.txt")
+    sm.stop()
+
+
+def test_scrub_resumes_from_cursor(tmp_path, make_manager):
+    sm = scrub_manager(make_manager, tmp_path)
+    for name in ("a.txt", "sub/b.txt", "c.txt"):
+        (tmp_path / "mon" / name).write_bytes(b"x")
+        sm.handle_local_change(tmp_path / "mon" / name)
+    assert [rel for rel, _ in sm.scrubber._walk()] == ["a.txt.gpg", "c.txt.gpg", "sub/b.txt.gpg"]
+    assert sm.scrubber.step()
+    sm.stop()
+
+    resumed = Scrubber(sm)
+    assert resumed.cursor == "a.txt.gpg"
+    assert [rel for rel, _ in resumed._walk(resumed.cursor)] == ["c.txt.gpg", "sub/b.txt.gpg"]
+    assert [rel for rel, _ in resumed._walk("sub/a")] == ["sub/b.txt.gpg"]
+
+
+def test_scrub_pass_lists_each_directory_once(tmp_path, make_manager, monkeypatch):
+    sm = scrub_manager(make_manager, tmp_path)
+    names = [f"f{i}.txt" for i in range(10)] + [f"sub/g{i}.txt" for i in range(10)]
+    for name in names:
+        (tmp_path / "mon" / name).parent.mkdir(exist_ok=True)
+        (tmp_path / "mon" / name).write_bytes(b"x")
+        assert sm.handle_local_change(tmp_path / "mon" / name) is True
+    listed = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: listed.append(path) or scandir(path))
+
+    for _ in range(2):
+        listed.clear()
+        while sm.scrubber.step():
+            pass
+        assert sm.scrubber.snapshot()["checked"] == len(names)
+        assert len(listed) == 2
+    sm.stop()
+
+
+def test_check_does_not_follow_symlinks(tmp_path, make_manager):
+    sm = scrub_manager(make_manager, tmp_path)
+    outside = tmp_path / "outside.gpg"
+    outside.write_bytes(b"not a ciphertext")
+    os.symlink(outside, tmp_path / "sync" / "encrypted_files" / "link.gpg")
+    with pytest.raises(UnsafePathError):
+        sm.scrubber.check(str(tmp_path / "sync" / "encrypted_files" / "link.gpg"))
+    sm.stop()
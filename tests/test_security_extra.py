@@ -126,7 +126,7 @@ def test_is_within_and_symlink_defenses(tmp_path, dummy_config):
     (tmp_path / "sync" / "encrypted_files").mkdir(parents=True)
 
     class NoopPGP:
-        def encrypt_file(self, file_path, output_path=None):
+        def encrypt_file(self, file_path, output_path=None, source=None):
             return str(file_path) + ".gpg"
 
         def decrypt_file(self, encrypted_path, output_path=None):
@@ -158,7 +158,7 @@ def test_conflict_detection_by_mtime(tmp_path, dummy_config):
     cfg["local"]["decrypted_path"] = str(tmp_path / "dec")
 
     class DummyPGP2:
-        def encrypt_file(self, file_path, output_path=None):
+        def encrypt_file(self, file_path, output_path=None, source=None):
             out = str(file_path) + ".gpg"
             open(out, "wb").write(b"encrypted")
             return out
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.stability import StabilityTracker, is_partial_download
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def test_partial_download_names():
+    assert is_partial_download(".syncthing.secret.txt.gpg.tmp")
+    assert is_partial_download("secret.txt.gpg.partial")
+    assert is_partial_download("secret.txt.gpg.crdownload")
+    assert not is_partial_download("secret.txt.gpg")
+
+
+def test_waits_until_file_settles(tmp_path):
+    ready = []
+    tracker = StabilityTracker(ready.append, settle_seconds=0.3, poll_interval=0.05)
+    f = tmp_path / "growing.gpg"
+    f.write_bytes(b"a")
+    tracker.submit(f)
+    for i in range(5):
+        time.sleep(0.1)
+        with open(f, "ab") as out:
+            out.write(b"more")
+        assert not ready, "callback fired while the file was still being written"
+    assert wait_for(lambda: ready == [f])
+    tracker.stop()
+
+
+def test_ready_files_skip_settling(tmp_path):
+    ready = []
+    tracker = StabilityTracker(ready.append, settle_seconds=60, poll_interval=0.05)
+    f = tmp_path / "done.gpg"
+    f.write_bytes(b"a")
+    tracker.submit(f, ready=True)
+    assert wait_for(lambda: ready == [f], timeout=2)
+    tracker.stop()
+
+
+def test_zero_settle_calls_back_immediately(tmp_path):
+    ready = []
+    tracker = StabilityTracker(ready.append, settle_seconds=0)
+    tracker.submit(tmp_path / "x.gpg")
+    assert ready == [tmp_path / "x.gpg"]
@@ -0,0 +1,68 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.staging import MemoryStaging
+from src.sync_manager import SyncManager
+from src.sync_folder_client import SyncFolderClient
+
+
+class MemoryPGP:
+    def encrypt_file(self, file_path, output_path=None, source=None):
+        raise AssertionError("small files must not be staged on disk")
+
+    def decrypt_file(self, encrypted_path, output_path=None):
+        raise AssertionError("small files must not be staged on disk")
+
+    def encrypt_data(self, data):
+        return b"enc:" + data
+
+    def decrypt_data(self, data):
+        assert data.startswith(b"enc:")
+        return data[4:]
+
+
+def test_disabled_by_default():
+    staging = MemoryStaging({})
+    with staging.reserve(10) as in_memory:
+        assert not in_memory
+
+
+def test_size_threshold_and_budget():
+    staging = MemoryStaging({"sync": {"memory_staging_max_bytes": 100, "memory_staging_budget_bytes": 150}})
+    with staging.reserve(101) as in_memory:
+        assert not in_memory
+    with staging.reserve(100) as first:
+        assert first
+        with staging.reserve(60) as second:
+            # Over the global budget, falls back to disk
+            assert not second
+        with staging.reserve(50) as third:
+            assert third
+    assert staging.in_use == 0
+
+
+def test_small_file_round_trip_in_memory(tmp_path):
+    mon = tmp_path / "mon"
+    dec = tmp_path / "dec"
+    enc_dir = tmp_path / "sync" / "encrypted_files"
+    mon.mkdir()
+    dec.mkdir()
+    enc_dir.mkdir(parents=True)
+    cfg = {
+        "local": {"monitored_path": str(mon), "decrypted_path": str(dec)},
+        "sync_folder": {"path": str(tmp_path / "sync"), "encrypted_folder": "encrypted_files"},
+        "pgp": {"key_name": "dummy", "passphrase": "", "gnupghome": str(tmp_path)},
+        "sync": {"memory_staging_max_bytes": 1024},
+    }
+    sm = SyncManager(cfg, SyncFolderClient(cfg), MemoryPGP())
+
+    f = mon / "note.txt"
+    f.write_text("plain")
+    sm.handle_local_change(f)
+    enc = enc_dir / "note.txt.gpg"
+    assert enc.read_bytes() == b"enc:plain"
+    assert not (mon / "note.txt.gpg").exists()
+
+    sm.handle_sync_folder_change(enc)
+    assert (dec / "note.txt").read_text() == "plain"
+    assert not any(p.name.startswith(".temp_") for p in mon.iterdir())
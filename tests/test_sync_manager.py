@@ -6,7 +6,7 @@ from src.sync_manager import SyncManager
 from src.sync_folder_client import SyncFolderClient
 
 class DummyPGP:
-    def encrypt_file(self, file_path, output_path=None):
+    def encrypt_file(self, file_path, output_path=None, source=None):
         return str(file_path) + ".gpg"
     def decrypt_file(self, encrypted_path, output_path=None):
         return output_path or str(encrypted_path).replace('.gpg', '')
@@ -41,7 +41,7 @@ def test_encryption_error_handling(sync_manager, tmp_path, monkeypatch):
 def test_local_file_cache_updated(sync_manager, tmp_path):
     # Patch DummyPGP to actually create the .gpg file
     class RealDummyPGP:
-        def encrypt_file(self, file_path, output_path=None):
+        def encrypt_file(self, file_path, output_path=None, source=None):
             out = str(file_path) + ".gpg"
             with open(out, "w") as f:
                 f.write("encrypted")
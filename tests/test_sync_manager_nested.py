@@ -6,7 +6,7 @@ from src.sync_folder_client import SyncFolderClient
 
 
 class WritingDummyPGP:
-    def encrypt_file(self, file_path, output_path=None):
+    def encrypt_file(self, file_path, output_path=None, source=None):
         out = (output_path or (str(file_path) + ".gpg"))
         with open(out, "w") as f:
             f.write("encrypted")
@@ -53,5 +53,33 @@ def test_handle_local_change_nested_paths(tmp_path):
 
     # Now simulate a remote change notification and ensure decryption works to the correct place
     sm.handle_sync_folder_change(expected_enc)
-    expected_dec = dec / "secret.txt"  # decrypts to decrypted_path root by name
+    expected_dec = dec / "sub1" / "sub2" / "secret.txt"  # keeps its subdirectories
     assert expected_dec.exists(), "Decrypted file should exist"
+    assert not (dec / "secret.txt").exists()
+
+
+def test_same_name_in_different_directories_does_not_collide(tmp_path):
+    dec = tmp_path / "dec"
+    enc_dir = tmp_path / "sync" / "encrypted_files"
+    (enc_dir / "a" / "b").mkdir(parents=True)
+    (enc_dir / "x").mkdir()
+    (tmp_path / "mon").mkdir()
+    config = {
+        "local": {"monitored_path": str(tmp_path / "mon"), "decrypted_path": str(dec)},
+        "sync_folder": {"path": str(tmp_path / "sync"), "encrypted_folder": "encrypted_files"},
+        "pgp": {"key_name": "dummy", "passphrase": "", "gnupghome": str(tmp_path)},
+    }
+    sm = SyncManager(config, SyncFolderClient(config), WritingDummyPGP())
+    for enc in (enc_dir / "a" / "b" / "c.txt.gpg", enc_dir / "x" / "c.txt.gpg"):
+        enc.write_text("encrypted")
+        assert sm.handle_sync_folder_change(enc)
+    assert (dec / "a" / "b" / "c.txt").exists()
+    assert (dec / "x" / "c.txt").exists()
+    assert not (dec / "c.txt").exists()
+
+    # A deleted output directory is created again right away
+    import shutil
+    shutil.rmtree(dec / "x")
+    assert sm.handle_sync_folder_change(enc_dir / "x" / "c.txt.gpg") is True
+    assert len(sm.retry_queue) == 0
+    assert (dec / "x" / "c.txt").exists()
@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+import pytest
+from src.profiler import SamplingProfiler
+from src.tracing import TRACER, Tracer
+from src.sync_manager import SyncManager
+from src.sync_folder_client import SyncFolderClient
+
+
+def test_disabled_tracer_returns_noop_span():
+    tracer = Tracer()
+    assert not tracer.enabled
+    with tracer.span("stage", path="x") as s:
+        s.set(extra=1)
+
+
+def test_jsonl_export(tmp_path):
+    out = tmp_path / "trace.jsonl"
+    tracer = Tracer()
+    tracer.configure(out)
+    with tracer.span("outer", path="a"):
+        with tracer.span("inner"):
+            pass
+    with pytest.raises(ValueError):
+        with tracer.span("failing"):
+            raise ValueError("boom")
+    tracer.close()
+
+    records = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [r["name"] for r in records] == ["inner", "outer", "failing"]
+    assert records[1]["attrs"] == {"path": "a"}
+    assert records[2]["attrs"]["error"] == "ValueError"
+    assert records[1]["duration_ns"] >= records[0]["duration_ns"]
+
+
+def test_chrome_export_is_valid_json(tmp_path):
+    out = tmp_path / "trace.json"
+    tracer = Tracer()
+    tracer.configure(out, "chrome")
+    with tracer.span("stage", bytes=10):
+        pass
+    tracer.close()
+
+    events = [e for e in json.loads(out.read_text()) if e]
+    assert events[0]["ph"] == "X"
+    assert events[0]["name"] == "stage"
+    assert events[0]["args"] == {"bytes": 10}
+
+
+def test_unknown_format_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        Tracer().configure(tmp_path / "t", "xml")
+
+
+class DummyPGP:
+    def encrypt_file(self, file_path, output_path=None, source=None):
+        out = str(file_path) + ".gpg"
+        with open(out, "wb") as f:
+            f.write(b"x")
+        return out
+
+    def decrypt_file(self, encrypted_path, output_path=None):
+        return output_path
+
+
+def test_handler_stages_are_traced(tmp_path):
+    (tmp_path / "sync" / "encrypted_files").mkdir(parents=True)
+    (tmp_path / "mon").mkdir()
+    cfg = {
+        "local": {"monitored_path": str(tmp_path / "mon"), "decrypted_path": str(tmp_path / "dec")},
+        "sync_folder": {"path": str(tmp_path / "sync"), "encrypted_folder": "encrypted_files"},
+        "pgp": {"key_name": "dummy", "passphrase": "", "gnupghome": str(tmp_path)},
+    }
+    sm = SyncManager(cfg, SyncFolderClient(cfg), DummyPGP())
+    f = tmp_path / "mon" / "a.txt"
+    f.write_text("data")
+
+    out = tmp_path / "trace.jsonl"
+    TRACER.configure(out)
+    try:
+        sm.handle_local_change(f)
+    finally:
+        TRACER.close()
+    names = {json.loads(line)["name"] for line in out.read_text().splitlines()}
+    assert {"local.lock_wait", "local.sync", "local.path_check", "local.remote_lookup",
+            "local.encrypt", "local.upload"} <= names
+
+
+def test_sampling_profiler_sees_other_threads(tmp_path):
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    deadline = time.monotonic() + 0.2
+    while time.monotonic() < deadline:
+        sum(range(1000))
+    profiler.stop()
+
+    assert profiler.samples > 0
+    assert "test_sampling_profiler_sees_other_threads" in profiler.report()
+    out = tmp_path / "profile.txt"
+    profiler.write_report(out)
+    assert out.exists() and (tmp_path / "profile.txt.collapsed").exists()
@@ -0,0 +1,163 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.sync_manager import SyncManager
+from src.sync_folder_client import SyncFolderClient
+from conftest import PrefixPGP
+from src.versions import device_id, dominates, increment, merge
+
+
+def device(make_manager, name):
+    # Two devices share the sync folder; each decrypts into its own monitored folder
+    return make_manager(name, device_id=name)
+
+
+def skew(path, seconds):
+    # Simulate a device clock that is off by the given number of seconds
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10 ** 9))
+
+
+def test_vectors():
+    assert dominates({"a": 2, "b": 1}, {"a": 1})
+    assert not dominates({"a": 2}, {"a": 1, "b": 1})
+    assert merge({"a": 2}, None, {"a": 1, "b": 3}) == {"a": 2, "b": 3}
+    assert increment({"a": 1}, "b") == {"a": 1, "b": 1}
+
+
+def test_device_id_is_persisted(tmp_path):
+    config = {"state_dir": str(tmp_path)}
+    assert device_id(config) == device_id(config)
+    assert device_id({"sync": {"device_id": "laptop"}}) == "laptop"
+
+
+def test_descendant_edit_is_not_a_conflict_despite_clock_skew(tmp_path, make_manager):
+    a, b = device(make_manager, "a"), device(make_manager, "b")
+    enc = tmp_path / "sync" / "encrypted_files" / "f.txt.gpg"
+    (tmp_path / "a" / "f.txt").write_bytes(b"v1")
+    assert a.handle_local_change(tmp_path / "a" / "f.txt") is True
+    stale = enc.read_bytes(), (tmp_path / "sync" / "encrypted_files" / "f.txt.gpg.ver").read_bytes()
+    assert b.handle_sync_folder_change(enc) is True
+    # The decrypted file's own event is recognised as already synced
+    assert b.handle_local_change(tmp_path / "b" / "f.txt") is None
+
+    # B edits with a clock far behind the ciphertext's mtime
+    (tmp_path / "b" / "f.txt").write_bytes(b"v2")
+    skew(tmp_path / "b" / "f.txt", -3600)
+    assert b.handle_local_change(tmp_path / "b" / "f.txt") is True
+    assert not (tmp_path / "b" / "f.txt.conflict").exists()
+    assert a.handle_sync_folder_change(enc) is True
+    assert (tmp_path / "a" / "f.txt").read_bytes() == b"v2"
+
+    # The sync client brings back an old version A has already seen, while A edits
+    enc.write_bytes(stale[0])
+    (tmp_path / "sync" / "encrypted_files" / "f.txt.gpg.ver").write_bytes(stale[1])
+    skew(enc, 3600)
+    (tmp_path / "a" / "f.txt").write_bytes(b"v3")
+    assert a.handle_local_change(tmp_path / "a" / "f.txt") is True
+    assert not (tmp_path / "a" / "f.txt.conflict").exists()
+    assert enc.read_bytes() == b"ENC:v3"
+    a.stop()
+    b.stop()
+
+
+def test_diverging_edits_conflict(tmp_path, make_manager):
+    a, b = device(make_manager, "a"), device(make_manager, "b")
+    enc = tmp_path / "sync" / "encrypted_files" / "f.txt.gpg"
+    (tmp_path / "a" / "f.txt").write_bytes(b"v1")
+    assert a.handle_local_change(tmp_path / "a" / "f.txt") is True
+    assert b.handle_sync_folder_change(enc) is True
+
+    # Both edit the same version; B uploads first
+    (tmp_path / "b" / "f.txt").write_bytes(b"from b")
+    assert b.handle_local_change(tmp_path / "b" / "f.txt") is True
+    (tmp_path / "a" / "f.txt").write_bytes(b"from a")
+    skew(tmp_path / "a" / "f.txt", 3600)
+    assert a.handle_local_change(tmp_path / "a" / "f.txt") is None
+    assert (tmp_path / "a" / "f.txt.conflict").read_bytes() == b"from a"
+    assert enc.read_bytes() == b"ENC:from b"
+
+    # B's version arriving at A keeps A's edit as a conflict copy
+    os.remove(tmp_path / "a" / "f.txt.conflict")
+    assert a.handle_sync_folder_change(enc) is True
+    assert (tmp_path / "a" / "f.txt").read_bytes() == b"from b"
+    assert (tmp_path / "a" / "f.txt.conflict").read_bytes() == b"from a"
+    a.stop()
+    b.stop()
+
+
+def test_identical_edits_do_not_conflict(tmp_path, make_manager):
+    a, b = device(make_manager, "a"), device(make_manager, "b")
+    (tmp_path / "a" / "f.txt").write_bytes(b"v1")
+    assert a.handle_local_change(tmp_path / "a" / "f.txt") is True
+    assert b.handle_sync_folder_change(tmp_path / "sync" / "encrypted_files" / "f.txt.gpg") is True
+    (tmp_path / "b" / "f.txt").write_bytes(b"same")
+    assert b.handle_local_change(tmp_path / "b" / "f.txt") is True
+    (tmp_path / "a" / "f.txt").write_bytes(b"same")
+    assert a.handle_local_change(tmp_path / "a" / "f.txt") is True
+    assert not (tmp_path / "a" / "f.txt.conflict").exists()
+    a.stop()
+    b.stop()
+
+
+def test_version_metadata_is_decrypted_only_for_an_edit(tmp_path, make_manager):
+    a, b = device(make_manager, "a"), device(make_manager, "b")
+    decrypted = []
+    decrypt_data = b.pgp_handler.decrypt_data
+    b.pgp_handler.decrypt_data = lambda data: decrypted.append(data) or decrypt_data(data)
+    metadata_decrypts = lambda: [data for data in decrypted if data.startswith(b"ENC:{")]
+    enc = tmp_path / "sync" / "encrypted_files" / "f.txt.gpg"
+    (tmp_path / "a" / "f.txt").write_bytes(b"v1")
+    assert a.handle_local_change(tmp_path / "a" / "f.txt") is True
+    assert b.handle_sync_folder_change(enc) is True
+    assert metadata_decrypts() == []
+
+    (tmp_path / "b" / "f.txt").write_bytes(b"v2")
+    assert b.handle_local_change(tmp_path / "b" / "f.txt") is True
+    assert len(metadata_decrypts()) == 1
+    assert b.versions.get("f.txt.gpg")["vector"] == {"a": 1, "b": 1}
+    a.stop()
+    b.stop()
+
+
+def test_version_metadata_arriving_after_its_ciphertext(tmp_path, make_manager):
+    a, b = device(make_manager, "a"), device(make_manager, "b")
+    enc = tmp_path / "sync" / "encrypted_files" / "f.txt.gpg"
+    ver = tmp_path / "sync" / "encrypted_files" / "f.txt.gpg.ver"
+    (tmp_path / "a" / "f.txt").write_bytes(b"v1")
+    assert a.handle_local_change(tmp_path / "a" / "f.txt") is True
+    metadata = ver.read_bytes()
+    ver.unlink()
+    assert b.handle_sync_folder_change(enc) is True
+
+    ver.write_bytes(metadata)
+    b.handle_sync_folder_change(ver)
+    (tmp_path / "b" / "f.txt").write_bytes(b"v2")
+    assert b.handle_local_change(tmp_path / "b" / "f.txt") is True
+    assert b.versions.get("f.txt.gpg")["vector"] == {"a": 1, "b": 1}
+    a.stop()
+    b.stop()
+
+
+def test_conflict_copy_survives_crash_recovery(tmp_path, make_manager):
+    a, b = device(make_manager, "a"), device(make_manager, "b")
+    enc = tmp_path / "sync" / "encrypted_files" / "f.txt.gpg"
+    (tmp_path / "a" / "f.txt").write_bytes(b"v1")
+    assert a.handle_local_change(tmp_path / "a" / "f.txt") is True
+    assert b.handle_sync_folder_change(enc) is True
+    (tmp_path / "b" / "f.txt").write_bytes(b"MY LOCAL EDIT")
+    (tmp_path / "a" / "f.txt").write_bytes(b"v2")
+    assert a.handle_local_change(tmp_path / "a" / "f.txt") is True
+
+    # Crash once the remote version has been decrypted, before its operation is done
+    end = b.journal.end
+    b.journal.end = lambda op_id: None
+    assert b.handle_sync_folder_change(enc) is True
+    assert (tmp_path / "b" / "f.txt").read_bytes() == b"v2"
+    b.journal.end = end
+    b.stop()
+
+    restarted = SyncManager(b.config, SyncFolderClient(b.config), PrefixPGP())
+    assert (tmp_path / "b" / "f.txt.conflict").read_bytes() == b"MY LOCAL EDIT"
+    a.stop()
+    restarted.stop()